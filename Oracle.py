@@ -5,35 +5,78 @@
 #               functions that are common to many DBA scripts.                                   #
 #  Functions:   ChunkString(InStr, Len)                                                          #
 #               CheckPythonVersion()                                                             #
+#               CloseSessions(Sid='')                                                            #
+#               ContainerPool(ConnectString='/ as sysdba', Sessions=4, CacheTtl=0, ...)          #
 #               ConvertSize(bytes)                                                               #
+#               ConvertSizes(Values, Unit='')                                                    #
+#               DbStateSql(Colsep='!~!')                                                         #
+#               DgmgrlSession(ConnectString='/')                                                 #
 #               DumpConfig(ConfigFile)                                                           #
+#               EmitSqlplus(Sql, Columns, Format, ConnectString='/ as sysdba', Name='', ...)     #
 #               ErrorCheck(Stdout, ComponentList=['ALL_COMPONENTS'])                             #
 #               FormatNumber(s, tSep=',', dSep='.')                                              #
+#               FormatNumbers(Values, tSep=',')                                                  #
 #               GetAsmHome(Oratab='/etc/oratab')                                                 #
 #               GetClustername()                                                                 #
-#               GetDbState()                                                                     #
+#               GetDbState(Sid='', ConnectString='/ as sysdba', Query=True, UseCache=False)      #
+#               GetInstances(CacheTtl=0)                                                         #
 #               GetNodes()                                                                       #
 #               GetOracleVersion()                                                               #
 #               GetParameter(Parameter)                                                          #
+#               GetParameters(Names, Instances=None, ConnectString='/ as sysdba', CacheTtl=0)    #
 #               GetPassword(Name, User, Decrypt, PasswdFilename='/home/oracle/dba/etc/.passwd')  #
 #               GetRedologInfo()                                                                 #
 #               GetRmanConfig(ConnectString='target /')                                          #
+#               GetSession(Sid='', ConnectString='/ as sysdba')                                  #
 #               GetVips()                                                                        #
+#               InList(Column, Values)                                                           #
 #               IsExecutable(Filepath)                                                           #
 #               IsReadable(Filepath)                                                             #
 #               LoadFacilities(FacilitiesFile)                                                   #
+#               LoadTargets(TargetsFile)                                                         #
 #               LoadOratab(Oratab='')                                                            #
 #               LookupError(Error)                                                               #
+#               MessageCatalog(OracleHome='', CatalogDir='')                                     #
 #               Olsnodes(Parm='')                                                                #
+#               ParameterStore(StoreDir='')                                                      #
 #               ParseConnectString(InStr)                                                        #
+#               ParseDgConfiguration(Stdout)                                                     #
+#               ParseDgDatabase(Stdout)                                                          #
+#               ParseDgLag(Lag)                                                                  #
+#               ParseDbState(Sid, Stdout, Colsep='!~!')                                          #
+#               ParseMessageFile(Args)                                                           #
+#               ParseOutlineHints(Lines)                                                         #
+#               ParseRmanOutput(Lines, ErrChk=True, ComponentList=['ALL_COMPONENTS'])            #
 #               ParseSqlout(Sqlout, Sqlkey, Colsep)                                              #
+#               PasswdFilename()                                                                 #
+#               PlanCache(CacheDir='', ConnectString='/ as sysdba')                              #
+#               PlanChangeDetector(Ratio=1.5, MinExecs=10)                                       #
+#               PlanHistorySql(BeginTime, BeginTimeFormat, EndTime, EndTimeFormat, ...)          #
+#               PlanRegressionReport(Sql, ConnectString, Cmd, BeginTime, EndTime, ...)           #
 #               PrintError(Sql, Stdout, ErrorList=[])                                            #
+#               PrivateDir(Name, EnvVar='')                                                      #
+#               RedoHistory(StoreDir='', ConnectString='/ as sysdba')                            #
 #               ProcessConfig(ConfigFile, Section)                                               #
-#               RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/')                                #
-#               RunRman(RCV, ErrChk=True, ConnectString='target /')                              #
-#               RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba')                       #
+#               RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/', Timeout=0, ...)                #
+#               RunRman(RCV, ErrChk=True, ConnectString='target /', Timeout=0, ...)              #
+#               RenderTable(Columns, Headings, Format='fixed', Justify='', Widths=[], ...)       #
+#               ResolveConnectString(Target, DefaultUser='', Passwd='')                          #
+#               ReadSqlIds(File, Ids)                                                            #
+#               ResultSet(sel, Columns=[], ConnectString='/ as sysdba')                          #
+#               RmanSizeToBytes(Size)                                                            #
+#               RowEmitter(Columns, Format='csv', Outfile=None, Name='', Types='')               #
+#               RunProcess(Cmd, Input='', Timeout=0, MaxOutput=0, AbortOnError=False, ...)       #
+#               RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba', Timeout=0, ...)       #
+#               RunStatusError(Status, Cmd, Timeout=0, MaxOutput=0, Stdout='')                   #
+#               StreamRman(RCV, ConnectString='target /')                                        #
+#               StreamSqlplus(Sql, ConnectString='/ as sysdba', Colsep='!~!', ...)               #
+#               StreamSqlplusScript(Sql, Colsep='!~!')                                           #
 #               SetOracleEnv(Sid, Oratab='/etc/oratab')                                          #
-#               TnsCheck(TnsName)                                                                #
+#               SqlplusHeader()                                                                  #
+#               SqlplusSession(ConnectString='/ as sysdba', Settings='')                         #
+#               SqlTextIndex(IndexDir='', ConnectString='/ as sysdba')                           #
+#               TnsCheck(TnsName, Timeout=5)                                                     #
+#               TnsResolver(TnsAdmin='')                                                         #
 #               ValidateDate(DateStr)                                                            #
 #               WriteFile(Filename, Text, Append=False)                                          #
 #                                                                                                #
@@ -74,19 +117,107 @@
 #                                  Added ResultSet class.                                        #
 # 09/05/2017 2.40 Randy Johnson    updated the LoadOratab() function to reduce code and improve  #
 #                                  efficiency.                                                   #
+# 10/18/2026 2.41 Randy Johnson    Added StreamRman(), ParseRmanOutput(), CompileErrorCheck()    #
+#                                  and RmanSizeToBytes() for streaming LIST/REPORT output.       #
+# 10/18/2026 2.42 Randy Johnson    Added the DgmgrlSession class and the ParseDgConfiguration(), #
+#                                  ParseDgDatabase() and ParseDgLag() functions.                 #
+# 10/18/2026 2.43 Randy Johnson    Added GetInstances(). Finds running instances through /proc   #
+#                                  instead of parsing ps -ef output.                             #
+# 10/18/2026 2.44 Randy Johnson    Added RenderTable(), ConvertSizes() and FormatNumbers() for   #
+#                                  column-at-a-time report formatting. ConvertSize() no longer   #
+#                                  fails on 0.                                                   #
+# 10/18/2026 2.45 Randy Johnson    Added StreamSqlplus(), EmitSqlplus() and the RowEmitter class #
+#                                  for streaming csv/tsv/json report output.                     #
+# 10/18/2026 2.46 Randy Johnson    Added the SqlplusSession class, a long lived sqlplus session. #
+# 10/18/2026 2.47 Randy Johnson    Added the PlanCache class, an on disk cache of execution      #
+#                                  plans keyed by DBID, SQL_ID and plan hash, and                #
+#                                  ParseOutlineHints().                                          #
+# 10/18/2026 2.48 Randy Johnson    Added PlanHistorySql() and the PlanChangeDetector class for   #
+#                                  streaming AWR plan regression scans.                          #
+# 10/18/2026 2.49 Randy Johnson    Added the SqlTextIndex class, a local trigram index of SQL    #
+#                                  text, and InList().                                           #
+# 10/18/2026 2.50 Randy Johnson    Added the ParameterStore class, a local store of parameter    #
+#                                  snapshots with instance and time diffs. Added Environ to      #
+#                                  StreamSqlplus().                                              #
+# 10/18/2026 2.51 Randy Johnson    Added GetParameters(), batched and memoized. GetParameter()   #
+#                                  is now a wrapper around it.                                   #
+# 10/18/2026 2.52 Randy Johnson    GetDbState() checks for a pmon in /proc before starting       #
+#                                  sqlplus, caches states for the run and queries through a      #
+#                                  pooled session. Added GetSession(), CloseSessions(),          #
+#                                  DbStateSql() and ParseDbState().                              #
+# 10/18/2026 2.53 Randy Johnson    Added the MessageCatalog class, a full text index of the      #
+#                                  installed error messages, and ParseMessageFile().             #
+# 10/18/2026 2.54 Randy Johnson    Added RunProcess(). RunSqlplus(), RunRman() and RunDgmgrl()   #
+#                                  take a Timeout, MaxOutput and AbortOnError and kill the       #
+#                                  process group when one is hit.                                #
+# 10/18/2026 2.55 Randy Johnson    Split SqlplusHeader() out of RunSqlplus() and                 #
+#                                  StreamSqlplusScript() out of StreamSqlplus() so the           #
+#                                  coroutines in OracleAsync.py build the same scripts.          #
+#                                  CompileErrorCheck() takes an OracleHome.                      #
+# 10/18/2026 2.56 Randy Johnson    ParseConnectString() looks a missing password up in the       #
+#                                  password file before prompting. Added LoadTargets(),          #
+#                                  ResolveConnectString() and PasswdFilename() for fleet.        #
+#                                  GetPassword() returns '' if there's no password file.         #
+# 10/18/2026 2.57 Randy Johnson    Added the TnsResolver class, reads tnsnames.ora and           #
+#                                  sqlnet.ora (IFILEs included) and checks the listeners of      #
+#                                  many aliases at once. TnsCheck() uses it instead of running   #
+#                                  tnsping.                                                      #
+# 10/18/2026 2.58 Randy Johnson    Added the RedoHistory class, a local store of the log switch  #
+#                                  history pulled incrementally by thread and sequence#, with    #
+#                                  day/week by hour histograms.                                  #
+# 10/18/2026 2.59 Randy Johnson    Added the ContainerPool class, runs a query in each PDB       #
+#                                  through a pool of sessions (alter session set container)      #
+#                                  with a per PDB cache.                                         #
+# 10/18/2026 2.60 Randy Johnson    ResultSet keeps the result column by column, numbers in typed #
+#                                  arrays and strings dictionary encoded, and streams the rows   #
+#                                  in from sqlplus. Added column() and codes().                  #
+# 10/19/2026 2.61 Randy Johnson    GetDbState() only reuses a state found earlier in the run     #
+#                                  with UseCache=True, so a startup/shutdown is seen.            #
+#                                  GetParameters() only caches with CacheTtl > 0 (default is 0), #
+#                                  and its cache file moved from /tmp to PrivateDir().           #
+#                                  InList() puts a few values to a line (sqlplus SP2-0027).      #
+#                                  PlanCache uses InList() for its SQL IDs and keeps the error   #
+#                                  of a failed login. Added ReadSqlIds() for the plan scripts.   #
+#                                  GetInstances() looks for mdb_pmon_ (-MGMTDB) and keeps its    #
+#                                  cache in PrivateDir().                                        #
+#                                  PlanChangeDetector takes the busiest plan of a snapshot as    #
+#                                  the baseline. Added PlanRegressionReport() for the --scan     #
+#                                  report.                                                       #
+#                                  RunSqlplus(), RunRman(), RunDgmgrl() return (rc, Stdout) when #
+#                                  ErrChk=False and a limit is set, so a cut short run shows.    #
+#                                  ParseConnectString() only reads the password file when        #
+#                                  $PASSWD_FILE is set.                                          #
+#                                  SqlplusSession.stream() feeds the script from a thread so a   #
+#                                  big script with big output can't deadlock.                    #
+#                                  PlanCache.plans() and fetch() work in batches.                #
+#                                  RunProcess() uses start_new_session on Python 3.              #
+#                                  SqlTextIndex keeps its index in PrivateDir().                 #
+#                                  SqlTextIndex joins the chunks of a statement without a blank. #
+#                                  ParameterStore keeps its snapshots in PrivateDir().           #
+#                                  MessageCatalog keeps its catalog in PrivateDir().             #
+#                                  RedoHistory keeps its store in PrivateDir().                  #
+#                                  ContainerPool keeps its cache in PrivateDir().                #
+#                                  PlanCache keeps its plans in PrivateDir().                    #
+#                                  ContainerPool.collect() lists the containers it left out, not #
+#                                  open, in closed. Added root().                                #
+#                                  EmitSqlplus() reports rejected rows on stderr and returns 1.  #
+#                                  GetInstances() adds a Type (DB, ASM, APX or MGMTDB).          #
+#                                  RunProcess() can return stderr on its own (Stderr).           #
 #                                                                                                #
 ##################################################################################################
 
 # --------------------------------------
 # ---- Import Python Modules -----------
 # --------------------------------------
+import gzip
+import threading
 import traceback
 
+from array        import array
+from bisect       import bisect_right
 from datetime     import datetime
 from getpass      import getpass
-from math         import floor
-from math         import log
-from math         import pow
+from json         import dumps
 from subprocess   import PIPE
 from subprocess   import Popen
 from subprocess   import STDOUT
@@ -94,14 +225,21 @@ from os           import environ
 from os           import access
 from os           import path
 from os           import walk
+from os           import listdir
 from os           import getpgid
 from os           import unlink
 from os           import getpgid
 from os           import unlink
+from os           import makedirs
+from os           import rename
+from os           import stat
+from os           import getpid
 from os           import W_OK as WriteOk
 from os           import R_OK as ReadOk
 from os           import X_OK as ExecOk
 from os.path      import basename
+from os.path      import dirname
+from os.path      import isdir
 from os.path      import isfile
 from os.path      import join as pathjoin
 from re           import match
@@ -110,6 +248,7 @@ from re           import IGNORECASE
 from re           import compile
 from sys          import exit
 from sys          import exc_info
+from sys          import stderr
 from sys          import stdout as termout
 from sys          import version_info
 from signal       import SIGPIPE
@@ -117,6 +256,7 @@ from signal       import SIG_DFL
 from signal       import signal
 from time         import strptime
 from time         import sleep
+from xml.etree.ElementTree import XMLParser
 
 
 # ------------------------------------------------
@@ -126,9 +266,13 @@ if (version_info[0] >= 3):
   import pickle
   from configparser import SafeConfigParser
   from base64       import b64decode
+  from queue        import Queue
+  from queue        import Empty
 else:
   import cPickle as pickle
   from ConfigParser import SafeConfigParser
+  from Queue        import Queue
+  from Queue        import Empty
 # ------------------------------------------------
 
 # For handling termination in stdout pipe; ex: when you run: oerrdump | head
@@ -140,46 +284,201 @@ signal(SIGPIPE, SIG_DFL)
 PyMaxVer = 3.4
 PyMinVer = 2.4
 
+# Parameter values memoized by GetParameters().
+ParameterMemo = {}
+
+# Instance states found by GetDbState() and the running pmons it checked,
+# and the sqlplus sessions handed out by GetSession(), for the life of the run.
+DbStateCache = {}
+PmonSids     = {}
+SessionPool  = {}
+
+# tnsnames.ora and sqlnet.ora entries parsed by TnsResolver, by file, with the
+# (file, mtime, size) of the file and every IFILE it pulled in.
+TnsCache = {}
+TnsToken = compile(r'[()=]|"[^"]*"|[^\s()=]+')
+
+# Return codes of a command RunProcess() had to kill, and the errors that
+# end a run when AbortOnError is set (the database or listener isn't there,
+# the login failed or the connection was lost).
+RcTimeout   = 124
+RcTruncated = 125
+RcAborted   = 126
+FatalErrors = ['ORA-01012', 'ORA-01017', 'ORA-01033', 'ORA-01034', 'ORA-01089', 'ORA-01090',
+               'ORA-03113', 'ORA-03114', 'ORA-03135', 'ORA-12154', 'ORA-12514', 'ORA-12528',
+               'ORA-12537', 'ORA-12541', 'ORA-12560', 'RMAN-04005', 'RMAN-04006', 'RMAN-04014']
+
 # -------------------------------------------------
 # ---- Function and Class Definitions ------------
 # -------------------------------------------------
 # ---------------------------------------------------------------------------
 # Clas: ResultSet()
-# Desc: Runs a query in sqlplus
+# Desc: Runs a query in sqlplus and keeps the result column by column rather
+#       than as rows of strings. Each column is held in an array:
+#         n - whole numbers, an array of longs.
+#         f - other numbers, an array of doubles (empty values are NaN).
+#         s - anything else, dictionary encoded: an array of codes into the
+#             list of the column's distinct values, so values like owner,
+#             status or object type are held once however many rows have
+#             them.
+#       A column is only stored as n or f if every value converts back to
+#       exactly what sqlplus printed, so rows read the same as they did.
+#
+#       Rows are still there for existing callers: get_table(), indexing and
+#       iterating the ResultSet give each row as a list of strings, built
+#       when it's asked for. Callers that aggregate can take a column by name
+#       (or position) with column(), numeric columns come back as the array
+#       itself, or codes() for the codes and distinct values of a column.
+#       Rows that don't have one value per column are counted in rejected.
+#
+#       Rs = ResultSet("select owner, object_type, count(*) from dba_objects group by owner, object_type",
+#                      ['owner', 'type', 'count'])
+#       Total = sum(Rs.column('count'))
+# Args: sel, the query (without the ;).
+#       Columns, list of column names (default is c1, c2, ...).
+#       ConnectString, used for connecting to the database.
 # ---------------------------------------------------------------------------
 class ResultSet:
-  def __init__(self, sel):
-    self.table = []
+  def __init__(self, sel, Columns=[], ConnectString='/ as sysdba'):
+    self.columns = list(Columns)
+    self.kinds = []
+    self.data = []                           # one array per column
+    self.values = []                         # distinct values of each s column
     self.row_count = 0
+    self.rejected = 0
     self.errors = []
     self.rc = 0
     self.stdout = ''
-    colsep = '~'
-    Sql  = "set pagesize      0\n"
-    Sql += "set heading     off\n"
-    Sql += "set lines     32767\n"
-    Sql += "set feedback    off\n"
-    Sql += "set echo        off\n"
-    Sql += "set colsep      '" + colsep + "'\n"
-    Sql += "\n"
-    Sql += sel + ';'
-
-    (self.rc, self.stdout, self.errors) = RunSqlplus(Sql, True, ConnectString = "/ as sysdba")
-    if (self.rc == 0):
-      for row in self.stdout.split('\n'):
-        columns = map(str.strip,row.split(colsep))
-        self.table.append(columns)
-      self.row_count = len(self.table)
-    else:
-      self.table.append([])
+
+    Codes = None                             # {value: code} of each column while loading
+    for Row in StreamSqlplus(sel + ';', ConnectString, ErrorList=self.errors):
+      if (Codes is None):
+        if (self.columns == []):
+          self.columns = ['c' + str(i + 1) for i in range(len(Row))]
+        self.data = [array('i') for Column in self.columns]
+        self.values = [[] for Column in self.columns]
+        Codes = [{} for Column in self.columns]
+      if (len(Row) != len(self.columns)):
+        self.rejected += 1
+        continue
+      for i in range(len(Row)):
+        Code = Codes[i].get(Row[i])
+        if (Code is None):
+          Code = len(self.values[i])
+          Codes[i][Row[i]] = Code
+          self.values[i].append(Row[i])
+        self.data[i].append(Code)
+      self.row_count += 1
+    Codes = None
+
+    if (self.errors != []):
+      self.rc = 1
+      self.stdout = '\n'.join([Error[1] for Error in self.errors])
+      self.data = [array('i') for Column in self.columns]
+      self.values = [[] for Column in self.columns]
       self.row_count = 0
 
+    for i in range(len(self.columns)):
+      self.kinds.append(self.store(i))
+
+  def float_text(self, Value):
+    # A float the way sqlplus prints it (.5, -1.25, 3), '' for NaN.
+    if (Value != Value):
+      return('')
+    Text = repr(Value)
+    if (Text.endswith('.0')):
+      Text = Text[:-2]
+    if (Text.startswith('0.')):
+      Text = Text[1:]
+    elif (Text.startswith('-0.')):
+      Text = '-' + Text[2:]
+    return(Text)
+
+  def store(self, i):
+    # Picks the storage for column i from its distinct values and converts it.
+    Values = self.values[i]
+    Codes  = self.data[i]
+    try:
+      Numbers = [int(Value) for Value in Values]
+      if ([str(Number) for Number in Numbers] == Values):
+        self.data[i] = array('l', (Numbers[Code] for Code in Codes))
+        self.values[i] = None
+        return('n')
+    except (ValueError, OverflowError):
+      pass
+    try:
+      Numbers = [float(Value) if Value != '' else float('nan') for Value in Values]
+      if (Values != [] and [self.float_text(Number) for Number in Numbers] == Values):
+        self.data[i] = array('d', (Numbers[Code] for Code in Codes))
+        self.values[i] = None
+        return('f')
+    except ValueError:
+      pass
+    if (len(Values) <= 256):
+      self.data[i] = array('B', Codes)
+    elif (len(Values) <= 65536):
+      self.data[i] = array('H', Codes)
+    return('s')
+
+  def column_index(self, Name):
+    if (isinstance(Name, int)):
+      return(Name)
+    return(self.columns.index(Name))
+
+  def kind(self, Name):
+    return(self.kinds[self.column_index(Name)])
+
+  def column(self, Name):
+    # Numeric columns as their array, others as a list of strings.
+    i = self.column_index(Name)
+    if (self.kinds[i] == 's'):
+      Values = self.values[i]
+      return([Values[Code] for Code in self.data[i]])
+    return(self.data[i])
+
+  def codes(self, Name):
+    # (array of codes, list of distinct values) of a dictionary encoded column.
+    i = self.column_index(Name)
+    if (self.kinds[i] != 's'):
+      raise ValueError('Column ' + str(Name) + ' is numeric, use column()')
+    return(self.data[i], self.values[i])
+
+  def row(self, r):
+    Row = []
+    for i in range(len(self.columns)):
+      if (self.kinds[i] == 's'):
+        Row.append(self.values[i][self.data[i][r]])
+      elif (self.kinds[i] == 'n'):
+        Row.append(str(self.data[i][r]))
+      else:
+        Row.append(self.float_text(self.data[i][r]))
+    return(Row)
+
+  def __len__(self):
+    return(self.row_count)
+
+  def __getitem__(self, r):
+    if (isinstance(r, slice)):
+      return([self.row(i) for i in range(*r.indices(self.row_count))])
+    if (r < 0):
+      r += self.row_count
+    if (r < 0 or r >= self.row_count):
+      raise IndexError('ResultSet row out of range')
+    return(self.row(r))
+
+  def __iter__(self):
+    for r in range(self.row_count):
+      yield self.row(r)
+
   def print_table(self):
-    for row in self.table:
+    for row in self:
       print(row)
 
   def get_table(self):
-      return self.table
+    # Row view of the result (the ResultSet itself), [[]] if the query failed.
+    if (self.rc != 0):
+      return([[]])
+    return(self)
 
   def get_row_count(self):
     return self.row_count
@@ -188,7 +487,10 @@ class ResultSet:
     return self.errors
 
   def get_sqlout(self):
-    return self.stdout
+    # The error output if the query failed, otherwise the rows rebuilt as text.
+    if (self.rc != 0):
+      return self.stdout
+    return('\n'.join(['~'.join(Row) for Row in self]))
 
   def get_resultcode(self):
     return self.rc
@@ -353,25 +655,56 @@ def GetRedologInfo():
 
 # Def : ConvertSize()
 # Desc: Reduces the size of a number from Bytes .. Yeta Bytes
-# Args: s    = numeric_string
-#       tSep = thousands_separation_character (default is ',')
-#       dSep = decimal_separation_character (default is '.')
+# Args: bytes = number of bytes
 # Retn: formatted string
 #---------------------------------------------------------------------------
 def ConvertSize(bytes):
-   size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-   i = int(floor(log(bytes,1024)))
-   p = pow(1024,i)
-   s = round(bytes/p,2)
-
-   if (s > 0):
-       return '%s %s' % (s,size_name[i])
-   else:
-       return '0B'
+  return(ConvertSizes([bytes])[0])
 # ---------------------------------------------------------------------------
 # End ConvertSize()
 # ---------------------------------------------------------------------------
 
+
+# ---------------------------------------------------------------------------
+# Def : ConvertSizes()
+# Desc: Batched version of ConvertSize(). Scales a whole column of byte
+#       counts at once using a table of powers of 1024 (no log/pow per value).
+# Args: Values = list of byte counts.
+#       Unit   = '' (default) pick the unit for each value,
+#                'auto' pick one unit for the whole column from the largest value,
+#                or one of B, KB, MB, GB, ... to scale everything to that unit.
+# Retn: list of formatted strings, ex. ['1.5 GB', '0B', '12.0 MB']
+#---------------------------------------------------------------------------
+def ConvertSizes(Values, Unit=''):
+  SizeNames  = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+  SizePowers = [1024 ** i for i in range(len(SizeNames))]
+  Sizes      = []
+
+  if (Unit == 'auto'):
+    Biggest = max([0] + [v for v in Values if v is not None])
+    Unit    = SizeNames[max(bisect_right(SizePowers, Biggest) - 1, 0)]
+
+  if (Unit != ''):
+    i = SizeNames.index(Unit.upper())
+    p = float(SizePowers[i])
+    for bytes in Values:
+      if (bytes is None or bytes <= 0):
+        Sizes.append('0B')
+      else:
+        Sizes.append('%s %s' % (round(bytes / p, 2), SizeNames[i]))
+  else:
+    for bytes in Values:
+      if (bytes is None or bytes <= 0):
+        Sizes.append('0B')
+      else:
+        i = bisect_right(SizePowers, bytes) - 1
+        Sizes.append('%s %s' % (round(bytes / float(SizePowers[i]), 2), SizeNames[i]))
+
+  return(Sizes)
+# ---------------------------------------------------------------------------
+# End ConvertSizes()
+# ---------------------------------------------------------------------------
+
 # ---------------------------------------------------------------------------
 # Def : ValidateDate()
 # Desc: Validates a string as a valid date format.
@@ -426,6 +759,10 @@ def ValidateDate(DateStr):
 #         3) username/password
 #         4) username@tnsname
 #         3) username/password@tnsname.
+#       When $PASSWD_FILE is set a missing password is looked up in that
+#       file (see GetPassword()) by tnsname and username before prompting
+#       for it, so scripts can be run without a terminal (ex: by fleet).
+#       Without $PASSWD_FILE the password is always prompted for.
 # Args: string representing a complete/partitial connect string.
 # Retn: tuple of Username, Password, TnsName
 # ---------------------------------------------------------------------------
@@ -454,6 +791,9 @@ def ParseConnectString(InStr):
       else:
         Username = raw_input('\nEnter user name: ')
 
+    if (Password == '' and TnsName != '' and 'PASSWD_FILE' in environ and isfile(environ['PASSWD_FILE'])):
+      Password = GetPassword(TnsName, Username, True, environ['PASSWD_FILE'])
+
     if (Password == ''):
       Password = getpass('\nEnter password: ')
 
@@ -523,35 +863,294 @@ def CheckPythonVersion():
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Clas: TnsResolver()
+# Desc: Reads tnsnames.ora and sqlnet.ora without any Oracle tools, resolves
+#       net service names to their addresses and checks that the listeners
+#       answer, many at a time. IFILE= entries are followed (relative paths
+#       are taken from the directory of the file that names them). An alias
+#       without a domain is also looked up with NAMES.DEFAULT_DOMAIN from
+#       sqlnet.ora. A connect descriptor, (DESCRIPTION=...), or an easy
+#       connect string, [//]host[:port][/service], resolves to itself.
+#
+#       Parsed files are kept in TnsCache for the life of the run and only
+#       read again when the mtime or size of one of them (IFILEs included)
+#       changes.
+#
+#       The sweep opens a TCP connection to each listener, each distinct
+#       host:port only once however many aliases point at it, and reports
+#       how long the connect took. A listener that answers is as far as
+#       tnsping goes too.
+#
+#       Resolver = TnsResolver()
+#       Addresses = Resolver.resolve('ORCL')
+#       for (Alias, Protocol, Host, Port, Ok, Ms, Error) in Resolver.sweep(Timeout=3):
+#         ...
+# Args: TnsAdmin, directory of tnsnames.ora and sqlnet.ora. Default is
+#       $TNS_ADMIN or $ORACLE_HOME/network/admin.
+# ---------------------------------------------------------------------------
+class TnsResolver:
+  def __init__(self, TnsAdmin=''):
+    if (TnsAdmin == ''):
+      if ('TNS_ADMIN' in environ.keys()):
+        TnsAdmin = environ['TNS_ADMIN']
+      else:
+        TnsAdmin = pathjoin(environ.get('ORACLE_HOME', ''), 'network', 'admin')
+    self.tns_admin = TnsAdmin
+    self.tnsnames = pathjoin(TnsAdmin, 'tnsnames.ora')
+    self.sqlnet = pathjoin(TnsAdmin, 'sqlnet.ora')
+    self.errors = []
+    self.entries = self.load(self.tnsnames)
+    self.domain = ''
+    for (Name, Value) in self.load(self.sqlnet).items():
+      if (Name == 'NAMES.DEFAULT_DOMAIN' and not isinstance(Value, list)):
+        self.domain = Value.upper()
+
+  def tokens(self, Text):
+    # ( ) = and words, comments (# to the end of the line) dropped.
+    Tokens = []
+    for line in Text.split('\n'):
+      Tokens.extend(TnsToken.findall(line.split('#', 1)[0]))
+    return(Tokens)
+
+  def parse_value(self, Tokens, i, Nested=False):
+    # Returns (Value, i). A value is either a string or a list of (NAME, Value)
+    # pairs, one for each (NAME = Value) in a row. Outside of ( ) a string
+    # value is one word, the next word starts the next entry.
+    if (i >= len(Tokens) or Tokens[i] != '('):
+      if (not Nested):
+        if (i < len(Tokens)):
+          return(Tokens[i].strip('"'), i + 1)
+        return('', i)
+      Words = []
+      while (i < len(Tokens) and not Tokens[i] in ('(', ')')):
+        if (Tokens[i] != '='):
+          Words.append(Tokens[i].strip('"'))
+        i += 1
+      return(' '.join(Words), i)
+
+    Pairs = []
+    while (i < len(Tokens) and Tokens[i] == '('):
+      i += 1
+      Name = ''
+      if (i < len(Tokens) and not Tokens[i] in ('(', ')', '=')):
+        Name = Tokens[i].upper()
+        i += 1
+      Value = ''
+      if (i < len(Tokens) and Tokens[i] == '='):
+        (Value, i) = self.parse_value(Tokens, i + 1, True)
+      Depth = 0
+      while (i < len(Tokens)):                # skip anything left to the closing )
+        if (Tokens[i] == '('):
+          Depth += 1
+        elif (Tokens[i] == ')'):
+          if (Depth == 0):
+            i += 1
+            break
+          Depth -= 1
+        i += 1
+      Pairs.append((Name, Value))
+    return(Pairs, i)
+
+  def parse(self, Filename, Stamps, Seen):
+    # Returns {NAME: Value} for every NAME = Value in the file and its IFILEs.
+    Entries = {}
+    Filename = path.abspath(Filename)
+    if (Filename in Seen):
+      return(Entries)
+    Seen.add(Filename)
+    try:
+      Stat = stat(Filename)
+      hFile = open(Filename)
+      Text = hFile.read()
+      hFile.close()
+    except (IOError, OSError):
+      if (Stamps != []):
+        self.errors.append('Cannot open IFILE: ' + Filename)
+      Stamps.append((Filename, 0, -1))
+      return(Entries)
+    Stamps.append((Filename, Stat.st_mtime, Stat.st_size))
+
+    Tokens = self.tokens(Text)
+    i = 0
+    while (i < len(Tokens)):
+      Names = Tokens[i]
+      i += 1
+      while (i < len(Tokens) and (Names.endswith(',') or Tokens[i].startswith(',')) and not Tokens[i] in ('(', ')', '=')):
+        Names += Tokens[i]                    # ALIAS1, ALIAS2 = ...
+        i += 1
+      if (Names in ('(', ')', '=') or i >= len(Tokens) or Tokens[i] != '='):
+        continue
+      (Value, i) = self.parse_value(Tokens, i + 1)
+      for Name in Names.upper().split(','):
+        if (Name == 'IFILE' and not isinstance(Value, list)):
+          Entries.update(self.parse(pathjoin(dirname(Filename), Value), Stamps, Seen))
+        elif (Name != ''):
+          Entries[Name] = Value
+    return(Entries)
+
+  def load(self, Filename):
+    if (Filename in TnsCache):
+      (Stamps, Entries) = TnsCache[Filename]
+      Changed = False
+      for (File, Mtime, Size) in Stamps:
+        try:
+          Stat = stat(File)
+          if (Stat.st_mtime != Mtime or Stat.st_size != Size):
+            Changed = True
+        except OSError:
+          if (Size != -1):
+            Changed = True
+      if (not Changed):
+        return(Entries)
+    Stamps = []
+    Entries = self.parse(Filename, Stamps, set())
+    TnsCache[Filename] = (Stamps, Entries)
+    return(Entries)
+
+  def aliases(self):
+    return(sorted(self.entries.keys()))
+
+  def lookup(self, Alias):
+    # Returns the connect descriptor of an alias, or None if it can't be resolved.
+    Alias = Alias.strip()
+    if (Alias.startswith('(')):
+      return(self.parse_value(self.tokens(Alias), 0, True)[0])
+    Name = Alias.upper()
+    if (Name in self.entries):
+      return(self.entries[Name])
+    if (self.domain != '' and not '.' in Name and Name + '.' + self.domain in self.entries):
+      return(self.entries[Name + '.' + self.domain])
+    MatchObj = match(r'(//)?([\w.-]+|\[[0-9a-fA-F:]+\])(:(\d+))?(/\S*)?$', Alias)
+    if (MatchObj and (MatchObj.group(1) or MatchObj.group(3) or MatchObj.group(5))):
+      Address = [('PROTOCOL', 'TCP'), ('HOST', MatchObj.group(2).strip('[]')), ('PORT', MatchObj.group(4) or '1521')]
+      return([('DESCRIPTION', [('ADDRESS', Address)])])
+    return(None)
+
+  def addresses(self, Descriptor):
+    # Every (PROTOCOL, HOST, PORT) in a connect descriptor, in order.
+    Addresses = []
+    if (not isinstance(Descriptor, list)):
+      return(Addresses)
+    for (Name, Value) in Descriptor:
+      if (Name == 'ADDRESS' and isinstance(Value, list)):
+        Parms = dict([Pair for Pair in Value if not isinstance(Pair[1], list)])
+        Protocol = Parms.get('PROTOCOL', 'TCP').upper()
+        if (Protocol in ('TCP', 'TCPS')):
+          Addresses.append((Protocol, Parms.get('HOST', ''), Parms.get('PORT', '1521')))
+        else:
+          Addresses.append((Protocol, Parms.get('HOST', ''), Parms.get('PORT', '')))
+      else:
+        Addresses.extend(self.addresses(Value))
+    return(Addresses)
+
+  def resolve(self, Alias):
+    # Returns a list of (PROTOCOL, HOST, PORT), or None if the alias isn't known.
+    Descriptor = self.lookup(Alias)
+    if (Descriptor is None):
+      return(None)
+    return(self.addresses(Descriptor))
+
+  def probe(self, Host, Port, Timeout=3):
+    # Returns (Ok, Ms, Error) for one TCP connect.
+    from socket import create_connection
+    from socket import error as SocketError
+    from time   import time
+
+    Start = time()
+    try:
+      Sock = create_connection((Host, int(Port)), Timeout)
+      Sock.close()
+    except (SocketError, ValueError):
+      return(False, None, str(exc_info()[1]))
+    return(True, round((time() - Start) * 1000, 1), '')
+
+  def sweep(self, Aliases=None, Timeout=3, Parallel=64):
+    # Checks every address of every alias in Aliases (all aliases if None),
+    # Parallel at a time. Returns a list of
+    #   (Alias, Protocol, Host, Port, Ok, Ms, Error)
+    # one per address, in the order of Aliases. Ms is the connect time in
+    # milliseconds (None if it failed). Ok is None for addresses that aren't
+    # TCP (IPC, BEQ, ...), they can't be checked from here.
+    if (Aliases is None):
+      Aliases = self.aliases()
+
+    Resolved = []
+    Probes = {}
+    for Alias in Aliases:
+      Addresses = self.resolve(Alias)
+      Resolved.append((Alias, Addresses))
+      for (Protocol, Host, Port) in Addresses or []:
+        if (Protocol in ('TCP', 'TCPS')):
+          Probes[(Host, Port)] = None
+
+    Work = Queue()
+    for Endpoint in Probes:
+      Work.put(Endpoint)
+
+    def Worker():
+      while True:
+        try:
+          (Host, Port) = Work.get_nowait()
+        except Empty:
+          return
+        Probes[(Host, Port)] = self.probe(Host, Port, Timeout)
+
+    Threads = []
+    for i in range(max(1, min(Parallel, len(Probes)))):
+      Thread = threading.Thread(target=Worker)
+      Thread.daemon = True
+      Thread.start()
+      Threads.append(Thread)
+    for Thread in Threads:
+      Thread.join()
+
+    Results = []
+    for (Alias, Addresses) in Resolved:
+      if (Addresses is None):
+        Results.append((Alias, '', '', '', False, None, 'TNS-03505: Failed to resolve name'))
+      elif (Addresses == []):
+        Results.append((Alias, '', '', '', False, None, 'TNS-12533: TNS:illegal ADDRESS parameters'))
+      for (Protocol, Host, Port) in Addresses or []:
+        if ((Host, Port) in Probes and Protocol in ('TCP', 'TCPS')):
+          Results.append((Alias, Protocol, Host, Port) + Probes[(Host, Port)])
+        else:
+          Results.append((Alias, Protocol, Host, Port, None, None, 'protocol not checked'))
+    return(Results)
+# ---------------------------------------------------------------------------
+# End TnsResolver()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Sub : TnsCheck()
-# Desc: Verifies a tnsping lookup
-# Args: ORACLE_SID
+# Desc: Verifies a TNS lookup, the way tnsping does: the name is resolved
+#       through tnsnames.ora (see TnsResolver) and a TCP connection is made
+#       to its listener address(es). No tnsping process is started.
+# Args: TnsName, alias, connect descriptor or easy connect string.
+#       Timeout, seconds to wait for each listener.
 # Retn: 0 if successful, 1 if TNS Lookup failed (TNS-03505), >1 Other errors
 # ----------------------------------------------------------------------------
-def TnsCheck(TnsName):
-  rc           = 0
-  TnsRc        = 0
-  TnsOut       = ''
-  TnsErr       = ''
-  ErrorStack   = []
-  Tnsping      = pathjoin(environ['ORACLE_HOME'], 'bin', 'tnsping')
-
-  try:
-    proc = Popen([Tnsping, TnsName], stdin=PIPE, stdout=PIPE, stderr=STDOUT, shell=False)
-    (Tnsout, TnsErr) = proc.communicate()
-  except:
-    print('\n%s' % traceback.format_exc())
-    print('tnsping failed: %s (check tnsnames.ora file)' %s )
-    return(proc.returncode)
-
-  Tnsout = Tnsout.strip()
-
-  ComponentList = ['network']
-  (rc, ErrorList) = ErrorCheck(Tnsout, ComponentList)
-
-  if (rc != 0):
-    PrintError(Tnsping + " " + TnsName, Tnsout, ErrorList)
+def TnsCheck(TnsName, Timeout=5):
+  Resolver = TnsResolver()
+  Results  = Resolver.sweep([TnsName], Timeout)
+
+  Tnsout = []
+  for (Alias, Protocol, Host, Port, Ok, Ms, Error) in Results:
+    if (Ok):
+      return(0)
+    if (Host != ''):
+      Tnsout.append('%s %s:%s - %s' % (Protocol, Host, Port, Error))
+
+  if (Results[0][6].startswith('TNS-03505')):
+    Tnsout.insert(0, 'TNS-03505: Failed to resolve name')
+    ErrorList = [['TNS-03505', Tnsout[0]]]
+    rc = 1
+  else:
+    Tnsout.insert(0, 'TNS-12541: TNS:no listener')
+    ErrorList = [['TNS-12541', Tnsout[0]]]
+    rc = 2
+  PrintError('TnsCheck ' + TnsName + ' (' + Resolver.tnsnames + ')', '\n'.join(Tnsout), ErrorList)
 
   return(rc)
 # ---------------------------------------------------------------------------
@@ -727,42 +1326,173 @@ def IsReadable(Filepath):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Def : PrivateDir()
+# Desc: Returns a directory only the current user can write to, for the
+#       small caches that are kept from one run to the next. It's $EnvVar if
+#       that's set, otherwise $HOME/Name, and it's made with mode 0700 if
+#       it isn't there yet. The files in it are unpickled, so a directory
+#       that belongs to someone else, or that group/other can write to, is
+#       not used.
+# Args: Name, directory under $HOME, ex: .oracache
+#       EnvVar, environment variable that overrides it (optional).
+# Retn: Directory name, '' if there's no safe one.
+# ---------------------------------------------------------------------------
+def PrivateDir(Name, EnvVar=''):
+  from os   import getuid
+  from os   import lstat
+  from stat import S_ISDIR
+
+  Dir = ''
+  if (EnvVar != ''):
+    Dir = environ.get(EnvVar, '')
+  if (Dir == ''):
+    if (environ.get('HOME', '') == ''):
+      return('')
+    Dir = pathjoin(environ['HOME'], Name)
+
+  if (not isdir(Dir)):
+    try:
+      makedirs(Dir, 0o700)
+    except OSError:
+      pass                                   # someone else got there first, checked below
+  try:
+    DirStat = lstat(Dir)
+  except OSError:
+    return('')
+  if (not S_ISDIR(DirStat.st_mode) or DirStat.st_uid != getuid() or DirStat.st_mode & 0o022):
+    return('')
+  return(Dir)
+# ---------------------------------------------------------------------------
+# End PrivateDir()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Def : GetParameter()
-# Desc: Calls sqlplus and retrieves 1 parameter value.
+# Desc: Retrieves 1 parameter value of the local instance. This is a wrapper
+#       around GetParameters(), and it always reads the current value.
 # Args: Parameter
 # Retn: Parameter value
 # ---------------------------------------------------------------------------
 def GetParameter(Parameter):
-  ErrChk = True
-  Sql    = ''
-  Value  = ''
-
-  Sql += "column value form a500\n"
-  Sql += "set pages 0\n"
-  Sql += "set feedback off\n"
-  Sql += "set echo off\n\n"
-  Sql += "select value\n"
-  Sql += "  from ( select sv.ksppstvl  value\n"
-  Sql += "           from sys.x$ksppi  i,\n"
-  Sql += "                sys.x$ksppsv sv\n"
-  Sql += "          where i.indx = sv.indx\n"
-  Sql += "            and i.ksppinm = '" + Parameter.lower() + "');"
+  return(GetParameters([Parameter], CacheTtl=0)[Parameter.lower()])
+# ---------------------------------------------------------------------------
+# End GetParameter()
+# ---------------------------------------------------------------------------
 
-  # Call RunSqlplus
-  # ----------------
-  (rc,Stdout,ErrorList) = RunSqlplus(Sql, ErrChk)
-  Stdout = Stdout.strip()
-  Value = Stdout
 
-  if (rc !=0):
-    print('Failure in call to sqlplus.')
-    PrintError(Sql, Stdout, ErrorList)
-    exit(rc)
+# ---------------------------------------------------------------------------
+# Def : GetParameters()
+# Desc: Retrieves any number of parameter values, hidden or documented, in
+#       one sqlplus call. Values are read fresh by default. With CacheTtl > 0
+#       they're memoized per ORACLE_SID for CacheTtl seconds, so only names
+#       that aren't already known (or have gone stale) are queried. With the
+#       default connect string the memo is also kept in a small pickle file
+#       in PrivateDir('.oracache', 'ORA_CACHE'), so it carries over from one
+#       script to the next. Don't use a CacheTtl for values that may have
+#       just been changed (alter system set ...).
+#
+#       By default values come from x$ksppi/x$ksppsv of the local instance.
+#       If Instances is given they come from gv$system_parameter for the RAC
+#       instances instead. Note that hidden parameters only show up in
+#       gv$system_parameter if they've been set.
+# Args: Names, list of parameter names.
+#       Instances, None = local instance (default), '*' = all instances, or
+#       a list of instance numbers.
+#       ConnectString, used for connecting to the database
+#       CacheTtl, seconds to reuse values for (default 0 = always query).
+# Retn: Instances = None: {'db_block_size': '8192', ...}
+#       otherwise       : {1: {'db_block_size': '8192', ...}, 2: {...}}
+#       Parameters that don't exist are returned as ''.
+# ---------------------------------------------------------------------------
+def GetParameters(Names, Instances=None, ConnectString='/ as sysdba', CacheTtl=0):
+  from time import time
+
+  Names = [Name.lower() for Name in Names]
+  Now   = time()
+  Sid   = environ.get('ORACLE_SID', '')
+  Scope = 'local'
+  if (Instances is not None):
+    Scope = 'global'
+
+  # Memo is {(Sid, ConnectString, Scope): {Name: (FetchTime, {InstId: Value})}}
+  Key = (Sid, ConnectString, Scope)
+  CacheFile = ''
+  CacheDir  = ''
+  if (CacheTtl > 0 and ConnectString == '/ as sysdba' and Sid != ''):
+    CacheDir = PrivateDir('.oracache', 'ORA_CACHE')
+  if (CacheDir != ''):
+    CacheFile = pathjoin(CacheDir, 'parameters_' + Sid + '.pkl')
+    if (not Key in ParameterMemo and isfile(CacheFile)):
+      try:
+        CacheFh = open(CacheFile, 'rb')
+        ParameterMemo.update(pickle.load(CacheFh))
+        CacheFh.close()
+      except:
+        pass
+  Memo = ParameterMemo.setdefault(Key, {})
+
+  Fetch = []
+  for Name in Names:
+    if (CacheTtl <= 0 or not Name in Memo or Now - Memo[Name][0] > CacheTtl):
+      if (not Name in Fetch):
+        Fetch.append(Name)
+
+  if (Fetch != []):
+    if (Scope == 'local'):
+      Sql  = "SELECT 0\n"
+      Sql += "     , i.ksppinm\n"
+      Sql += "     , sv.ksppstvl\n"
+      Sql += "  FROM sys.x$ksppi  i\n"
+      Sql += "     , sys.x$ksppsv sv\n"
+      Sql += " WHERE i.indx = sv.indx\n"
+      Sql += "   AND " + InList('i.ksppinm', Fetch) + ";"
+    else:
+      Sql  = "SELECT inst_id\n"
+      Sql += "     , name\n"
+      Sql += "     , value\n"
+      Sql += "  FROM gv$system_parameter\n"
+      Sql += " WHERE " + InList('name', Fetch) + ";"
+
+    ErrorList = []
+    Values    = {}
+    for Row in StreamSqlplus(Sql, ConnectString, ErrorList=ErrorList):
+      if (len(Row) >= 3):
+        Values.setdefault(Row[1], {})[int(Row[0])] = Row[2]
+
+    if (ErrorList != []):
+      print('Failure in call to sqlplus.')
+      PrintError(Sql, '\n'.join([Error[1] for Error in ErrorList]), ErrorList)
+      exit(1)
+
+    for Name in Fetch:
+      Memo[Name] = (Now, Values.get(Name, {}))
+
+    if (CacheFile != ''):
+      try:
+        TmpFile = CacheFile + '.' + str(getpid()) + '.tmp'
+        CacheFh = open(TmpFile, 'wb')
+        pickle.dump(dict([(MemoKey, ParameterMemo[MemoKey]) for MemoKey in ParameterMemo if MemoKey[0] == Sid and MemoKey[1] == ConnectString]), CacheFh, 2)
+        CacheFh.close()
+        rename(TmpFile, CacheFile)
+      except:
+        pass
 
-  return(Value)
+  if (Scope == 'local'):
+    return(dict([(Name, Memo[Name][1].get(0, '')) for Name in Names]))
+
+  InstIds = set()
+  for Name in Names:
+    InstIds.update(Memo[Name][1].keys())
+  if (Instances != '*'):
+    InstIds = InstIds & set([int(InstId) for InstId in Instances])
+  Result = {}
+  for InstId in sorted(InstIds):
+    Result[InstId] = dict([(Name, Memo[Name][1].get(InstId, '')) for Name in Names])
+  return(Result)
 # ---------------------------------------------------------------------------
-# End GetParameter()
+# End GetParameters()
 # ---------------------------------------------------------------------------
 
 
@@ -979,6 +1709,7 @@ def LoadOratab(Oratab=''):
   OratabDict = {}
   OratabList = []
   OratabLoc  = ['/etc/oratab','/var/opt/oracle/oratab']
+  otab       = ''
 
   # If an oratab file name has been passed in...
   if (Oratab != ''):
@@ -1042,6 +1773,163 @@ def LoadOratab(Oratab=''):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Def : GetInstances()
+# Desc: Finds the Oracle instances running on the local host by looking for
+#       pmon background processes in /proc. Only /proc/<pid>/comm is read for
+#       most processes (a few bytes each) and the full command line is read
+#       only for pmon processes, since comm is cut off at 15 characters.
+#       Falls back to ps -ef on systems without a Linux style /proc.
+#
+#       If CacheTtl is > 0 the result is saved to a small pickle file in
+#       PrivateDir('.oracache', 'ORA_CACHE') and reused for CacheTtl seconds
+#       as long as all the pmon processes in it are still running.
+# Args: CacheTtl (seconds, default 0 = no cache)
+# Retn: InstList = [{'Sid'       : 'ORCL1',
+#                    'Pid'       : 12345,
+#                    'Owner'     : 'oracle',
+#                    'StartTime' : '2026-10-18 08:15:02',
+#                    'Process'   : 'ora_pmon_ORCL1',
+#                    'Type'      : 'DB',
+#                    'Asm'       : False}, ...]   (sorted by Sid)
+#       Type is DB, ASM, APX (ASM proxy) or MGMTDB (Grid Infrastructure
+#       management repository). Asm is True for ASM and APX.
+# ---------------------------------------------------------------------------
+def GetInstances(CacheTtl=0):
+  from os   import stat
+  from time import time
+  from time import localtime
+  from time import strftime
+
+  InstList   = []
+  PmonPrefix = ('ora_pmon_', 'asm_pmon_', 'apx_pmon_', 'mdb_pmon_')
+
+  def InstType(Process, Sid):
+    if (Process.startswith('mdb_pmon_') or Sid.upper() == '-MGMTDB'):
+      return('MGMTDB')
+    elif (Process.startswith('apx_pmon_') or Sid.startswith('+APX')):
+      return('APX')
+    elif (Sid.startswith('+')):
+      return('ASM')
+    return('DB')
+  CacheFile  = ''
+  if (CacheTtl > 0):
+    CacheDir = PrivateDir('.oracache', 'ORA_CACHE')
+    if (CacheDir != ''):
+      CacheFile = pathjoin(CacheDir, 'instances.pkl')
+
+  # Use the cached list if it's fresh and every pmon in it is still there.
+  if (CacheFile != '' and isfile(CacheFile)):
+    try:
+      if (time() - stat(CacheFile).st_mtime <= CacheTtl):
+        CacheFh  = open(CacheFile, 'rb')
+        InstList = pickle.load(CacheFh)
+        CacheFh.close()
+        for Inst in InstList:
+          if (not 'Type' in Inst or not path.isdir('/proc/' + str(Inst['Pid']))):
+            InstList = []
+            break
+        if (InstList != []):
+          return(InstList)
+    except:
+      InstList = []
+
+  if (isfile('/proc/stat') and isfile('/proc/self/cmdline')):
+    try:
+      import pwd
+    except ImportError:
+      pwd = None
+
+    # Boot time and clock ticks, for working out when each pmon started.
+    BootTime = 0
+    try:
+      StatFh = open('/proc/stat', 'r')
+      for line in StatFh:
+        if (line.startswith('btime')):
+          BootTime = int(line.split()[1])
+          break
+      StatFh.close()
+    except:
+      pass
+    try:
+      from os import sysconf
+      ClkTck = sysconf('SC_CLK_TCK')
+    except:
+      ClkTck = 100
+
+    for Pid in listdir('/proc'):
+      if (not Pid.isdigit()):
+        continue
+      ProcDir = '/proc/' + Pid
+      try:
+        CommFh = open(ProcDir + '/comm', 'r')
+        Comm   = CommFh.read().strip()
+        CommFh.close()
+        # comm is cut off at 15 chars, so it may not have the whole SID.
+        if (not '_pmon' in Comm):
+          continue
+      except IOError:
+        pass                                       # no comm file (old kernel), check cmdline
+      try:
+        CmdFh = open(ProcDir + '/cmdline', 'r')
+        Process = CmdFh.read().split('\0')[0].strip()
+        CmdFh.close()
+      except IOError:
+        continue                                   # process went away.
+      if (not Process.startswith(PmonPrefix)):
+        continue
+
+      Sid = Process.split('_pmon_', 1)[1]
+      try:
+        Uid = stat(ProcDir).st_uid
+        if (pwd is not None):
+          Owner = pwd.getpwuid(Uid).pw_name
+        else:
+          Owner = str(Uid)
+      except:
+        Owner = ''
+
+      StartTime = ''
+      try:
+        StatFh = open(ProcDir + '/stat', 'r')
+        Stat   = StatFh.read()
+        StatFh.close()
+        # Field 22 (starttime), counted after the ")" that closes the comm field.
+        Ticks = int(Stat[Stat.rfind(')') + 2:].split()[19])
+        if (BootTime > 0):
+          StartTime = strftime('%Y-%m-%d %H:%M:%S', localtime(BootTime + (Ticks / ClkTck)))
+      except:
+        pass
+
+      InstList.append({'Sid': Sid, 'Pid': int(Pid), 'Owner': Owner, 'StartTime': StartTime, 'Process': Process, 'Type': InstType(Process, Sid), 'Asm': Sid.startswith('+')})
+  else:
+    # No /proc. Do it the old way.
+    Proc = Popen(['/bin/ps', '-eo', 'user,pid,args'], bufsize=1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, shell=False, universal_newlines=True, close_fds=True)
+    (Stdout, Stderr) = Proc.communicate()
+    for line in Stdout.strip().split('\n')[1:]:
+      Fields = line.split()
+      if (len(Fields) >= 3 and Fields[2].startswith(PmonPrefix)):
+        Sid = Fields[2].split('_pmon_', 1)[1]
+        InstList.append({'Sid': Sid, 'Pid': int(Fields[1]), 'Owner': Fields[0], 'StartTime': '', 'Process': Fields[2], 'Type': InstType(Fields[2], Sid), 'Asm': Sid.startswith('+')})
+
+  InstList.sort(key=lambda Inst: Inst['Sid'])
+
+  if (CacheFile != ''):
+    try:
+      TmpFile = CacheFile + '.' + str(getpid()) + '.tmp'
+      CacheFh = open(TmpFile, 'wb')
+      pickle.dump(InstList, CacheFh, 2)
+      CacheFh.close()
+      rename(TmpFile, CacheFile)
+    except:
+      pass
+
+  return(InstList)
+# ---------------------------------------------------------------------------
+# End GetInstances()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Def : GetAsmHome()
 # Desc: Get the Oracle Home directory for ASM
@@ -1062,43 +1950,165 @@ def GetAsmHome(Oratab='/etc/oratab'):
 
 
 # ---------------------------------------------------------------------------
-# Def : RunSqlplus()
-# Desc: Calls sqlplus and runs a sql script passed in in the Sql parameter.
-#       Optionally calls ErrorCheck() to scan for errors then calls PrintError
-#       if any are found. The call stack looks like this...
-#       CallingRoutine
-#          ^    +-----> RunSqlplus()
-#          |                +-----> ErrorCheck()
-#          |                +-----> PrintError()
-#          |                            +-----> LookupError()
-#          |                                          |
-#          |                +--> if error exit(rc)    |
-#          +------------------------------------------+
-#
-#          1) Calling routing calls RunSqlplus
-#                - 1 parameter. SQL to run (string)
-#                - Returns Result Set (1 string)
-#          2) RunSqlplus calls ErrorCheck
-#                - 2 parameters. Stdout (string), and ComponentList (List of components for looking up potential errors)
-#                - Returns 2 values. Return code (int), and ErrorStack which is a list of lists ([ErrorString, line]
-#          3) RunSqlplus calls PrintError
-#                - Only if return code from ErrorCheck != 0 (an error was found)
-#                - Calls PrintError with three parameters:
-#                    Sql       = the original SQL statement run.
-#                    Stdout    = the output generated by the sqlplus session.
-#                    ErrorList = the list of error codes and lines containing the errors (see #2 above).
-#                - Returns Stdout to calling routine.
-#
-# Args: Sql, string containing SQL to execute.
-#       ErrChk, True/False determines whether or not to check output for errors.
-#       ConnectString, used for connecting to the database
-# Retn: If ErrChk=True then return:
-#          rc (return code, integer, 0=no errors)
-#          Output (string, stdout+stderr)
-#          ErrorList (list, error stack)
-#       If ErrChk=False then return Stdout only
+# Def : RunProcess()
+# Desc: Runs a command (sqlplus, rman, dgmgrl, ...), feeds it Input and
+#       collects its output a line at a time, with limits:
+#         Timeout      - seconds the command is allowed to run.
+#         MaxOutput    - number of characters of output to keep.
+#         AbortOnError - stop at the first fatal error in the output. True
+#                        uses the FatalErrors list, or pass your own list of
+#                        error codes.
+#       The command is started in its own process group and when a limit is
+#       hit the whole group is killed, so nothing it started is left behind.
+#       0 for Timeout/MaxOutput means no limit.
+# Args: Cmd, list, the command and its arguments.
+#       Input, string written to the command's stdin.
+#       Timeout, MaxOutput, AbortOnError, see above.
+#       Env, dictionary of environment variables (default is os.environ).
+#       Stderr, list. If given, stderr is read on its own and its lines are
+#       added to it (up to MaxOutput characters), otherwise stderr is merged
+#       into Stdout.
+# Retn: rc (the command's return code, or RcTimeout, RcTruncated or RcAborted
+#          if it was killed)
+#       Stdout (string, stdout+stderr, or just stdout if Stderr is given, as
+#          much as was read)
+#       Status ('' if the command ran to the end, else 'timeout', 'truncated'
+#          or 'error')
+# ---------------------------------------------------------------------------
+def RunProcess(Cmd, Input='', Timeout=0, MaxOutput=0, AbortOnError=False, Env=None, Stderr=None):
+  from os     import killpg
+  from os     import setsid
+  from signal import SIGKILL
+
+  AbortRegex = None
+  if (AbortOnError):
+    if (AbortOnError is True):
+      AbortOnError = FatalErrors
+    AbortRegex = compile(r'\b(' + '|'.join(AbortOnError) + r')\b')
+
+  # start_new_session is safe with other threads running (fleet runs this
+  # from many), preexec_fn isn't. Python 2 only has preexec_fn.
+  if (version_info[0] >= 3):
+    NewSession = {'start_new_session': True}
+  else:
+    NewSession = {'preexec_fn': setsid}
+  StderrPipe = STDOUT
+  if (Stderr is not None):
+    StderrPipe = PIPE
+  proc = Popen(Cmd, bufsize=1, stdin=PIPE, stdout=PIPE, stderr=StderrPipe, shell=False, \
+   universal_newlines=True, close_fds=True, env=Env, **NewSession)
+
+  Status = ['']
+  def Kill(Reason):
+    if (Status[0] == ''):
+      Status[0] = Reason
+    try:
+      killpg(proc.pid, SIGKILL)
+    except OSError:
+      pass                                   # already gone
+
+  # Feed stdin from a thread so a command that writes a lot before it has
+  # read all its input can't deadlock us.
+  def Feed():
+    try:
+      proc.stdin.write(Input)
+      proc.stdin.close()
+    except (IOError, OSError, ValueError):
+      pass                                   # killed before it read it all
+  Feeder = threading.Thread(target=Feed)
+  Feeder.daemon = True
+  Feeder.start()
+
+  # A separate stderr is drained from a thread too, for the same reason.
+  Drainer = None
+  if (Stderr is not None):
+    def Drain():
+      Size = 0
+      for line in iter(lambda: proc.stderr.readline(65536), ''):
+        if (MaxOutput <= 0 or Size + len(line) <= MaxOutput):
+          Stderr.append(line.rstrip('\n'))
+          Size += len(line)
+    Drainer = threading.Thread(target=Drain)
+    Drainer.daemon = True
+    Drainer.start()
+
+  Timer = None
+  if (Timeout > 0):
+    Timer = threading.Timer(Timeout, Kill, ['timeout'])
+    Timer.daemon = True
+    Timer.start()
+
+  Lines = []
+  Size  = 0
+  Done  = False
+  try:
+    # readline() is capped so one endless line can't eat all the memory either.
+    for line in iter(lambda: proc.stdout.readline(65536), ''):
+      if (MaxOutput > 0 and Size + len(line) > MaxOutput):
+        Lines.append(line[:MaxOutput - Size])
+        Kill('truncated')
+        break
+      Lines.append(line)
+      Size += len(line)
+      if (AbortRegex is not None and AbortRegex.search(line)):
+        Kill('error')
+        break
+    Done = True
+  finally:
+    if (Timer is not None):
+      Timer.cancel()
+    if (not Done):
+      Kill('error')                          # interrupted, don't leave it running
+    proc.stdout.close()
+    if (Drainer is not None):
+      Drainer.join()
+      proc.stderr.close()
+    proc.wait()
+
+  Stdout = ''.join(Lines).rstrip()
+  if (Status[0] == 'timeout'):
+    return(RcTimeout, Stdout, Status[0])
+  elif (Status[0] == 'truncated'):
+    return(RcTruncated, Stdout, Status[0])
+  elif (Status[0] == 'error'):
+    return(RcAborted, Stdout, Status[0])
+  return(proc.returncode, Stdout, '')
+# ---------------------------------------------------------------------------
+# End RunProcess()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunStatusError()
+# Desc: Describes why RunProcess() cut a command short, in the same [Error,
+#       line] form as the entries ErrorCheck() returns, so it can be added to
+#       an error list.
+# Args: Status, Cmd (name of the command), Timeout, MaxOutput, Stdout.
+# Retn: [Error, line], ex: ['TIMEOUT', 'sqlplus killed after 30 seconds.']
+# ---------------------------------------------------------------------------
+def RunStatusError(Status, Cmd, Timeout=0, MaxOutput=0, Stdout=''):
+  if (Status == 'timeout'):
+    return(['TIMEOUT', Cmd + ' killed after ' + str(Timeout) + ' seconds.'])
+  elif (Status == 'truncated'):
+    return(['TRUNCATED', Cmd + ' killed, output exceeded ' + str(MaxOutput) + ' characters.'])
+  else:
+    Last = ''
+    if (Stdout != ''):
+      Last = Stdout.split('\n')[-1].strip()
+    return(['ABORTED', Cmd + ' killed on fatal error: ' + Last])
+# ---------------------------------------------------------------------------
+# End RunStatusError()
 # ---------------------------------------------------------------------------
-def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba'):
+
+
+# ---------------------------------------------------------------------------
+# Def : SqlplusHeader()
+# Desc: The sqlplus settings and column formats RunSqlplus() puts in front of
+#       every script.
+# Args: <none>
+# Retn: String of sqlplus commands.
+# ---------------------------------------------------------------------------
+def SqlplusHeader():
   SqlHeader = ''
 
   #SqlHeader += "-- set truncate after linesize on\n"
@@ -1248,7 +2258,56 @@ def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba'):
   SqlHeader += "column VIEW_NAME                format a30\n"
   SqlHeader += "column VIEW_TYPE                format a10\n"
 
-  Sql = SqlHeader + Sql
+  return(SqlHeader)
+# ---------------------------------------------------------------------------
+# End SqlplusHeader()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunSqlplus()
+# Desc: Calls sqlplus and runs a sql script passed in in the Sql parameter.
+#       Optionally calls ErrorCheck() to scan for errors then calls PrintError
+#       if any are found. The call stack looks like this...
+#       CallingRoutine
+#          ^    +-----> RunSqlplus()
+#          |                +-----> ErrorCheck()
+#          |                +-----> PrintError()
+#          |                            +-----> LookupError()
+#          |                                          |
+#          |                +--> if error exit(rc)    |
+#          +------------------------------------------+
+#
+#          1) Calling routing calls RunSqlplus
+#                - 1 parameter. SQL to run (string)
+#                - Returns Result Set (1 string)
+#          2) RunSqlplus calls ErrorCheck
+#                - 2 parameters. Stdout (string), and ComponentList (List of components for looking up potential errors)
+#                - Returns 2 values. Return code (int), and ErrorStack which is a list of lists ([ErrorString, line]
+#          3) RunSqlplus calls PrintError
+#                - Only if return code from ErrorCheck != 0 (an error was found)
+#                - Calls PrintError with three parameters:
+#                    Sql       = the original SQL statement run.
+#                    Stdout    = the output generated by the sqlplus session.
+#                    ErrorList = the list of error codes and lines containing the errors (see #2 above).
+#                - Returns Stdout to calling routine.
+#
+# Args: Sql, string containing SQL to execute.
+#       ErrChk, True/False determines whether or not to check output for errors.
+#       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunProcess()).
+# Retn: If ErrChk=True then return:
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if sqlplus was killed)
+#          Output (string, stdout+stderr)
+#          ErrorList (list, error stack, ends with a TIMEOUT, TRUNCATED or
+#             ABORTED entry if sqlplus was killed)
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
+# ---------------------------------------------------------------------------
+def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba', Timeout=0, MaxOutput=0, AbortOnError=False):
+  Sql = SqlplusHeader() + Sql
 
   # Unset the SQLPATH environment variable.
   if ('SQLPATH' in environ.keys()):
@@ -1278,16 +2337,21 @@ def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba'):
       print('ORACLE_HOME is not set')
       return (1, '', [])
 
-  # Start Sqlplus and login
-  Sqlproc = Popen([Sqlplus, '-S', '-L', ConnectString], stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
-   shell=False, universal_newlines=True, close_fds=True)
+  Status = ''
+  if (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    # Start Sqlplus, login and execute the SQL with limits on the run.
+    (RunRc, Stdout, Status) = RunProcess([Sqlplus, '-S', '-L', ConnectString], Sql, Timeout, MaxOutput, AbortOnError)
+  else:
+    # Start Sqlplus and login
+    Sqlproc = Popen([Sqlplus, '-S', '-L', ConnectString], stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+     shell=False, universal_newlines=True, close_fds=True)
 
-  # Execute the SQL
-  Sqlproc.stdin.write(Sql)
+    # Execute the SQL
+    Sqlproc.stdin.write(Sql)
 
-  # Fetch the output
-  Stdout, SqlErr = Sqlproc.communicate()
-  Stdout = Stdout.rstrip()
+    # Fetch the output
+    Stdout, SqlErr = Sqlproc.communicate()
+    Stdout = Stdout.rstrip()
   ###! Stdout = Stdout.strip()
 
   # Check for sqlplus errors
@@ -1312,7 +2376,12 @@ def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba'):
     # For example an ErrorList might look like this:
     # [['ORA-00001', 'ORA-00001: unique constraint...'],['ORA-00018', 'ORA-00018, 00000, "maximum number of..."']]
     (rc, ErrorList) = ErrorCheck(Stdout, ComponentList)
+    if (Status != ''):
+      rc = RunRc
+      ErrorList.append(RunStatusError(Status, 'sqlplus', Timeout, MaxOutput, Stdout))
     return(rc,Stdout,ErrorList)
+  elif (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    return(RunRc,Stdout)
   else:
     return(Stdout)
 # ---------------------------------------------------------------------------
@@ -1321,24 +2390,1889 @@ def RunSqlplus(Sql, ErrChk=False, ConnectString='/ as sysdba'):
 
 
 # ---------------------------------------------------------------------------
-# Def : RunRman()
-# Desc: Runs rman commands.
-# Args: RCV, string, containing rman commands or run block to execute.
-#       ErrChk, True/False determines whether or not to check output for errors.
+# Def : StreamSqlplusScript()
+# Desc: Builds the script StreamSqlplus() runs: its settings, then the Sql
+#       without any formatting commands, then exit.
+# Args: Sql, string containing SQL to execute.
+#       Colsep, column separator (default is !~!)
+# Retn: String of sqlplus commands.
+# ---------------------------------------------------------------------------
+def StreamSqlplusScript(Sql, Colsep='!~!'):
+  SqlHeader  = "set colsep                      \"" + Colsep + "\"\n"
+  SqlHeader += "set echo                        off\n"
+  SqlHeader += "set feedback                    off\n"
+  SqlHeader += "set heading                     off\n"
+  SqlHeader += "set linesize                    32767\n"
+  SqlHeader += "set long                        10000000\n"
+  SqlHeader += "set longchunksize               10000000\n"
+  SqlHeader += "set newpage                     none\n"
+  SqlHeader += "set null                        \"\"\n"
+  SqlHeader += "set numformat                   \"\"\n"
+  SqlHeader += "set numwidth                    40\n"
+  SqlHeader += "set pagesize                    0\n"
+  SqlHeader += "set recsep                      off\n"
+  SqlHeader += "set serveroutput                off\n"
+  SqlHeader += "set tab                         off\n"
+  SqlHeader += "set termout                     on\n"
+  SqlHeader += "set timing                      off\n"
+  SqlHeader += "set trimout                     on\n"
+  SqlHeader += "set trimspool                   on\n"
+  SqlHeader += "set underline                   off\n"
+  SqlHeader += "set verify                      off\n"
+  SqlHeader += "set wrap                        on\n"
+  SqlHeader += "\n"
+
+  # Column formats, headings, breaks, prompts and page settings are for people, drop them.
+  Skip  = compile(r'\s*(col(umn)?\s+\S+\s+(format|heading|noprint|print|justify)\b|(break|comp(ute)?|prompt|ttitle|btitle|clear)\b|' + \
+                  r'set\s+(lin|pages|head|colsep|numf|numw|und|feed|recsep|newp|wrap|trim))', IGNORECASE)
+  Lines = [line for line in Sql.split('\n') if not Skip.match(line)]
+  return(SqlHeader + '\n'.join(Lines) + '\nexit\n')
+# ---------------------------------------------------------------------------
+# End StreamSqlplusScript()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : StreamSqlplus()
+# Desc: Runs a query in sqlplus and returns the rows one at a time as sqlplus
+#       prints them, split into a list of fields. sqlplus is run with headings
+#       off, pagesize 0 and the column separator set to Colsep, and any
+#       "column ... format/heading" commands in the Sql are dropped, so the
+#       fields come back unformatted (no thousands separators, no truncation).
+#       Queries that already concatenate their own columns with Colsep work
+#       the same way.
+#       Error lines (ORA-, SP2-, ...) are not returned as rows. They're added
+#       to ErrorList, as [Error, line], if one is passed in.
+# Args: Sql, string containing SQL to execute.
 #       ConnectString, used for connecting to the database
-# Retn: If ErrChk=True then return:
-#          rc (return code, integer, 0=no errors)
-#          Output (string, stdout+stderr)
-#          ErrorList (list, error stack)
-#       If ErrChk=False then return Stdout only
+#       Colsep, column separator (default is !~!)
+#       ErrorList, list to add any errors to.
+#       Environ, dictionary of environment variables for this sqlplus only,
+#       ex: {'ORACLE_SID': 'ORCL2', 'ORACLE_HOME': '/u01/...'}. Lets threads
+#       run against different local instances without touching os.environ.
+# Retn: Generator of rows (each a list of strings, surrounding blanks removed).
 # ---------------------------------------------------------------------------
-def RunRman(RCV, ErrChk=True, ConnectString='target /'):
+def StreamSqlplus(Sql, ConnectString='/ as sysdba', Colsep='!~!', ErrorList=None, Environ=None):
+  Sql = StreamSqlplusScript(Sql, Colsep)
+
+  # Unset the SQLPATH environment variable.
+  if ('SQLPATH' in environ.keys()):
+    del environ['SQLPATH']
+
+  Env = environ
+  if (Environ is not None):
+    Env = dict(environ)
+    Env.update(Environ)
+
   if (ConnectString == '/ as sysdba'):
-    if (not('ORACLE_SID' in environ.keys())):
+    if (not('ORACLE_SID' in Env.keys())):
       print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
-      return (1, '', [])
-    if (not('ORACLE_HOME' in environ.keys())):
-      OracleSid, OracleHome = SetOracleEnv(environ['ORACLE_SID'])
+      return
+    if (not('ORACLE_HOME' in Env.keys())):
+      if (Environ is None):
+        OracleSid, OracleHome = SetOracleEnv(Env['ORACLE_SID'])
+      else:
+        OracleHome = LoadOratab().get(Env['ORACLE_SID'], '')
+        if (OracleHome != ''):
+          Env['ORACLE_HOME'] = OracleHome
+
+  # Set the location of the ORACLE_HOME. If ORACLE_HOME is not set
+  # then we'll use the first one we find in the oratab file.
+  if ('ORACLE_HOME' in Env.keys()):
+    OracleHome = Env['ORACLE_HOME']
+    Sqlplus = OracleHome + '/bin/sqlplus'
+  else:
+    OratabDict = LoadOratab()
+    if (len(OratabDict) >= 1):
+      SidList = list(OratabDict.keys())
+      OracleSid  = SidList[0]
+      OracleHome = OratabDict[SidList[0]]
+      Env['ORACLE_HOME'] = OracleHome
+      Sqlplus = OracleHome + '/bin/sqlplus'
+    else:
+      print('ORACLE_HOME is not set')
+      return
+
+  ErrorRegex = CompileErrorCheck(['sqlplus','rdbms', 'oracore'])
+
+  # Start Sqlplus and login
+  proc = Popen([Sqlplus, '-S', '-L', ConnectString], bufsize=1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+   shell=False, universal_newlines=True, close_fds=True, env=Env)
+
+  proc.stdin.write(Sql)
+  proc.stdin.close()
+
+  try:
+    for line in iter(proc.stdout.readline, ''):
+      line = line.rstrip('\n')
+      if (line.strip() == ''):
+        continue
+      if (ErrorRegex is not None and not Colsep in line):
+        MatchObj = ErrorRegex.match(line)
+        if (MatchObj or line.startswith('ERROR at line')):
+          if (ErrorList is not None and MatchObj):
+            ErrorList.append([MatchObj.group(0), line])
+          continue
+      yield [Field.strip() for Field in line.split(Colsep)]
+  finally:
+    # If the caller stops reading early don't leave sqlplus hanging around.
+    if (proc.poll() is None):
+      try:
+        proc.kill()
+      except:
+        pass
+    proc.stdout.close()
+    proc.wait()
+# ---------------------------------------------------------------------------
+# End StreamSqlplus()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : EmitSqlplus()
+# Desc: Runs a query with StreamSqlplus() and writes the rows with a RowEmitter
+#       as they come back. This is what the report scripts call for --format.
+#       Any errors are written to stderr, and so is the number of rows that
+#       were rejected (see RowEmitter) because they didn't have one value per
+#       column (wrapped values, values with the separator in them, ...).
+# Args: Sql, string containing SQL to execute.
+#       Columns, list of column names (the schema).
+#       Format, csv, tsv or json.
+#       ConnectString, used for connecting to the database
+#       Name, name of the report.
+#       Types, string of n/s, one per column (see RowEmitter).
+# Retn: rc (0 = no errors and no rejected rows)
+# ---------------------------------------------------------------------------
+def EmitSqlplus(Sql, Columns, Format, ConnectString='/ as sysdba', Name='', Types=''):
+  ErrorList = []
+
+  Emitter = RowEmitter(Columns, Format, Name=Name, Types=Types)
+  Emitter.emit_all(StreamSqlplus(Sql, ConnectString, ErrorList=ErrorList))
+  Emitter.close()
+
+  rc = 0
+  if (ErrorList != []):
+    for Error in ErrorList:
+      stderr.write(Error[1] + '\n')
+    rc = 1
+  if (Emitter.rejected > 0):
+    stderr.write('%d row(s) rejected, they did not have %d values.\n' % (Emitter.rejected, len(Columns)))
+    rc = 1
+  return(rc)
+# ---------------------------------------------------------------------------
+# End EmitSqlplus()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: RowEmitter()
+# Desc: Writes rows in a machine readable format as they arrive. The column
+#       names given when the emitter is created are the schema, and are
+#       written before the first row:
+#         csv  - header line, then one comma separated line per row.
+#         tsv  - header line, then one tab separated line per row (tabs and
+#                newlines in values are replaced by spaces).
+#         json - {"schema": Name, "columns": [...]} line, then one JSON object
+#                per row.
+#       Types is an optional string with one character per column, n for
+#       numeric or s for string (the default). It only matters for json, where
+#       numeric columns are written as numbers and empty values as null.
+#       Rows that don't have one value per column are not written and are
+#       counted in rejected.
+# Args: Columns  = list of column names.
+#       Format   = csv (default), tsv or json.
+#       Outfile  = file object to write to (default is stdout).
+#       Name     = name of the report (json schema line).
+#       Types    = string of n/s, one per column.
+# ---------------------------------------------------------------------------
+class RowEmitter:
+  def __init__(self, Columns, Format='csv', Outfile=None, Name='', Types=''):
+    self.columns  = list(Columns)
+    self.format   = Format.lower()
+    self.outfile  = Outfile
+    self.name     = Name
+    self.types    = Types.lower().ljust(len(self.columns), 's')
+    self.count    = 0
+    self.rejected = 0
+    self.started  = False
+    if (self.outfile is None):
+      self.outfile = termout
+    if (not self.format in ('csv', 'tsv', 'json')):
+      raise ValueError('Invalid output format: ' + Format + ' (must be csv, tsv or json)')
+    self.keys = [dumps(Column) + ': ' for Column in self.columns]
+
+  def header(self):
+    if (self.format == 'json'):
+      self.outfile.write('{"schema": ' + dumps(self.name) + ', "columns": ' + dumps(self.columns) + '}\n')
+    elif (self.format == 'tsv'):
+      self.outfile.write('\t'.join(self.columns) + '\n')
+    else:
+      self.outfile.write(','.join([self.csv_value(Column) for Column in self.columns]) + '\n')
+    self.started = True
+
+  def csv_value(self, Value):
+    if (',' in Value or '"' in Value or '\n' in Value):
+      return('"' + Value.replace('"', '""') + '"')
+    return(Value)
+
+  def json_value(self, Value, Type):
+    if (Value is None or Value == ''):
+      return('null')
+    if (Type == 'n' and match(r'-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$', Value)):
+      if (Value.startswith('.') or Value.startswith('-.')):
+        Value = Value.replace('.', '0.', 1)
+      if (Value.endswith('.')):
+        Value = Value[:-1]
+      return(Value)
+    return(dumps(Value))
+
+  def emit(self, Row):
+    if (not self.started):
+      self.header()
+    if (len(Row) != len(self.columns)):
+      self.rejected += 1
+      return
+    Row = ['' if Value is None else str(Value) for Value in Row]
+    if (self.format == 'json'):
+      self.outfile.write('{' + ', '.join([self.keys[i] + self.json_value(Row[i], self.types[i]) for i in range(len(Row))]) + '}\n')
+    elif (self.format == 'tsv'):
+      self.outfile.write('\t'.join([Value.replace('\t', ' ').replace('\n', ' ') for Value in Row]) + '\n')
+    else:
+      self.outfile.write(','.join([self.csv_value(Value) for Value in Row]) + '\n')
+    self.count += 1
+
+  def emit_all(self, Rows):
+    for Row in Rows:
+      self.emit(Row)
+    return(self.count)
+
+  def close(self):
+    if (not self.started):
+      self.header()
+    self.outfile.flush()
+# ---------------------------------------------------------------------------
+# End RowEmitter()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: SqlplusSession()
+# Desc: A long lived sqlplus session. Logs in once, runs Settings once (set
+#       commands, session level PL/SQL such as DBMS_METADATA transform
+#       parameters, ...) and then runs as many scripts as you like through
+#       the same process. The end of each script's output is found by
+#       following it with a prompt of a marker and reading up to the marker.
+#       stream() hands back the output a line at a time so large results
+#       (CLOBs, ...) don't have to be held in memory.
+#
+#       Session = SqlplusSession(Settings='set pagesize 0\n')
+#       (rc, Stdout) = Session.run('select sysdate from dual;')
+#       for line in Session.stream('select ...;'):
+#         ...
+#       Session.close()
+# ---------------------------------------------------------------------------
+class SqlplusSession:
+  def __init__(self, ConnectString='/ as sysdba', Settings=''):
+    self.proc = None
+    self.count = 0
+    self.rc = 0
+    self.connect_string = ConnectString
+    self.settings = Settings
+    self.errors = CompileErrorCheck(['sqlplus', 'rdbms', 'oracore'])
+
+    # Unset the SQLPATH environment variable.
+    if ('SQLPATH' in environ.keys()):
+      del environ['SQLPATH']
+
+    if (ConnectString == '/ as sysdba'):
+      if (not('ORACLE_SID' in environ.keys())):
+        print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
+        self.rc = 1
+        return
+      if (not('ORACLE_HOME' in environ.keys())):
+        OracleSid, OracleHome = SetOracleEnv(environ['ORACLE_SID'])
+
+    if ('ORACLE_HOME' in environ.keys()):
+      self.sqlplus = environ['ORACLE_HOME'] + '/bin/sqlplus'
+    else:
+      print('ORACLE_HOME is not set')
+      self.rc = 1
+      return
+
+    self.open()
+
+  def open(self):
+    # Start Sqlplus, login and apply the session settings
+    self.proc = Popen([self.sqlplus, '-S', '-L', self.connect_string], bufsize=1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+     shell=False, universal_newlines=True, close_fds=True)
+    if (self.settings != ''):
+      (rc, Stdout) = self.run(self.settings)
+      if (rc != 0):
+        self.rc = rc
+
+  def is_open(self):
+    return (self.proc is not None and self.proc.poll() is None)
+
+  def stream(self, Sql):
+    # Reconnect once if the session went away between calls.
+    if (not self.is_open()):
+      if (self.rc != 0 and self.proc is None):
+        return
+      self.open()
+
+    self.count += 1
+    Marker = 'SQLPLUS_END_OF_COMMAND_%d' % self.count
+
+    # Feed the script from a thread, as RunProcess() does, so a script and its
+    # output that are both bigger than the pipe buffer can't deadlock us.
+    proc   = self.proc
+    Script = Sql.rstrip() + '\n\nprompt ' + Marker + '\n'
+    def Feed():
+      try:
+        proc.stdin.write(Script)
+        proc.stdin.flush()
+      except (IOError, OSError, ValueError):
+        pass                                 # sqlplus went away, the read below sees it
+    Feeder = threading.Thread(target=Feed)
+    Feeder.daemon = True
+    Feeder.start()
+
+    Done = False
+    try:
+      for line in iter(self.proc.stdout.readline, ''):
+        if (line.rstrip('\n') == Marker):
+          Done = True
+          return
+        yield line.rstrip('\n')
+      self.rc = 1                            # sqlplus exited before the marker showed up.
+    finally:
+      # If the caller stops reading early, skip the rest so the next call starts clean.
+      if (not Done and self.is_open()):
+        for line in iter(self.proc.stdout.readline, ''):
+          if (line.rstrip('\n') == Marker):
+            break
+      Feeder.join()
+
+  def run(self, Sql):
+    Output = []
+    rc = 0
+    self.rc = 0
+
+    for line in self.stream(Sql):
+      if (self.errors is not None and self.errors.match(line)):
+        rc = 1
+      Output.append(line)
+    if (self.rc != 0):
+      rc = self.rc
+
+    return(rc, '\n'.join(Output).strip())
+
+  def close(self):
+    if (self.is_open()):
+      try:
+        self.proc.stdin.write('exit\n')
+        self.proc.stdin.close()
+      except (IOError, OSError):
+        pass
+      self.proc.wait()
+    self.proc = None
+# ---------------------------------------------------------------------------
+# End SqlplusSession()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: PlanCache()
+# Desc: Local cache of execution plans. A plan for a given (DBID, SQL_ID,
+#       PLAN_HASH_VALUE) never changes, so once it has been fetched it is
+#       kept on disk and never fetched again. Each plan is stored in its own
+#       file named for that triple:
+#
+#         CacheDir/DBID/SQL_ID/PLAN_HASH_VALUE.Kind
+#
+#       Kind 'xplan' is the dbms_xplan.display_awr report, kind 'xml' is the
+#       plan's OTHER_XML (outline hints, peeked binds, ...). Files are written
+#       to a temp file and renamed into place so a reader never sees half a
+#       plan, and an existing file is never overwritten.
+#
+#       All database work goes through one sqlplus session that's opened the
+#       first time it's needed, so a batch of SQL IDs costs one login no
+#       matter how many plans are missing.
+#
+#       Cache = PlanCache()
+#       (Dbid, Plans) = Cache.plans(['czvpgufc8cwr3', '5ms6rbzdnq16t'])
+#       Cache.fetch(Dbid, Plans, 'xplan')
+#       for (SqlId, PlanHash, Child, Inst) in Plans:
+#         Filename = Cache.lookup(Dbid, SqlId, PlanHash, 'xplan')
+#       Cache.close()
+# Args: CacheDir, directory to keep plans in. Default is
+#       PrivateDir('.plancache', 'PLAN_CACHE'). open() fails if there isn't
+#       one.
+#       ConnectString, used to open the sqlplus session.
+# ---------------------------------------------------------------------------
+class PlanCache:
+  def __init__(self, CacheDir='', ConnectString='/ as sysdba'):
+    if (CacheDir == ''):
+      CacheDir = PrivateDir('.plancache', 'PLAN_CACHE')
+    self.cache_dir = CacheDir
+    self.connect_string = ConnectString
+    self.session = None
+    self.hits = 0
+    self.fetched = 0
+    self.errors = []
+
+    self.settings  = "set echo          off\n"
+    self.settings += "set feedback      off\n"
+    self.settings += "set heading       off\n"
+    self.settings += "set pagesize      0\n"
+    self.settings += "set newpage       none\n"
+    self.settings += "set linesize      32767\n"
+    self.settings += "set long          2000000000\n"
+    self.settings += "set longchunksize 32767\n"
+    self.settings += "set tab           off\n"
+    self.settings += "set trimout       on\n"
+    self.settings += "set trimspool     on\n"
+    self.settings += "set verify        off\n"
+
+  def open(self):
+    # The settings are run here, not by SqlplusSession, so the message of a
+    # failed login ends up in errors.
+    if (self.cache_dir == ''):
+      if (self.errors == []):
+        self.errors.append('No private directory for the plan cache, set $PLAN_CACHE or use --cache.')
+      return False
+    if (self.session is None):
+      self.session = SqlplusSession(self.connect_string)
+      if (self.session.rc == 0):
+        (rc, Stdout) = self.session.run(self.settings)
+        if (rc != 0):
+          self.session.rc = rc
+          self.errors.append(Stdout.strip() or 'sqlplus exited before logging in.')
+    return (self.session.rc == 0)
+
+  def close(self):
+    if (self.session is not None):
+      self.session.close()
+      self.session = None
+
+  def path(self, Dbid, SqlId, PlanHash, Kind):
+    return pathjoin(self.cache_dir, str(Dbid), SqlId, str(PlanHash) + '.' + Kind)
+
+  def lookup(self, Dbid, SqlId, PlanHash, Kind):
+    Filename = self.path(Dbid, SqlId, PlanHash, Kind)
+    if (self.cache_dir != '' and isfile(Filename)):
+      return Filename
+    return ''
+
+  def plan_sql(self, SqlIds, PlanHash='0', Child='', Source='awr', Global=False):
+    if (Source == 'awr'):
+      Sql  = "SELECT DISTINCT '~~PLAN '|| d.dbid || ' ' || p.sql_id || ' ' || p.plan_hash_value || ' - -'\n"
+      Sql += "  FROM dba_hist_sql_plan p\n"
+      Sql += "     , v$database d\n"
+      Sql += " WHERE p.dbid = d.dbid\n"
+      Sql += "   AND p.id = 0\n"
+    else:
+      Sql  = "SELECT DISTINCT '~~PLAN '|| d.dbid || ' ' || p.sql_id || ' ' || p.plan_hash_value || ' ' || p.child_number || ' ' || p.inst_id\n"
+      Sql += "  FROM gv$sql_plan p\n"
+      Sql += "     , v$database d\n"
+      Sql += " WHERE p.id = 0\n"
+      if (not Global):
+        Sql += "   AND p.inst_id = USERENV('INSTANCE')\n"
+      if (Child != ''):
+        Sql += "   AND p.child_number = " + str(Child) + "\n"
+    Sql += "   AND " + InList('p.sql_id', SqlIds) + "\n"
+    if (str(PlanHash) != '0'):
+      Sql += "   AND p.plan_hash_value = " + str(PlanHash) + "\n"
+    return Sql.rstrip() + ";"
+
+  def fetch_sql(self, Dbid, Plans, Kind, Source='awr'):
+    Sql = ''
+    for j in range(len(Plans)):
+      (SqlId, PlanHash) = Plans[j][0:2]
+      Sql += "prompt ~~PLAN BEGIN " + str(j) + "\n"
+      if (Kind == 'xplan'):
+        Sql += "SELECT plan_table_output FROM TABLE(dbms_xplan.display_awr('" + SqlId + "', " + str(PlanHash) + ", " + str(Dbid) + ", 'typical +peeked_binds'));\n"
+      else:
+        Sql += "SELECT xmlserialize(document xmltype(other_xml) AS CLOB INDENT SIZE = 2)\n"
+        if (Source == 'awr'):
+          Sql += "  FROM dba_hist_sql_plan\n"
+          Sql += " WHERE dbid = " + str(Dbid) + "\n"
+          Sql += "   AND sql_id = '" + SqlId + "'\n"
+        else:
+          Sql += "  FROM gv$sql_plan\n"
+          Sql += " WHERE sql_id = '" + SqlId + "'\n"
+        Sql += "   AND plan_hash_value = " + str(PlanHash) + "\n"
+        Sql += "   AND other_xml IS NOT NULL\n"
+        Sql += "   AND ROWNUM = 1;\n"
+      Sql += "prompt ~~PLAN END " + str(j) + "\n"
+    return Sql
+
+  def plans(self, SqlIds, PlanHash='0', Child='', Source='awr', Global=False, Batch=1000):
+    Dbid = ''
+    Rows = []
+
+    if (SqlIds == [] or not self.open()):
+      return(Dbid, Rows)
+
+    # Batch SQL IDs (one IN list) a round trip.
+    Batch = max(Batch, 1)
+    for i in range(0, len(SqlIds), Batch):
+      for Line in self.session.stream(self.plan_sql(SqlIds[i:i+Batch], PlanHash, Child, Source, Global)):
+        if (Line.startswith('~~PLAN ')):
+          (Dbid, SqlId, Hash, ChildNum, Inst) = Line.split()[1:6]
+          Rows.append((SqlId, Hash, ChildNum.replace('-', ''), Inst.replace('-', '')))
+        elif (self.session.errors is not None and self.session.errors.match(Line)):
+          self.errors.append(Line.strip())
+      if (self.session.rc != 0):
+        break
+
+    # Same order the SQL IDs were asked for in, then instance, child and plan hash.
+    Rows.sort(key=lambda Row: (SqlIds.index(Row[0]) if Row[0] in SqlIds else len(SqlIds), int(Row[3] or 0), int(Row[2] or 0), Row[1]))
+    return(Dbid, Rows)
+
+  def fetch(self, Dbid, Plans, Kind, Source='awr', Batch=100):
+    Missing = []
+    for Plan in Plans:
+      if (self.lookup(Dbid, Plan[0], Plan[1], Kind) != ''):
+        self.hits += 1
+      elif (not (Plan[0], Plan[1]) in Missing):
+        Missing.append((Plan[0], Plan[1]))
+
+    if (Missing == [] or not self.open()):
+      return 0
+
+    # Missing plans are fetched Batch at a time so no one script (or its
+    # output) gets out of hand.
+    Batch = max(Batch, 1)
+    Count = 0
+    for i in range(0, len(Missing), Batch):
+      Part    = Missing[i:i+Batch]
+      Current = None
+      for Line in self.session.stream(self.fetch_sql(Dbid, Part, Kind, Source)):
+        if (Line.startswith('~~PLAN BEGIN ')):
+          Current  = Part[int(Line.split()[2])]
+          Filename = self.path(Dbid, Current[0], Current[1], Kind)
+          if (not isdir(dirname(Filename))):
+            try:
+              makedirs(dirname(Filename))
+            except OSError:
+              pass
+          TmpFile = Filename + '.' + str(getpid()) + '.tmp'
+          hFile   = open(TmpFile, 'w')
+          Errors  = []
+          Bytes   = 0
+        elif (Line.startswith('~~PLAN END ') and Current is not None):
+          hFile.close()
+          if (Errors == [] and Bytes > 0 and not isfile(Filename)):
+            rename(TmpFile, Filename)
+            Count += 1
+          else:
+            unlink(TmpFile)
+            self.errors += Errors
+          Current = None
+        elif (Current is not None):
+          if (self.session.errors is not None and self.session.errors.match(Line)):
+            Errors.append(Line.strip())
+          elif (Bytes > 0 or Line.strip() != ''):
+            hFile.write(Line + '\n')
+            Bytes += len(Line) + 1
+      if (Current is not None):
+        hFile.close()                        # sqlplus went away in the middle of a plan
+        unlink(TmpFile)
+      if (self.session.rc != 0):
+        break
+
+    self.fetched += Count
+    return Count
+# ---------------------------------------------------------------------------
+# End PlanCache()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ReadSqlIds()
+# Desc: Gathers the SQL IDs a script was given, from a comma separated list
+#       (-i) and from a file (-f) with one or more per line, separated by
+#       blanks or commas. Duplicates are dropped, the order is kept.
+# Args: File, file of SQL IDs, '-' for stdin, '' for none.
+#       Ids, comma separated SQL IDs.
+# Retn: List of SQL IDs.
+# ---------------------------------------------------------------------------
+def ReadSqlIds(File, Ids):
+  from sys import stdin
+
+  SqlIds = []
+  for SqlId in Ids.split(','):
+    if (SqlId.strip() != '' and not SqlId.strip() in SqlIds):
+      SqlIds.append(SqlId.strip())
+
+  if (File != ''):
+    if (File == '-'):
+      hFile = stdin
+    else:
+      try:
+        hFile = open(File)
+      except IOError:
+        print('\nCannot open file: ' + File)
+        exit(1)
+    for Line in hFile:
+      for SqlId in Line.replace(',', ' ').split():
+        if (not SqlId in SqlIds):
+          SqlIds.append(SqlId)
+    if (hFile is not stdin):
+      hFile.close()
+  return(SqlIds)
+# ---------------------------------------------------------------------------
+# End ReadSqlIds()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ParseOutlineHints()
+# Desc: Pulls the outline hints out of a plan's OTHER_XML. The XML is fed to
+#       an incremental parser a line at a time and each hint is handed back
+#       as soon as its closing tag has been read, so the document is never
+#       built in memory.
+# Args: Lines, iterable of OTHER_XML text (an open file, a list of lines, ...)
+# Retn: Generator of hints, ex: FULL(@"SEL$1" "DUAL"@"SEL$1")
+# ---------------------------------------------------------------------------
+def ParseOutlineHints(Lines):
+  class HintTarget:
+    def __init__(self):
+      self.path  = []
+      self.text  = []
+      self.hints = []
+    def start(self, Tag, Attrib):
+      self.path.append(Tag)
+      self.text = []
+    def end(self, Tag):
+      self.path.pop()
+      if (Tag == 'hint' and 'outline_data' in self.path):
+        self.hints.append(''.join(self.text).strip())
+      self.text = []
+    def data(self, Data):
+      self.text.append(Data)
+    def close(self):
+      return None
+
+  Target = HintTarget()
+  Parser = XMLParser(target=Target)
+  Fed    = False
+
+  for Line in Lines:
+    Parser.feed(Line)
+    Fed = True
+    if (Target.hints != []):
+      Hints = Target.hints
+      Target.hints = []
+      for Hint in Hints:
+        yield Hint
+
+  if (Fed):
+    Parser.close()
+    for Hint in Target.hints:
+      yield Hint
+# ---------------------------------------------------------------------------
+# End ParseOutlineHints()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : PlanHistorySql()
+# Desc: Builds the query for a plan regression scan. It returns a row per
+#       sql_id, snapshot, instance and plan for every statement executed in
+#       the window, sorted by sql_id and snapshot so that each statement's
+#       history can be worked through as it streams in (see
+#       PlanChangeDetector). Within a snapshot the busiest plan (most
+#       executions, then most elapsed time) comes first.
+# Args: BeginTime, BeginTimeFormat, AWR snap time >= BeginTime.
+#       EndTime, EndTimeFormat, AWR snap time <= EndTime.
+#       SqlHeader, comment to tag the query with.
+# Retn: Sql (string). The columns are sql_id, snap_id, begin_interval_time,
+#       plan_hash_value, executions, elapsed time (microseconds) and buffer
+#       gets.
+# ---------------------------------------------------------------------------
+def PlanHistorySql(BeginTime, BeginTimeFormat, EndTime, EndTimeFormat, SqlHeader=''):
+  Sql  = "SELECT " + SqlHeader + "\n"
+  Sql += "       s.sql_id\n"
+  Sql += "     , s.snap_id\n"
+  Sql += "     , TO_CHAR(ss.begin_interval_time, 'yyyy-mm-dd hh24:mi:ss')\n"
+  Sql += "     , s.plan_hash_value\n"
+  Sql += "     , NVL(s.executions_delta, 0)\n"
+  Sql += "     , NVL(s.elapsed_time_delta, 0)\n"
+  Sql += "     , NVL(s.buffer_gets_delta, 0)\n"
+  Sql += "  FROM dba_hist_sqlstat s\n"
+  Sql += "     , dba_hist_snapshot ss\n"
+  Sql += "     , v$database d\n"
+  Sql += " WHERE s.dbid = d.dbid\n"
+  Sql += "   AND ss.dbid = s.dbid\n"
+  Sql += "   AND ss.snap_id = s.snap_id\n"
+  Sql += "   AND ss.instance_number = s.instance_number\n"
+  Sql += "   AND s.executions_delta > 0\n"
+  Sql += "   AND s.plan_hash_value > 0\n"
+  Sql += "   AND ss.begin_interval_time >= TO_DATE('" + BeginTime + "', '" + BeginTimeFormat + "')\n"
+  Sql += "   AND ss.end_interval_time   <= TO_DATE('" + EndTime   + "', '" + EndTimeFormat   + "')\n"
+  Sql += " ORDER BY s.sql_id\n"
+  Sql += "        , s.snap_id\n"
+  Sql += "        , s.executions_delta DESC\n"
+  Sql += "        , s.elapsed_time_delta DESC\n"
+  Sql += "        , s.plan_hash_value;"
+  return Sql
+# ---------------------------------------------------------------------------
+# End PlanHistorySql()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: PlanChangeDetector()
+# Desc: Finds plan regressions in AWR history one statement at a time. Rows
+#       (see PlanHistorySql) must arrive sorted by sql_id and snapshot, and
+#       by executions within a snapshot. For each sql_id, running totals are
+#       kept per plan. The first time a new plan_hash_value shows up after
+#       some other plan has run, that is a change point. The baseline is the
+#       current plan, with its totals up to that point. The current plan is
+#       the busiest plan of the latest snapshot, so when two plans first
+#       show up in the same snapshot the one with fewer executions is the
+#       new one. When the next sql_id
+#       starts, each change point is judged. The new plan is a regression
+#       if its average elapsed time or LIO per execution is Ratio times the
+#       baseline or worse. Only one statement's plans are in memory at a
+#       time.
+#
+#       Regressions are ranked by Excess, the extra elapsed time the new
+#       plan cost over the window: (new avg - old avg) * new executions.
+#
+#       Detector = PlanChangeDetector(Ratio=1.5, MinExecs=10)
+#       for Row in StreamSqlplus(PlanHistorySql(...)):
+#         Detector.add(Row)
+#       Detector.close()
+#       for Regression in Detector.ranked(Top=50):
+#         ...
+# Args: Ratio, how many times worse the new plan must be (default 1.5).
+#       MinExecs, executions both plans need before they're compared
+#       (default 10).
+# ---------------------------------------------------------------------------
+class PlanChangeDetector:
+  def __init__(self, Ratio=1.5, MinExecs=10):
+    self.ratio = float(Ratio)
+    self.min_execs = MinExecs
+    self.regressions = []
+    self.statements = 0
+    self.rows = 0
+    self.rejected = 0
+    self.sql_id = None
+    self.snap_id = None
+    self.plans = {}
+    self.current = None
+    self.changes = []
+
+  def add(self, Row):
+    if (len(Row) != 7):
+      self.rejected += 1
+      return
+    try:
+      (SqlId, SnapId, BeginTime, PlanHash) = Row[0:4]
+      (Execs, Elapsed, Lio) = [float(Value or 0) for Value in Row[4:7]]
+    except ValueError:
+      self.rejected += 1
+      return
+
+    if (SqlId != self.sql_id):
+      self.flush()
+      self.sql_id = SqlId
+      self.statements += 1
+    self.rows += 1
+
+    # New plan after some other plan has run -> change point, baseline is the current plan.
+    if (not PlanHash in self.plans):
+      if (self.current is not None):
+        self.changes.append((PlanHash, self.current, list(self.plans[self.current]), SnapId, BeginTime))
+      self.plans[PlanHash] = [0.0, 0.0, 0.0]
+    Totals = self.plans[PlanHash]
+    Totals[0] += Execs
+    Totals[1] += Elapsed
+    Totals[2] += Lio
+
+    # The first row of a snapshot is its busiest plan, that's the current plan from here on.
+    if (SnapId != self.snap_id):
+      self.snap_id = SnapId
+      self.current = PlanHash
+
+  def flush(self):
+    for (NewPlan, OldPlan, Old, SnapId, BeginTime) in self.changes:
+      New = self.plans[NewPlan]
+      if (Old[0] < self.min_execs or New[0] < self.min_execs):
+        continue
+      OldEla = Old[1] / Old[0] / 1000000
+      NewEla = New[1] / New[0] / 1000000
+      OldLio = Old[2] / Old[0]
+      NewLio = New[2] / New[0]
+      if (OldEla > 0):
+        ElaRatio = NewEla / OldEla
+      else:
+        ElaRatio = 0.0
+      if (OldLio > 0):
+        LioRatio = NewLio / OldLio
+      else:
+        LioRatio = 0.0
+      if (ElaRatio >= self.ratio or LioRatio >= self.ratio):
+        self.regressions.append({
+          'SqlId'     : self.sql_id,
+          'OldPlan'   : OldPlan,
+          'NewPlan'   : NewPlan,
+          'FirstSnap' : SnapId,
+          'FirstSeen' : BeginTime,
+          'OldExecs'  : int(Old[0]),
+          'NewExecs'  : int(New[0]),
+          'OldEla'    : OldEla,
+          'NewEla'    : NewEla,
+          'ElaRatio'  : ElaRatio,
+          'OldLio'    : OldLio,
+          'NewLio'    : NewLio,
+          'LioRatio'  : LioRatio,
+          'Excess'    : (NewEla - OldEla) * New[0]
+        })
+    self.plans = {}
+    self.snap_id = None
+    self.current = None
+    self.changes = []
+
+  def close(self):
+    self.flush()
+    self.sql_id = None
+    return(len(self.regressions))
+
+  def ranked(self, Top=0):
+    Ranked = sorted(self.regressions, key=lambda Reg: (-Reg['Excess'], -Reg['LioRatio'], Reg['SqlId']))
+    if (Top > 0):
+      Ranked = Ranked[:Top]
+    return(Ranked)
+# ---------------------------------------------------------------------------
+# End PlanChangeDetector()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : PlanRegressionReport()
+# Desc: Runs a plan regression scan (the Sql from PlanHistorySql()) through a
+#       PlanChangeDetector and prints the ranked regressions, as a table or
+#       as rows in Format (csv, json, tsv). If Drill > 0 the statement
+#       report from DrillSql is run for the top Drill regressions, all in
+#       one sqlplus run. Used by awr_plan_change and awr_plan_stats.
+# Args: Sql, query from PlanHistorySql().
+#       ConnectString, used for connecting to the database ('' = / as sysdba).
+#       Cmd, name of the script (for the json row name and the hint at the
+#       end).
+#       BeginTime, EndTime, the window (for the title).
+#       Ratio, MinExecs, see PlanChangeDetector.
+#       Top, number of regressions to report (0 = all).
+#       Format, None (table) or csv, json, tsv.
+#       Drill, number of top regressions to drill down into.
+#       DrillSql, function that returns the report query for a sql_id.
+#       ErrChk, passed on to RunSqlplus() for the drill down.
+# Retn: Exit status, 0 = ok, 1 = the scan failed.
+# ---------------------------------------------------------------------------
+def PlanRegressionReport(Sql, ConnectString, Cmd, BeginTime, EndTime, Ratio=1.5, MinExecs=10, Top=0, Format=None, Drill=0, DrillSql=None, ErrChk=False):
+  ErrorList = []
+  Detector  = PlanChangeDetector(Ratio, MinExecs)
+  for Row in StreamSqlplus(Sql, ConnectString or '/ as sysdba', ErrorList=ErrorList):
+    Detector.add(Row)
+  Detector.close()
+
+  if (ErrorList != []):
+    for Error in ErrorList:
+      print(Error[1])
+    return(1)
+
+  Ranked  = Detector.ranked(Top)
+  Columns = ['rank', 'sql_id', 'old_plan_hash', 'new_plan_hash', 'first_seen', 'old_execs', 'new_execs',
+             'old_avg_etime', 'new_avg_etime', 'etime_ratio', 'old_avg_lio', 'new_avg_lio', 'lio_ratio', 'excess_etime']
+  Keys    = ['OldPlan', 'NewPlan', 'FirstSeen', 'OldExecs', 'NewExecs', 'OldEla', 'NewEla', 'ElaRatio', 'OldLio', 'NewLio', 'LioRatio', 'Excess']
+
+  if (Format != None):
+    Rpt = RowEmitter(Columns, Format, Name=Cmd + '.regressions', Types='nsssnnnnnnnnnn')
+    for i in range(len(Ranked)):
+      Rpt.emit([str(i + 1), Ranked[i]['SqlId']] + [str(Ranked[i][Key]) for Key in Keys])
+    Rpt.close()
+    return(0)
+
+  print('\nPlan regressions from ' + BeginTime + ' to ' + EndTime + ' (' + FormatNumber(str(Detector.statements)) + ' statements scanned)\n')
+  if (Ranked == []):
+    print('No plan regressions found.')
+    return(0)
+  RenderTable(
+    [[str(i + 1) for i in range(len(Ranked))],
+     [Reg['SqlId']     for Reg in Ranked],
+     [Reg['OldPlan']   for Reg in Ranked],
+     [Reg['NewPlan']   for Reg in Ranked],
+     [Reg['FirstSeen'] for Reg in Ranked],
+     FormatNumbers([Reg['OldExecs'] for Reg in Ranked]),
+     FormatNumbers([Reg['NewExecs'] for Reg in Ranked]),
+     FormatNumbers(['%.3f' % Reg['OldEla']   for Reg in Ranked]),
+     FormatNumbers(['%.3f' % Reg['NewEla']   for Reg in Ranked]),
+     ['%.2f' % Reg['ElaRatio'] for Reg in Ranked],
+     FormatNumbers(['%.1f' % Reg['OldLio']   for Reg in Ranked]),
+     FormatNumbers(['%.1f' % Reg['NewLio']   for Reg in Ranked]),
+     ['%.2f' % Reg['LioRatio'] for Reg in Ranked],
+     FormatNumbers(['%.1f' % Reg['Excess']   for Reg in Ranked])],
+    ['Rank', 'SQL ID', 'Old Plan Hash', 'New Plan Hash', 'First Seen', 'Old Execs', 'New Execs', 'Old Avg Ela',
+     'New Avg Ela', 'Ela x', 'Old Avg LIO', 'New Avg LIO', 'LIO x', 'Excess Ela (s)'],
+    Justify='RLRRLRRRRRRRRR'
+  )
+
+  # Drill down: the regular report for the top regressions, all in one sqlplus run.
+  if (Drill > 0 and DrillSql is not None):
+    Sql = ''
+    for Reg in Ranked[:Drill]:
+      Sql += "prompt\n"
+      Sql += "prompt ==================== SQL ID: " + Reg['SqlId'] + " ====================\n"
+      Sql += DrillSql(Reg['SqlId']) + "\n\n"
+    if (ConnectString != ''):
+      (Stdout) = RunSqlplus(Sql, ErrChk, ConnectString)
+    else:
+      (Stdout) = RunSqlplus(Sql, ErrChk)
+    if (Stdout != ''):
+      print('\n%s' % Stdout)
+  else:
+    print('\nFor details on a statement run: ' + Cmd + ' -i SQL_ID')
+  return(0)
+# ---------------------------------------------------------------------------
+# End PlanRegressionReport()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : InList()
+# Desc: Builds an IN list predicate for a column. Oracle allows at most 1000
+#       expressions in an IN list, so longer lists are split into several
+#       IN lists OR'ed together. sqlplus won't take an input line longer
+#       than 2499 characters (SP2-0027), so the values are put a few to a
+#       line, no line longer than about 200 characters.
+# Args: Column, column name, ex: sql_id.
+#       Values, list of string values.
+# Retn: Predicate string, ex: (sql_id IN ('abc', 'def'))
+# ---------------------------------------------------------------------------
+def InList(Column, Values):
+  Lists = []
+  for i in range(0, len(Values), 1000):
+    Lines = []
+    Line  = ''
+    for Value in Values[i:i+1000]:
+      Quoted = "'" + str(Value).replace("'", "''") + "'"
+      if (Line == ''):
+        Line = Quoted
+      elif (len(Line) + len(Quoted) + 2 > 200):
+        Lines.append(Line)
+        Line = Quoted
+      else:
+        Line += ', ' + Quoted
+    Lines.append(Line)
+    Lists.append(Column + " IN (" + ",\n".join(Lines) + ")")
+  if (Lists == []):
+    return("1 = 0")
+  return("(" + "\n OR ".join(Lists) + ")")
+# ---------------------------------------------------------------------------
+# End InList()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: SqlTextIndex()
+# Desc: Local trigram index of SQL text, so text searches don't have to LIKE
+#       scan v$sql or dba_hist_sqltext on the database. Every 3 character
+#       sequence of a statement's text (upper cased, runs of white space
+#       squeezed to one blank) points to the statements that contain it. A
+#       search pattern is broken into trigrams the same way. The statements
+#       that have all of them are the candidates, and only those sql_ids are
+#       looked up on the database. Candidates are a superset of the real
+#       matches, so the LIKE is still applied, but only to those rows.
+#
+#       The index is kept in a pickle file per database (DBID) and brought
+#       up to date incrementally by refresh():
+#         gv$sqlarea        - statements with first_load_time >= the last one
+#                             seen.
+#         dba_hist_sqltext  - statements captured in snapshots taken since
+#                             the last snap_id seen.
+#       A sql_id is a hash of its text, so a statement is only ever indexed
+#       once. Each posting list is an array of document numbers that only
+#       gets appended to.
+#
+#       Index = SqlTextIndex()
+#       Index.refresh(Awr=False)
+#       SqlIds = Index.candidates("select * from emp%where deptno")
+#       Index.close()
+# Args: IndexDir, directory to keep the index in. Default is
+#       PrivateDir('.sqltextindex', 'SQLTEXT_INDEX'). refresh() fails if
+#       there isn't one.
+#       ConnectString, used to open the sqlplus session.
+# ---------------------------------------------------------------------------
+class SqlTextIndex:
+  def __init__(self, IndexDir='', ConnectString='/ as sysdba'):
+    if (IndexDir == ''):
+      IndexDir = PrivateDir('.sqltextindex', 'SQLTEXT_INDEX')
+    self.index_dir = IndexDir
+    self.connect_string = ConnectString
+    self.session = None
+    self.dbid = ''
+    self.filename = ''
+    self.errors = []
+    self.added = 0
+    self.clear()
+
+    self.settings  = "set echo          off\n"
+    self.settings += "set feedback      off\n"
+    self.settings += "set heading       off\n"
+    self.settings += "set pagesize      0\n"
+    self.settings += "set newpage       none\n"
+    self.settings += "set linesize      32767\n"
+    self.settings += "set long          2000000000\n"
+    self.settings += "set longchunksize 32767\n"
+    self.settings += "set tab           off\n"
+    self.settings += "set trimout       on\n"
+    self.settings += "set trimspool     on\n"
+    self.settings += "set verify        off\n"
+
+  def clear(self):
+    self.docs = {}                           # sql_id -> document number
+    self.postings = {}                       # trigram -> array of document numbers
+    self.sql_ids = []                        # document number -> sql_id
+    self.snap_id = 0                         # last AWR snapshot indexed
+    self.load_time = ''                      # last gv$sqlarea first_load_time indexed
+
+  def open(self):
+    if (self.session is None):
+      self.session = SqlplusSession(self.connect_string, self.settings)
+    return (self.session.rc == 0)
+
+  def close(self):
+    if (self.session is not None):
+      self.session.close()
+      self.session = None
+
+  def normalize(self, Text):
+    return ' '.join(Text.upper().split())
+
+  def trigrams(self, Text):
+    return set([Text[i:i+3] for i in range(len(Text) - 2)])
+
+  def add(self, SqlId, Text):
+    if (SqlId in self.docs):
+      return
+    Doc = len(self.sql_ids)
+    self.docs[SqlId] = Doc
+    self.sql_ids.append(SqlId)
+    for Trigram in self.trigrams(self.normalize(Text)):
+      if (not Trigram in self.postings):
+        self.postings[Trigram] = array('i')
+      self.postings[Trigram].append(Doc)
+    self.added += 1
+
+  def load(self, Dbid):
+    self.dbid = str(Dbid)
+    self.filename = pathjoin(self.index_dir, self.dbid + '.pkl')
+    self.clear()
+    if (isfile(self.filename)):
+      try:
+        hFile = open(self.filename, 'rb')
+        State = pickle.load(hFile)
+        hFile.close()
+        (self.docs, self.postings, self.sql_ids, self.snap_id, self.load_time) = State
+      except Exception:
+        self.clear()                         # unreadable index, start over
+
+  def save(self):
+    if (self.filename == ''):
+      return
+    if (not isdir(self.index_dir)):
+      makedirs(self.index_dir)
+    TmpFile = self.filename + '.' + str(getpid()) + '.tmp'
+    hFile = open(TmpFile, 'wb')
+    pickle.dump((self.docs, self.postings, self.sql_ids, self.snap_id, self.load_time), hFile, 2)
+    hFile.close()
+    rename(TmpFile, self.filename)
+
+  def load_text(self, Sql):
+    # Rows are '~~SQL sql_id [first_load_time]' followed by the statement
+    # text. The query turns the white space in the text into CHR(1), so the
+    # lines it runs over are only where sqlplus cut it up (longchunksize),
+    # with no blanks for trimout to take off, and are put back together as
+    # is.
+    SqlId = None
+    Text  = []
+    for Line in self.session.stream(Sql):
+      if (Line.startswith('~~SQL ')):
+        if (SqlId is not None):
+          self.add(SqlId, ''.join(Text).replace('\x01', ' '))
+        Fields = Line.split()
+        SqlId  = Fields[1]
+        Text   = []
+        if (len(Fields) > 2):
+          self.load_time = max(self.load_time, Fields[2])
+      elif (self.session.errors is not None and self.session.errors.match(Line)):
+        self.errors.append(Line.strip())
+      elif (SqlId is not None):
+        Text.append(Line)
+    if (SqlId is not None):
+      self.add(SqlId, ''.join(Text).replace('\x01', ' '))
+
+  def refresh(self, Awr=False, Rebuild=False):
+    if (self.index_dir == ''):
+      self.errors.append('No private directory for the SQL text index, set $SQLTEXT_INDEX.')
+      return(-1)
+    if (not self.open()):
+      return(-1)
+
+    # DBID picks the index file, the latest snapshot is the new AWR watermark.
+    Sql  = "SELECT d.dbid || ' ' || NVL(MAX(s.snap_id), 0)\n"
+    Sql += "  FROM v$database d\n"
+    Sql += "     , dba_hist_snapshot s\n"
+    Sql += " WHERE s.dbid (+) = d.dbid\n"
+    Sql += " GROUP BY d.dbid;"
+    (rc, Stdout) = self.session.run(Sql)
+    if (rc != 0 or len(Stdout.split()) != 2):
+      self.errors.append(Stdout.strip())
+      return(-1)
+    (Dbid, LastSnap) = Stdout.split()
+    self.load(Dbid)
+    if (Rebuild):
+      self.clear()
+
+    self.added = 0
+    if (Awr):
+      Sql  = "SELECT '~~SQL ' || t.sql_id || CHR(10) || TRANSLATE(t.sql_text, ' ' || CHR(9) || CHR(10) || CHR(13), RPAD(CHR(1), 4, CHR(1)))\n"
+      Sql += "  FROM dba_hist_sqltext t\n"
+      Sql += " WHERE t.dbid = " + self.dbid + "\n"
+      Sql += "   AND t.sql_id IN (SELECT s.sql_id\n"
+      Sql += "                      FROM dba_hist_sqlstat s\n"
+      Sql += "                     WHERE s.dbid = " + self.dbid + "\n"
+      Sql += "                       AND s.snap_id > " + str(self.snap_id) + "\n"
+      Sql += "                       AND s.snap_id <= " + LastSnap + ");"
+    else:
+      Sql  = "SELECT '~~SQL ' || sql_id || ' ' || first_load_time || CHR(10) || TRANSLATE(sql_fulltext, ' ' || CHR(9) || CHR(10) || CHR(13), RPAD(CHR(1), 4, CHR(1)))\n"
+      Sql += "  FROM gv$sqlarea\n"
+      if (self.load_time != ''):
+        Sql += " WHERE first_load_time >= '" + self.load_time + "'\n"
+      Sql += " ORDER BY first_load_time;"
+    self.load_text(Sql)
+
+    if (self.errors == []):
+      if (Awr):
+        self.snap_id = int(LastSnap)
+      self.save()
+    return(self.added)
+
+  def candidates(self, Pattern):
+    # The literal pieces of a LIKE pattern (% and _ are wild cards) must each
+    # appear in the text, so all of their trigrams must too.
+    Trigrams = set()
+    for Piece in Pattern.replace('_', '%').split('%'):
+      Trigrams |= self.trigrams(self.normalize(Piece))
+    if (len(Trigrams) == 0):
+      return None                            # nothing to go on, caller has to scan
+
+    Lists = []
+    for Trigram in Trigrams:
+      if (not Trigram in self.postings):
+        return []
+      Lists.append(self.postings[Trigram])
+    Lists.sort(key=len)
+
+    Docs = set(Lists[0])
+    for List in Lists[1:]:
+      Docs.intersection_update(List)
+      if (len(Docs) == 0):
+        break
+    return sorted([self.sql_ids[Doc] for Doc in Docs])
+# ---------------------------------------------------------------------------
+# End SqlTextIndex()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: ParameterStore()
+# Desc: Local store of instance parameter snapshots (all parameters, hidden
+#       ones included) so parameters can be compared across instances and
+#       over time without going back to each database.
+#
+#       Snapshots are kept one gzip'd pickle file each:
+#         StoreDir/DBID/INSTANCE_NAME/YYYYMMDDHHMMSS.pkl.gz
+#       A snapshot that is the same as the instance's last one isn't written,
+#       so the store only grows when something changes. Descriptions don't
+#       change, they're kept once per database in StoreDir/DBID/desc.pkl.gz.
+#
+#       A snapshot is a dictionary:
+#         {'dbid': '1234567', 'instance': 'ORCL1', 'inst_num': '1',
+#          'host': 'db01', 'stamp': '20261018101241',
+#          'parms': {'db_block_size': ('8192', 'True', 'False'), ...}}
+#       where each parameter is (Value, IsDef, IsMod).
+#
+#       Snapshots are named with a spec of [DBID/]INSTANCE[@TIME], where TIME
+#       is YYYYMMDDHHMMSS or any leading part of it (separators are ignored).
+#       The latest snapshot taken at or before TIME is used, the latest one
+#       overall if there is no @TIME.
+#
+#       Store = ParameterStore()
+#       Results = Store.collect(['ORCL1', 'TEST1'], Parallel=8)
+#       Diff = Store.diff(Store.load(*Store.find('ORCL1')), Store.load(*Store.find('TEST1')))
+# Args: StoreDir, directory to keep the snapshots in. Default is
+#       PrivateDir('.parmstore', 'PARM_STORE'). If there isn't one the
+#       reason is in errors and collect() saves nothing.
+# ---------------------------------------------------------------------------
+class ParameterStore:
+  def __init__(self, StoreDir=''):
+    self.errors = []
+    if (StoreDir == ''):
+      StoreDir = PrivateDir('.parmstore', 'PARM_STORE')
+      if (StoreDir == ''):
+        self.errors.append('No private directory for the parameter store, set $PARM_STORE.')
+    self.store_dir = StoreDir
+    self.lock = threading.Lock()
+
+  def snapshot_sql(self):
+    Sql  = "SELECT '~~INST'\n"
+    Sql += "    || '!~!' || d.dbid\n"
+    Sql += "    || '!~!' || i.instance_name\n"
+    Sql += "    || '!~!' || i.instance_number\n"
+    Sql += "    || '!~!' || i.host_name\n"
+    Sql += "  FROM v$database d\n"
+    Sql += "     , v$instance i;\n"
+    Sql += "\n"
+    Sql += "SELECT i.ksppinm\n"
+    Sql += "     , sv.ksppstvl\n"
+    Sql += "     , INITCAP(sv.ksppstdf)\n"
+    Sql += "     , DECODE(BITAND(sv.ksppstvf,7),1,'True',4,'True','False')\n"
+    Sql += "     , i.ksppdesc\n"
+    Sql += "  FROM sys.x$ksppi  i\n"
+    Sql += "     , sys.x$ksppsv sv\n"
+    Sql += " WHERE i.indx = sv.indx;"
+    return(Sql)
+
+  def path(self, Dbid, Instance, Stamp=''):
+    if (Stamp == ''):
+      return(pathjoin(self.store_dir, Dbid, Instance))
+    return(pathjoin(self.store_dir, Dbid, Instance, Stamp + '.pkl.gz'))
+
+  def read(self, Filename):
+    hFile = gzip.open(Filename, 'rb')
+    try:
+      return(pickle.load(hFile))
+    finally:
+      hFile.close()
+
+  def write(self, Filename, Obj):
+    if (not isdir(dirname(Filename))):
+      try:
+        makedirs(dirname(Filename))
+      except OSError:
+        pass                                 # another thread got there first
+    TmpFile = Filename + '.' + str(getpid()) + '.tmp'
+    hFile = gzip.open(TmpFile, 'wb')
+    pickle.dump(Obj, hFile, 2)
+    hFile.close()
+    rename(TmpFile, Filename)
+
+  def snapshot(self, Stamp, Sid='', ConnectString='/ as sysdba', OracleHome=''):
+    # Takes one snapshot. Sid = '' uses the current environment.
+    Errors = []
+    Snap   = {'dbid': '', 'instance': '', 'inst_num': '', 'host': '', 'stamp': Stamp, 'parms': {}}
+    Desc   = {}
+    if (Sid != ''):
+      Environ = {'ORACLE_SID': Sid}
+      if (OracleHome != ''):
+        Environ['ORACLE_HOME'] = OracleHome
+      Rows = StreamSqlplus(self.snapshot_sql(), ConnectString, ErrorList=Errors, Environ=Environ)
+    else:
+      Rows = StreamSqlplus(self.snapshot_sql(), ConnectString, ErrorList=Errors)
+    for Row in Rows:
+      if (Row[0] == '~~INST' and len(Row) >= 5):
+        (Snap['dbid'], Snap['instance'], Snap['inst_num'], Snap['host']) = Row[1:5]
+      elif (len(Row) >= 4):
+        Snap['parms'][Row[0]] = (Row[1], Row[2], Row[3])
+        if (len(Row) >= 5):
+          Desc[Row[0]] = Row[4]
+    if (Errors != [] or Snap['dbid'] == ''):
+      return(None, Desc, [Error[1] for Error in Errors] or ['No rows returned.'])
+    return(Snap, Desc, [])
+
+  def save(self, Snap, Desc={}):
+    # Returns True if the snapshot was written, False if it's the same as the last one.
+    Last = self.stamps(Snap['dbid'], Snap['instance'])
+    if (Last != [] and self.load(Snap['dbid'], Snap['instance'], Last[-1])['parms'] == Snap['parms']):
+      return(False)
+    self.write(self.path(Snap['dbid'], Snap['instance'], Snap['stamp']), Snap)
+
+    # Add any new descriptions (one thread at a time, they share the file).
+    self.lock.acquire()
+    try:
+      Known = self.descriptions(Snap['dbid'])
+      if ([Name for Name in Desc if not Name in Known] != []):
+        Known.update(Desc)
+        self.write(pathjoin(self.store_dir, Snap['dbid'], 'desc.pkl.gz'), Known)
+    finally:
+      self.lock.release()
+    return(True)
+
+  def collect(self, Sids=[], ConnectString='/ as sysdba', Parallel=8):
+    # Snapshots the instances in Sids (or the current one if Sids is empty),
+    # Parallel at a time, all with the same timestamp.
+    # Returns a list of (Target, Snap, Saved, Errors), in the order of Sids.
+    Stamp   = datetime.now().strftime('%Y%m%d%H%M%S')
+    Targets = Sids or ['']
+    if (self.store_dir == ''):
+      return([(Sid or environ.get('ORACLE_SID', ''), None, False, self.errors) for Sid in Targets])
+    Oratab  = LoadOratab()
+    Results = {}
+    Work    = Queue()
+    for Sid in Targets:
+      Work.put(Sid)
+
+    def Worker():
+      while True:
+        try:
+          Sid = Work.get_nowait()
+        except Empty:
+          return
+        (Snap, Desc, Errors) = self.snapshot(Stamp, Sid, ConnectString, Oratab.get(Sid, ''))
+        Saved = False
+        if (Snap is not None):
+          Saved = self.save(Snap, Desc)
+        Results[Sid] = (Sid or environ.get('ORACLE_SID', ''), Snap, Saved, Errors)
+
+    Threads = []
+    for i in range(max(1, min(Parallel, len(Targets)))):
+      Thread = threading.Thread(target=Worker)
+      Thread.start()
+      Threads.append(Thread)
+    for Thread in Threads:
+      Thread.join()
+    return([Results[Sid] for Sid in Targets])
+
+  def stamps(self, Dbid, Instance):
+    Dir = self.path(Dbid, Instance)
+    if (self.store_dir == '' or not isdir(Dir)):
+      return([])
+    return(sorted([File[:-7] for File in listdir(Dir) if File.endswith('.pkl.gz')]))
+
+  def snapshots(self, Dbid='', Instance=''):
+    # Returns a sorted list of (Dbid, Instance, Stamp).
+    List = []
+    if (not isdir(self.store_dir)):
+      return(List)
+    for Db in sorted(listdir(self.store_dir)):
+      if ((Dbid != '' and Db != Dbid) or not isdir(pathjoin(self.store_dir, Db))):
+        continue
+      for Inst in sorted(listdir(pathjoin(self.store_dir, Db))):
+        if ((Instance != '' and Inst != Instance) or not isdir(self.path(Db, Inst))):
+          continue
+        for Stamp in self.stamps(Db, Inst):
+          List.append((Db, Inst, Stamp))
+    return(List)
+
+  def find(self, Spec):
+    # Resolves [DBID/]INSTANCE[@TIME] to (Dbid, Instance, Stamp), or None.
+    Time = ''
+    if ('@' in Spec):
+      (Spec, Time) = Spec.split('@', 1)
+      Time = ''.join([Char for Char in Time if Char.isdigit()])
+    Dbid = ''
+    if ('/' in Spec):
+      (Dbid, Spec) = Spec.split('/', 1)
+    Found = None
+    for (Db, Inst, Stamp) in self.snapshots(Dbid, Spec):
+      if (Stamp[:len(Time)] <= Time or Time == ''):
+        if (Found is None or Stamp > Found[2]):
+          Found = (Db, Inst, Stamp)
+    return(Found)
+
+  def load(self, Dbid, Instance, Stamp):
+    return(self.read(self.path(Dbid, Instance, Stamp)))
+
+  def descriptions(self, Dbid):
+    Filename = pathjoin(self.store_dir, Dbid, 'desc.pkl.gz')
+    if (self.store_dir != '' and isfile(Filename)):
+      return(self.read(Filename))
+    return({})
+
+  def diff(self, Old, New, Hidden=True):
+    # Returns a sorted list of (Name, OldValue, NewValue) for every parameter
+    # that's different (None = parameter isn't in that snapshot).
+    Old  = Old['parms']
+    New  = New['parms']
+    Diff = []
+    for Name in set(Old) | set(New):
+      if (not Hidden and Name.startswith('_')):
+        continue
+      OldValue = Old.get(Name, (None,))[0]
+      NewValue = New.get(Name, (None,))[0]
+      if (OldValue != NewValue):
+        Diff.append((Name, OldValue, NewValue))
+    Diff.sort(key=lambda Row: Row[0].replace('_', ''))
+    return(Diff)
+
+  def history(self, Dbid, Instance, Hidden=True):
+    # Generates (Stamp, Name, OldValue, NewValue) for each change between one
+    # snapshot of an instance and the next.
+    Prev = None
+    for Stamp in self.stamps(Dbid, Instance):
+      Snap = self.load(Dbid, Instance, Stamp)
+      if (Prev is not None):
+        for (Name, OldValue, NewValue) in self.diff(Prev, Snap, Hidden):
+          yield (Stamp, Name, OldValue, NewValue)
+      Prev = Snap
+# ---------------------------------------------------------------------------
+# End ParameterStore()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: RedoHistory()
+# Desc: Local store of the redo log switch history, so log switch histograms
+#       can be built without pivoting all of v$log_history on the database
+#       every time. refresh() only pulls the logs after the last sequence#
+#       already stored for each thread (and incarnation), along with the
+#       size of the archived log, and the store keeps them after they have
+#       aged out of the controlfile.
+#
+#       The store is one gzip'd pickle file per database, StoreDir/DBID.pkl.gz,
+#       holding:
+#         {(thread#, resetlogs_change#): {sequence#: (first_time, bytes)}}
+#       where first_time is a YYYYMMDDHHMISS integer and bytes is the size of
+#       the archived log (0 if there isn't one). In archivelog mode, logs
+#       that haven't been archived yet are pulled again by the next refresh().
+#
+#       Redo = RedoHistory()
+#       Redo.refresh()
+#       for (Thread, Label, Hours) in Redo.histogram('day', Days=14):
+#         ...
+#       Redo.close()
+# Args: StoreDir, directory to keep the history in. Default is
+#       PrivateDir('.redostore', 'REDO_STORE'). If there isn't one nothing
+#       is kept, each refresh() pulls what the controlfile still has.
+#       ConnectString, used to open the sqlplus session.
+# ---------------------------------------------------------------------------
+class RedoHistory:
+  def __init__(self, StoreDir='', ConnectString='/ as sysdba'):
+    if (StoreDir == ''):
+      StoreDir = PrivateDir('.redostore', 'REDO_STORE')
+    self.store_dir = StoreDir
+    self.connect_string = ConnectString
+    self.session = None
+    self.dbid = ''
+    self.log_mode = ''
+    self.filename = ''
+    self.logs = {}
+    self.errors = []
+    self.added = 0
+
+    self.settings  = "set echo          off\n"
+    self.settings += "set feedback      off\n"
+    self.settings += "set heading       off\n"
+    self.settings += "set pagesize      0\n"
+    self.settings += "set newpage       none\n"
+    self.settings += "set linesize      32767\n"
+    self.settings += "set tab           off\n"
+    self.settings += "set trimout       on\n"
+    self.settings += "set trimspool     on\n"
+    self.settings += "set verify        off\n"
+
+  def open(self):
+    if (self.session is None):
+      self.session = SqlplusSession(self.connect_string, self.settings)
+    return (self.session.rc == 0)
+
+  def close(self):
+    if (self.session is not None):
+      self.session.close()
+      self.session = None
+
+  def load(self, Dbid):
+    self.dbid = str(Dbid)
+    self.filename = ''
+    self.logs = {}
+    if (self.store_dir != ''):
+      self.filename = pathjoin(self.store_dir, self.dbid + '.pkl.gz')
+    if (self.filename != '' and isfile(self.filename)):
+      try:
+        hFile = gzip.open(self.filename, 'rb')
+        self.logs = pickle.load(hFile)
+        hFile.close()
+      except Exception:
+        self.logs = {}                       # unreadable store, start over
+
+  def save(self):
+    if (self.filename == ''):
+      return
+    if (not isdir(self.store_dir)):
+      makedirs(self.store_dir)
+    TmpFile = self.filename + '.' + str(getpid()) + '.tmp'
+    hFile = gzip.open(TmpFile, 'wb')
+    pickle.dump(self.logs, hFile, 2)
+    hFile.close()
+    rename(TmpFile, self.filename)
+
+  def watermarks(self):
+    # The sequence# of each (thread#, resetlogs_change#) up to which nothing
+    # needs to be pulled again: the last archived one in archivelog mode,
+    # otherwise the last one stored.
+    Marks = {}
+    for Key in self.logs:
+      Logs = self.logs[Key]
+      Archived = [Seq for Seq in Logs if Logs[Seq][1] > 0]
+      if (self.log_mode == 'ARCHIVELOG' and Archived != []):
+        Marks[Key] = max(Archived)
+      elif (len(Logs) > 0):
+        Marks[Key] = max(Logs)
+    return(Marks)
+
+  def predicate(self, Alias, Marks, Indent=''):
+    # Logs of threads/incarnations not seen yet, or past their watermark.
+    Keys = sorted(Marks)
+    Sql  = "((" + Alias + ".thread#, " + Alias + ".resetlogs_change#) NOT IN (" + ", ".join(['(%d, %d)' % Key for Key in Keys]) + ")"
+    for Key in Keys:
+      Sql += "\n" + Indent + " OR (" + Alias + ".thread# = %d AND " % Key[0] + Alias + ".resetlogs_change# = %d AND " % Key[1] + Alias + ".sequence# > %d)" % Marks[Key]
+    return(Sql + ")")
+
+  def history_sql(self, Marks={}):
+    Sql  = "SELECT h.thread#\n"
+    Sql += "    || '!~!' || h.resetlogs_change#\n"
+    Sql += "    || '!~!' || h.sequence#\n"
+    Sql += "    || '!~!' || TO_CHAR(h.first_time, 'YYYYMMDDHH24MISS')\n"
+    Sql += "    || '!~!' || NVL(a.bytes, 0)\n"
+    Sql += "  FROM v$log_history h\n"
+    Sql += "     , (SELECT l.thread#\n"
+    Sql += "             , l.resetlogs_change#\n"
+    Sql += "             , l.sequence#\n"
+    Sql += "             , MAX(l.blocks * l.block_size) bytes\n"
+    Sql += "          FROM v$archived_log l\n"
+    if (Marks != {}):
+      Sql += "         WHERE " + self.predicate('l', Marks, ' ' * 15) + "\n"
+    Sql += "         GROUP BY l.thread#, l.resetlogs_change#, l.sequence#) a\n"
+    Sql += " WHERE a.thread# (+) = h.thread#\n"
+    Sql += "   AND a.resetlogs_change# (+) = h.resetlogs_change#\n"
+    Sql += "   AND a.sequence# (+) = h.sequence#\n"
+    if (Marks != {}):
+      Sql += "   AND " + self.predicate('h', Marks, ' ' * 7) + "\n"
+    Sql += " ORDER BY h.thread#, h.resetlogs_change#, h.sequence#;"
+    return(Sql)
+
+  def refresh(self, Rebuild=False):
+    # Returns the number of logs added to the store, -1 if it failed.
+    if (not self.open()):
+      return(-1)
+
+    (rc, Stdout) = self.session.run("SELECT dbid || ' ' || log_mode FROM v$database;")
+    if (rc != 0 or len(Stdout.split()) != 2):
+      self.errors.append(Stdout.strip())
+      return(-1)
+    (Dbid, self.log_mode) = Stdout.split()
+    self.load(Dbid)
+    if (Rebuild):
+      self.logs = {}
+
+    self.added = 0
+    for Line in self.session.stream(self.history_sql(self.watermarks())):
+      Row = Line.split('!~!')
+      if (len(Row) == 5 and Row[0].strip().isdigit()):
+        Key  = (int(Row[0]), int(Row[1]))
+        Seq  = int(Row[2])
+        Logs = self.logs.setdefault(Key, {})
+        if (not Seq in Logs):
+          self.added += 1
+        Logs[Seq] = (int(Row[3]), int(Row[4]))
+      elif (self.session.errors is not None and self.session.errors.match(Line)):
+        self.errors.append(Line.strip())
+
+    if (self.errors == []):
+      self.save()
+    else:
+      return(-1)
+    return(self.added)
+
+  def threads(self):
+    return(sorted(set([Key[0] for Key in self.logs])))
+
+  def histogram(self, Unit='day', Weight='count', Days=0, Threads=[], PerThread=False):
+    # Returns a list of (Thread, Label, Hours) where Hours is 24 values, the
+    # number of log switches (Weight='count') or bytes of redo (Weight='bytes')
+    # in each hour. Unit='day' gives one row per date (YYYY-MM-DD), newest
+    # first. Unit='week' gives one row per day of the week (Mon .. Sun).
+    # Thread is 0 unless PerThread, then there is a set of rows per thread.
+    # Days > 0 keeps only the last Days days. Threads limits it to those threads.
+    from datetime import timedelta
+
+    Cutoff = 0
+    if (Days > 0):
+      Cutoff = int((datetime.now() - timedelta(days=Days - 1)).strftime('%Y%m%d')) * 1000000
+    Weekdays = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    Labels   = {}                            # YYYYMMDD -> row label
+    Hist     = {}
+
+    for Key in self.logs:
+      Thread = Key[0]
+      if (Threads != [] and not Thread in Threads):
+        continue
+      if (not PerThread):
+        Thread = 0
+      for (First, Bytes) in self.logs[Key].values():
+        if (First < Cutoff):
+          continue
+        Day = First // 1000000
+        if (not Day in Labels):
+          if (Unit == 'week'):
+            Labels[Day] = datetime(Day // 10000, Day // 100 % 100, Day % 100).weekday()
+          else:
+            Labels[Day] = '%04d-%02d-%02d' % (Day // 10000, Day // 100 % 100, Day % 100)
+        Bucket = (Thread, Labels[Day])
+        if (not Bucket in Hist):
+          Hist[Bucket] = [0] * 24
+        if (Weight == 'bytes'):
+          Hist[Bucket][First // 10000 % 100] += Bytes
+        else:
+          Hist[Bucket][First // 10000 % 100] += 1
+
+    if (Unit == 'week'):
+      return([(Thread, Weekdays[Label], Hist[(Thread, Label)]) for (Thread, Label) in sorted(Hist)])
+    Buckets = sorted(Hist, key=lambda Bucket: Bucket[1], reverse=True)
+    Buckets.sort(key=lambda Bucket: Bucket[0])
+    return([(Thread, Label, Hist[(Thread, Label)]) for (Thread, Label) in Buckets])
+# ---------------------------------------------------------------------------
+# End RedoHistory()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: ContainerPool()
+# Desc: Runs a query in each container (PDB) of a CDB, several containers at
+#       a time, and hands back all the rows together. Querying the CDB_ views
+#       from the root fans out to every PDB inside one statement, which can
+#       take minutes on a CDB with hundreds of PDBs. Instead each session of
+#       a small pool switches to one container at a time (alter session set
+#       container) and queries the DBA_ views there. Sessions are logged in
+#       by the worker threads, so the logins overlap too, and are kept for
+#       the next collect() until close().
+#
+#       With a CacheTtl, the rows of each container are kept in
+#       CacheDir/CDB_DBID/CON_UID/NAME.pkl.gz and aren't queried again within
+#       CacheTtl seconds, unless the container has been opened again since
+#       (open_time changed) or the query is different.
+#
+#       Containers that aren't open (MOUNTED) can't be switched to. collect()
+#       leaves them out and lists them in closed, what the root knows about
+#       them can be queried with root().
+#
+#       Pool = ContainerPool(Sessions=8, CacheTtl=300)
+#       for (ConId, ConName, Row) in Pool.collect('free', Sql)[0]:
+#         ...
+#       Pool.close()
+# Args: ConnectString, used to open the sqlplus sessions.
+#       Sessions, number of sessions (containers queried at a time).
+#       CacheTtl, seconds the rows of a container are good for (0 = no cache).
+#       CacheDir, default is PrivateDir('.containercache', 'CONTAINER_CACHE').
+#       If there isn't one nothing is cached.
+# ---------------------------------------------------------------------------
+class ContainerPool:
+  def __init__(self, ConnectString='/ as sysdba', Sessions=4, CacheTtl=0, CacheDir=''):
+    if (CacheDir == '' and CacheTtl > 0):
+      CacheDir = PrivateDir('.containercache', 'CONTAINER_CACHE')
+    self.connect_string = ConnectString
+    self.sessions = [None] * max(1, Sessions)
+    self.cache_ttl = CacheTtl
+    self.cache_dir = CacheDir
+    self.dbid = ''
+    self.errors = []
+    self.cached = 0                          # containers answered from the cache by the last collect()
+    self.closed = []                         # containers the last collect() left out, not open
+    self.lock = threading.Lock()
+
+    self.settings  = "set echo          off\n"
+    self.settings += "set feedback      off\n"
+    self.settings += "set heading       off\n"
+    self.settings += "set pagesize      0\n"
+    self.settings += "set newpage       none\n"
+    self.settings += "set linesize      32767\n"
+    self.settings += "set tab           off\n"
+    self.settings += "set trimout       on\n"
+    self.settings += "set trimspool     on\n"
+    self.settings += "set verify        off\n"
+
+  def session(self, Slot):
+    if (self.sessions[Slot] is None):
+      self.sessions[Slot] = SqlplusSession(self.connect_string, self.settings)
+    return(self.sessions[Slot])
+
+  def close(self):
+    for Slot in range(len(self.sessions)):
+      if (self.sessions[Slot] is not None):
+        self.sessions[Slot].close()
+        self.sessions[Slot] = None
+
+  def query(self, Session, Container, Sql, Colsep='!~!'):
+    # Returns (Rows, Errors) of Sql run in Container.
+    Rows   = []
+    Errors = []
+    Script = 'alter session set container = "' + Container + '";\n\n' + Sql
+    for Line in Session.stream(Script):
+      if (Session.errors is not None and Session.errors.match(Line)):
+        Errors.append(Line.strip())
+      elif (Colsep in Line):
+        Rows.append([Value.strip() for Value in Line.split(Colsep)])
+    if (Session.rc != 0 and Errors == []):
+      Errors.append('sqlplus session ended in ' + Container)
+    return(Rows, Errors)
+
+  def root(self, Sql, Colsep='!~!'):
+    # Returns (Rows, Errors) of Sql run in the root.
+    return(self.query(self.session(0), 'CDB$ROOT', Sql, Colsep))
+
+  def containers(self):
+    # Returns a list of (ConId, Name, OpenMode, ConUid, OpenTime) from v$containers.
+    Sql  = "SELECT c.con_id\n"
+    Sql += "    || '!~!' || c.name\n"
+    Sql += "    || '!~!' || c.open_mode\n"
+    Sql += "    || '!~!' || c.con_uid\n"
+    Sql += "    || '!~!' || TO_CHAR(c.open_time, 'YYYYMMDDHH24MISS')\n"
+    Sql += "    || '!~!' || d.dbid\n"
+    Sql += "  FROM v$containers c\n"
+    Sql += "     , v$database   d\n"
+    Sql += " ORDER BY c.con_id;"
+    Session = self.session(0)
+    if (Session.rc != 0 and not Session.is_open()):
+      self.errors.append('Cannot start sqlplus.')
+      return([])
+    (Rows, Errors) = self.query(Session, 'CDB$ROOT', Sql)
+    if (Errors != []):
+      self.errors.extend(Errors)
+      return([])
+    Containers = []
+    for Row in Rows:
+      if (len(Row) == 6):
+        self.dbid = Row[5]
+        Containers.append((int(Row[0]), Row[1], Row[2], Row[3], Row[4]))
+    return(Containers)
+
+  def cache_file(self, ConUid, Name):
+    return(pathjoin(self.cache_dir, self.dbid, ConUid, Name + '.pkl.gz'))
+
+  def read_cache(self, Container, Name, Sql):
+    from time import time
+
+    Filename = self.cache_file(Container[3], Name)
+    if (self.cache_ttl <= 0 or self.cache_dir == '' or not isfile(Filename)):
+      return(None)
+    try:
+      hFile = gzip.open(Filename, 'rb')
+      (Stamp, OpenTime, CachedSql, Rows) = pickle.load(hFile)
+      hFile.close()
+    except Exception:
+      return(None)
+    if (time() - Stamp > self.cache_ttl or OpenTime != Container[4] or CachedSql != Sql):
+      return(None)
+    return(Rows)
+
+  def write_cache(self, Container, Name, Sql, Rows):
+    from time import time
+
+    if (self.cache_ttl <= 0 or self.cache_dir == ''):
+      return
+    Filename = self.cache_file(Container[3], Name)
+    try:
+      if (not isdir(dirname(Filename))):
+        makedirs(dirname(Filename))
+      TmpFile = Filename + '.' + str(getpid()) + '.tmp'
+      hFile = gzip.open(TmpFile, 'wb')
+      pickle.dump((time(), Container[4], Sql, Rows), hFile, 2)
+      hFile.close()
+      rename(TmpFile, Filename)
+    except (IOError, OSError):
+      pass                                   # no cache, no harm
+
+  def collect(self, Name, Sql, MinConId=1, Colsep='!~!'):
+    # Runs Sql in every open container with a con_id >= MinConId (1 = the
+    # root too, 3 = PDBs only). Name identifies the query in the cache.
+    # Returns (Rows, Errors) where Rows is a list of (ConId, ConName, Row)
+    # in con_id order and Errors is a list of (ConName, Error).
+    self.cached = 0
+    Containers  = [Container for Container in self.containers() if Container[0] >= MinConId]
+    self.closed = [Container for Container in Containers if Container[2] == 'MOUNTED']
+    Containers  = [Container for Container in Containers if Container[2] != 'MOUNTED']
+    if (self.errors != []):
+      return([], [('CDB$ROOT', Error) for Error in self.errors])
+
+    Results = {}
+    Errors  = []
+    Work    = Queue()
+    for Container in Containers:
+      Rows = self.read_cache(Container, Name, Sql)
+      if (Rows is None):
+        Work.put(Container)
+      else:
+        Results[Container[0]] = Rows
+        self.cached += 1
+
+    def Worker(Slot):
+      Session = None
+      while True:
+        try:
+          Container = Work.get_nowait()
+        except Empty:
+          return
+        if (Session is None):
+          Session = self.session(Slot)
+        (Rows, QueryErrors) = self.query(Session, Container[1], Sql, Colsep)
+        if (QueryErrors == []):
+          Results[Container[0]] = Rows
+          self.write_cache(Container, Name, Sql, Rows)
+        else:
+          self.lock.acquire()
+          try:
+            Errors.extend([(Container[1], Error) for Error in QueryErrors])
+          finally:
+            self.lock.release()
+
+    Threads = []
+    for Slot in range(min(len(self.sessions), Work.qsize())):
+      Thread = threading.Thread(target=Worker, args=(Slot,))
+      Thread.start()
+      Threads.append(Thread)
+    for Thread in Threads:
+      Thread.join()
+
+    Rows = []
+    for Container in Containers:
+      for Row in Results.get(Container[0], []):
+        Rows.append((Container[0], Container[1], Row))
+    return(Rows, Errors)
+# ---------------------------------------------------------------------------
+# End ContainerPool()
+# ---------------------------------------------------------------------------
+
+
+
+
+# ---------------------------------------------------------------------------
+# Def : RunRman()
+# Desc: Runs rman commands.
+# Args: RCV, string, containing rman commands or run block to execute.
+#       ErrChk, True/False determines whether or not to check output for errors.
+#       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunProcess()).
+# Retn: If ErrChk=True then return:
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if rman was killed)
+#          Output (string, stdout+stderr)
+#          ErrorList (list, error stack, ends with a TIMEOUT, TRUNCATED or
+#             ABORTED entry if rman was killed)
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
+# ---------------------------------------------------------------------------
+def RunRman(RCV, ErrChk=True, ConnectString='target /', Timeout=0, MaxOutput=0, AbortOnError=False):
+  if (ConnectString == '/ as sysdba'):
+    if (not('ORACLE_SID' in environ.keys())):
+      print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
+      return (1, '', [])
+    if (not('ORACLE_HOME' in environ.keys())):
+      OracleSid, OracleHome = SetOracleEnv(environ['ORACLE_SID'])
 
   # Set the location of the ORACLE_HOME. If ORACLE_HOME is not set
   # then we'll use the first one we find in the oratab file.
@@ -1357,13 +4291,18 @@ def RunRman(RCV, ErrChk=True, ConnectString='target /'):
       print('ORACLE_HOME is not set')
       return (1, '', [])
 
-  # Start Rman and login
-  proc = Popen([Rman, ConnectString], bufsize=-1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
-   shell=False, universal_newlines=True, close_fds=True)
+  Status = ''
+  if (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    # Start Rman, login and run the commands with limits on the run.
+    (RunRc, Stdout, Status) = RunProcess([Rman, ConnectString], RCV, Timeout, MaxOutput, AbortOnError)
+  else:
+    # Start Rman and login
+    proc = Popen([Rman, ConnectString], bufsize=-1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+     shell=False, universal_newlines=True, close_fds=True)
 
-  # Execute the Sql and fetch the output -
-  # Stderr is just a placeholder. We redirected stderr to stdout as follows 'stderr=STDOUT'.
-  (Stdout, Stderr) = proc.communicate(RCV)
+    # Execute the Sql and fetch the output -
+    # Stderr is just a placeholder. We redirected stderr to stdout as follows 'stderr=STDOUT'.
+    (Stdout, Stderr) = proc.communicate(RCV)
 
   # Check for rman errors
   if (ErrChk):
@@ -1386,7 +4325,12 @@ def RunRman(RCV, ErrChk=True, ConnectString='target /'):
     # For example an ErrorList might look like this:
     # [['ORA-00001', 'ORA-00001: unique constraint...'],['ORA-00018', 'ORA-00018, 00000, "maximum number of..."']]
     (rc, ErrorList) = ErrorCheck(Stdout, ComponentList)
+    if (Status != ''):
+      rc = RunRc
+      ErrorList.append(RunStatusError(Status, 'rman', Timeout, MaxOutput, Stdout))
     return(rc,Stdout,ErrorList)
+  elif (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    return(RunRc,Stdout)
   else:
     return(Stdout)
 # ---------------------------------------------------------------------------
@@ -1394,6 +4338,418 @@ def RunRman(RCV, ErrChk=True, ConnectString='target /'):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Def : StreamRman()
+# Desc: Runs rman commands and returns the output one line at a time as rman
+#       prints it. Unlike RunRman() the output is never held in memory, so
+#       this is the one to use for LIST BACKUP and friends on databases with
+#       a long backup history. Feed the lines to ParseRmanOutput() for typed
+#       records or just print them.
+# Args: RCV, string, containing rman commands or run block to execute.
+#       ConnectString, used for connecting to the database
+# Retn: Generator of output lines (trailing newline removed).
+# ---------------------------------------------------------------------------
+def StreamRman(RCV, ConnectString='target /'):
+  if (ConnectString == '/ as sysdba'):
+    if (not('ORACLE_SID' in environ.keys())):
+      print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
+      return
+    if (not('ORACLE_HOME' in environ.keys())):
+      OracleSid, OracleHome = SetOracleEnv(environ['ORACLE_SID'])
+
+  # Set the location of the ORACLE_HOME. If ORACLE_HOME is not set
+  # then we'll use the first one we find in the oratab file.
+  if ('ORACLE_HOME' in environ.keys()):
+    OracleHome = environ['ORACLE_HOME']
+    Rman = OracleHome + '/bin/rman'
+  else:
+    OratabDict = LoadOratab()
+    if (len(OratabDict) >= 1):
+      SidList = list(OratabDict.keys())
+      OracleSid  = SidList[0]
+      OracleHome = OratabDict[SidList[0]]
+      environ['ORACLE_HOME'] = OracleHome
+      Rman = OracleHome + '/bin/rman'
+    else:
+      print('ORACLE_HOME is not set')
+      return
+
+  # Start Rman and login
+  proc = Popen([Rman, ConnectString], bufsize=1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+   shell=False, universal_newlines=True, close_fds=True)
+
+  # Hand rman the whole script then close stdin so it exits when it's done.
+  proc.stdin.write(RCV)
+  proc.stdin.close()
+
+  try:
+    for line in iter(proc.stdout.readline, ''):
+      yield line.rstrip('\n')
+  finally:
+    # If the caller stops reading early don't leave rman hanging around.
+    if (proc.poll() is None):
+      try:
+        proc.kill()
+      except:
+        pass
+    proc.stdout.close()
+    proc.wait()
+# ---------------------------------------------------------------------------
+# End StreamRman()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : CompileErrorCheck()
+# Desc: Builds one compiled regular expression that matches any error code
+#       for the components listed (same component rules as ErrorCheck()).
+#       Used when output is scanned a line at a time so the facilities file
+#       is loaded once rather than once per line.
+# Args: ComponentList (list of components, default=ALL_COMPONENTS)
+#       OracleHome (default is $ORACLE_HOME)
+# Retn: Compiled regular expression or None if ORACLE_HOME is not set.
+# ---------------------------------------------------------------------------
+def CompileErrorCheck(ComponentList=['ALL_COMPONENTS'], OracleHome=''):
+  FacilityList = []
+
+  if (OracleHome == '' and 'ORACLE_HOME' in environ.keys()):
+    OracleHome = environ['ORACLE_HOME']
+  if (OracleHome != ''):
+    FacilitiesFile = OracleHome + '/lib/facility.lis'
+    FacilitiesDD = LoadFacilities(FacilitiesFile)
+  else:
+    print('ORACLE_HOME is not set')
+    return(None)
+
+  for key in sorted(FacilitiesDD.keys()):
+    if (ComponentList[0].upper() == 'ALL_COMPONENTS'):
+      FacilityList.append(key.upper())
+    else:
+      for Component in ComponentList:
+        if (Component == FacilitiesDD[key]['Component']):
+          FacilityList.append(key.upper())
+
+  if (FacilityList == []):
+    return(None)
+
+  return(compile(r'(?:' + '|'.join(FacilityList) + r')-\d\d\d\d'))
+# ---------------------------------------------------------------------------
+# End CompileErrorCheck()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RmanSizeToBytes()
+# Desc: Converts an rman formatted size (ex: 9.36M, 1.07G, 512K, 220.00B) to
+#       bytes.
+# Args: Size string as printed by rman.
+# Retn: Bytes (int), 0 if the string could not be converted.
+# ---------------------------------------------------------------------------
+def RmanSizeToBytes(Size):
+  Multiplier = {'B':1, 'K':1024, 'M':1024**2, 'G':1024**3, 'T':1024**4, 'P':1024**5}
+
+  Size = Size.strip().upper()
+  if (Size == ''):
+    return(0)
+
+  Unit = Size[-1]
+  if (Unit in Multiplier.keys()):
+    Size = Size[:-1]
+  else:
+    Unit = 'B'
+
+  try:
+    return(int(float(Size) * Multiplier[Unit]))
+  except ValueError:
+    return(0)
+# ---------------------------------------------------------------------------
+# End RmanSizeToBytes()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ParseRmanOutput()
+# Desc: Incremental parser for LIST BACKUP, LIST COPY and REPORT SCHEMA
+#       output. Reads rman output a line at a time (from StreamRman() or any
+#       other iterable of lines) and yields one dictionary per record found.
+#       Nothing is kept in memory but the record being assembled, so callers
+#       can filter and total up records on the fly.
+#
+#       Every record has a 'Type' key, one of:
+#         BACKUP_SET     : BsKey, BackupType, Level, Bytes, DeviceType,
+#                          ElapsedTime, CompletionTime
+#         BACKUP_PIECE   : BsKey, BpKey, PieceNumber, Copy, Status,
+#                          Compressed, Tag, DeviceType, Handle
+#         DATAFILE       : BsKey, File, Level, BackupType, CkpScn, CkpTime,
+#                          Name (datafiles in a backup set)
+#         ARCHIVELOG     : BsKey, Thread, Sequence, LowScn, LowTime,
+#                          NextScn, NextTime (archivelogs in a backup set)
+#         COPY           : CopyType (DATAFILE, CONTROLFILE, ARCHIVELOG), Key,
+#                          File, Thread, Sequence, Status, Name, Tag
+#         SCHEMA_DATAFILE: File, Bytes, Tablespace, Name (REPORT SCHEMA)
+#         SCHEMA_TEMPFILE: File, Bytes, Tablespace, Name (REPORT SCHEMA)
+#         ERROR          : Error, Line (only if ErrChk=True)
+#
+#       Dates are returned as printed so set NLS_DATE_FORMAT before calling
+#       rman if you need a particular format.
+# Args: Lines, iterable of rman output lines.
+#       ErrChk, True/False determines whether or not to check lines for errors.
+#       ComponentList, components to check for errors (see ErrorCheck()).
+# Retn: Generator of record dictionaries.
+# ---------------------------------------------------------------------------
+def ParseRmanOutput(Lines, ErrChk=True, ComponentList=['ALL_COMPONENTS']):
+  Section    = ''               # Which "List of ..." section we're in.
+  BsKey      = None             # Backup set the current detail lines belong to.
+  DeviceType = ''
+  Tag        = ''
+  Compressed = ''
+  Copy       = 1
+  Pending    = None             # COPY record waiting for its Name:/Tag: lines.
+  ErrorMatch = None
+  Digits     = compile(r'^\d+$')
+  SetRow     = compile(r'^(\d+)\s+(Full|Incr)\s+(?:(\S+)\s+)?(\S+)\s+(\S+)\s+(\d\d:\d\d:\d\d)\s+(.*)$')
+  ArchSetRow = compile(r'^(\d+)\s+(\S+)\s+(\S+)\s+(\d\d:\d\d:\d\d)\s+(.*)$')
+  BpKeyLine  = compile(r'^BP Key:\s*(\d+)\s+Status:\s*(\S+)\s+Compressed:\s*(\S+)\s+Tag:\s*(\S*)')
+  NewSet     = compile(r'List of (Datafiles|Archived Logs|Backup Pieces) (?:in|for) backup set (\d+)(?: Copy #(\d+))?')
+
+  if (ErrChk):
+    ErrorMatch = CompileErrorCheck(ComponentList)
+
+  for line in Lines:
+    if (ErrorMatch is not None):
+      MatchObj = ErrorMatch.search(line)
+      if (MatchObj):
+        yield {'Type': 'ERROR', 'Error': MatchObj.group(), 'Line': line}
+
+    Text = line.strip()
+
+    # A blank line ends whatever COPY record was being assembled.
+    if (Text == ''):
+      if (Pending is not None):
+        yield Pending
+        Pending = None
+      continue
+
+    # Skip column headings and underlines.
+    if (Text.startswith('---') or Text.startswith('===')):
+      continue
+    if (Text.startswith('BS Key')):
+      Section = 'Backup Sets'    # Every backup set row follows a "BS Key" heading.
+      continue
+    if (Text.startswith('Key ') or Text.startswith('File ') or Text.startswith('Thrd ') or \
+        Text.startswith('BP Key  Pc#') or Text.startswith('Device Type')):
+      continue
+
+    # Section headers.
+    if (Text.startswith('List of ') or Text.startswith('Backup Set Copy #')):
+      if (Pending is not None):
+        yield Pending
+        Pending = None
+      MatchObj = NewSet.search(Text)
+      if (MatchObj):
+        Section = MatchObj.group(1)
+        BsKey   = int(MatchObj.group(2))
+        if (MatchObj.group(3)):
+          Copy = int(MatchObj.group(3))
+      elif (Text.startswith('Backup Set Copy #')):
+        Section = 'Backup Set Copy'
+        try:
+          Copy = int(Text.split('#')[1].split()[0])
+        except:
+          Copy = 1
+      elif (Text.startswith('List of Backup Sets')):
+        Section = 'Backup Sets'
+      elif (Text.startswith('List of Datafile Copies')):
+        Section = 'Datafile Copies'
+      elif (Text.startswith('List of Control File Copies')):
+        Section = 'Control File Copies'
+      elif (Text.startswith('List of Archived Log Copies')):
+        Section = 'Archived Log Copies'
+      elif (Text.startswith('List of Permanent Datafiles')):
+        Section = 'Permanent Datafiles'
+      elif (Text.startswith('List of Temporary Files')):
+        Section = 'Temporary Files'
+      else:
+        Section = ''
+      continue
+
+    Fields = Text.split()
+
+    # ---- Backup sets and their pieces ----
+    if (Section in ('Backup Sets', 'Datafiles', 'Archived Logs', 'Backup Pieces', 'Backup Set Copy')):
+      if (Section == 'Backup Sets'):
+        MatchObj = SetRow.match(Text)
+        if (MatchObj):
+          BsKey      = int(MatchObj.group(1))
+          DeviceType = MatchObj.group(5)
+          Compressed = ''
+          Tag        = ''
+          Copy       = 1
+          yield {'Type'           : 'BACKUP_SET',
+                 'BsKey'          : BsKey,
+                 'BackupType'     : MatchObj.group(2),
+                 'Level'          : MatchObj.group(3) or '',
+                 'Bytes'          : RmanSizeToBytes(MatchObj.group(4)),
+                 'DeviceType'     : DeviceType,
+                 'ElapsedTime'    : MatchObj.group(6),
+                 'CompletionTime' : MatchObj.group(7).strip()}
+          continue
+        MatchObj = ArchSetRow.match(Text)
+        if (MatchObj):
+          BsKey      = int(MatchObj.group(1))
+          DeviceType = MatchObj.group(3)
+          Compressed = ''
+          Tag        = ''
+          Copy       = 1
+          yield {'Type'           : 'BACKUP_SET',
+                 'BsKey'          : BsKey,
+                 'BackupType'     : 'Archivelog',
+                 'Level'          : '',
+                 'Bytes'          : RmanSizeToBytes(MatchObj.group(2)),
+                 'DeviceType'     : DeviceType,
+                 'ElapsedTime'    : MatchObj.group(4),
+                 'CompletionTime' : MatchObj.group(5).strip()}
+          continue
+
+      # Single piece sets: "BP Key: 1 Status: AVAILABLE Compressed: NO Tag: TAG..."
+      MatchObj = BpKeyLine.match(Text)
+      if (MatchObj):
+        Pending = {'Type'        : 'BACKUP_PIECE',
+                   'BsKey'       : BsKey,
+                   'BpKey'       : int(MatchObj.group(1)),
+                   'PieceNumber' : 1,
+                   'Copy'        : Copy,
+                   'Status'      : MatchObj.group(2),
+                   'Compressed'  : MatchObj.group(3),
+                   'Tag'         : MatchObj.group(4),
+                   'DeviceType'  : DeviceType,
+                   'Handle'      : ''}
+        continue
+
+      if (Text.startswith('Piece Name:')):
+        if (Pending is not None and Pending['Type'] == 'BACKUP_PIECE'):
+          Pending['Handle'] = Text.split(':', 1)[1].strip()
+          yield Pending
+          Pending = None
+        continue
+
+      if (Section == 'Datafiles' and Digits.match(Fields[0])):
+        if (len(Fields) >= 5):
+          if (Fields[1] in ('Full', 'Incr')):
+            Level = ''
+            Pos   = 1
+          else:
+            Level = Fields[1]
+            Pos   = 2
+          yield {'Type'       : 'DATAFILE',
+                 'BsKey'      : BsKey,
+                 'File'       : int(Fields[0]),
+                 'Level'      : Level,
+                 'BackupType' : Fields[Pos],
+                 'CkpScn'     : Fields[Pos+1],
+                 'CkpTime'    : ' '.join(Fields[Pos+2:-1]),
+                 'Name'       : Fields[-1]}
+        continue
+
+      if (Section == 'Archived Logs' and Digits.match(Fields[0])):
+        if (len(Fields) >= 5):
+          Next = 3
+          while (Next < len(Fields) and not Digits.match(Fields[Next])):
+            Next += 1
+          yield {'Type'     : 'ARCHIVELOG',
+                 'BsKey'    : BsKey,
+                 'Thread'   : int(Fields[0]),
+                 'Sequence' : int(Fields[1]),
+                 'LowScn'   : Fields[2],
+                 'LowTime'  : ' '.join(Fields[3:Next]),
+                 'NextScn'  : ' '.join(Fields[Next:Next+1]),
+                 'NextTime' : ' '.join(Fields[Next+1:])}
+        continue
+
+      # "DISK  00:01:00  2015-08-24 10:01  NO  TAG..." (Backup Set Copy #n)
+      if (Section == 'Backup Set Copy' and len(Fields) >= 4):
+        DeviceType = Fields[0]
+        Compressed = Fields[-2]
+        Tag        = Fields[-1]
+        continue
+
+      # "5  1  AVAILABLE  /u01/..." (List of Backup Pieces for backup set n)
+      if (Section == 'Backup Pieces' and Digits.match(Fields[0]) and len(Fields) >= 4):
+        yield {'Type'        : 'BACKUP_PIECE',
+               'BsKey'       : BsKey,
+               'BpKey'       : int(Fields[0]),
+               'PieceNumber' : int(Fields[1]),
+               'Copy'        : Copy,
+               'Status'      : Fields[2],
+               'Compressed'  : Compressed,
+               'Tag'         : Tag,
+               'DeviceType'  : DeviceType,
+               'Handle'      : Fields[-1]}
+        continue
+
+      continue
+
+    # ---- Copies ----
+    if (Section in ('Datafile Copies', 'Control File Copies', 'Archived Log Copies')):
+      if (Text.startswith('Name:')):
+        if (Pending is not None):
+          Pending['Name'] = Text.split(':', 1)[1].strip()
+        continue
+      if (Text.startswith('Tag:')):
+        if (Pending is not None):
+          Pending['Tag'] = Text.split(':', 1)[1].strip()
+        continue
+      if (Digits.match(Fields[0]) and len(Fields) >= 3):
+        if (Pending is not None):
+          yield Pending
+        Pending = {'Type'     : 'COPY',
+                   'CopyType' : '',
+                   'Key'      : int(Fields[0]),
+                   'File'     : None,
+                   'Thread'   : None,
+                   'Sequence' : None,
+                   'Status'   : '',
+                   'Name'     : '',
+                   'Tag'      : ''}
+        if (Section == 'Datafile Copies'):
+          Pending['CopyType'] = 'DATAFILE'
+          Pending['File']     = int(Fields[1])
+          Pending['Status']   = Fields[2]
+        elif (Section == 'Control File Copies'):
+          Pending['CopyType'] = 'CONTROLFILE'
+          Pending['Status']   = Fields[1]
+        elif (len(Fields) >= 4):
+          Pending['CopyType'] = 'ARCHIVELOG'
+          Pending['Thread']   = int(Fields[1])
+          Pending['Sequence'] = int(Fields[2])
+          Pending['Status']   = Fields[3]
+      continue
+
+    # ---- Report schema ----
+    if (Section in ('Permanent Datafiles', 'Temporary Files')):
+      if (Digits.match(Fields[0]) and len(Fields) >= 4):
+        if (Section == 'Permanent Datafiles'):
+          RecType = 'SCHEMA_DATAFILE'
+        else:
+          RecType = 'SCHEMA_TEMPFILE'
+        try:
+          Bytes = int(Fields[1]) * 1024 * 1024
+        except ValueError:
+          Bytes = 0
+        yield {'Type'       : RecType,
+               'File'       : int(Fields[0]),
+               'Bytes'      : Bytes,
+               'Tablespace' : Fields[2],
+               'Name'       : Fields[-1]}
+      continue
+
+  if (Pending is not None):
+    yield Pending
+# ---------------------------------------------------------------------------
+# End ParseRmanOutput()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Def : ErrorCheck()
 # Desc: Check tnsping, sqlplus, crsctl, srvctl output for errors.
@@ -1613,6 +4969,250 @@ def LoadFacilities(FacilitiesFile):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Def : ParseMessageFile()
+# Desc: Parses an Oracle message file (ex: $ORACLE_HOME/rdbms/mesg/oraus.msg).
+#       A message starts with a line like:
+#         00942, 00000, "table or view does not exist"
+#       and the // lines that follow it are its cause and action text. Takes
+#       its arguments as a tuple so it can be handed to a process pool.
+# Args: (Facility, MessagesFile)
+# Retn: (Facility, MessagesFile, Messages) where Messages is a list of
+#       (Code, [Lines])
+# ---------------------------------------------------------------------------
+def ParseMessageFile(Args):
+  import codecs
+
+  (Facility, MessagesFile) = Args
+  Messages = []
+  Msg      = None
+
+  try:
+    msgfil = codecs.open(MessagesFile, mode='r', encoding='ISO-8859-1', errors='strict')
+    MsgFileContents = msgfil.readlines()
+    msgfil.close()
+  except:
+    return(Facility, MessagesFile, None)
+
+  for line in MsgFileContents:
+    MatchObj = match(r'(\d+),', line)
+    if (MatchObj):
+      Msg = (MatchObj.group(1), [line.strip()])
+      Messages.append(Msg)
+    elif (Msg is not None and line.startswith('//')):
+      Msg[1].append(line.strip())
+  return(Facility, MessagesFile, Messages)
+# ---------------------------------------------------------------------------
+# End ParseMessageFile()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Clas: MessageCatalog()
+# Desc: Full text searchable catalog of the Oracle error messages installed
+#       in an ORACLE_HOME. Every message file listed in lib/facility.lis is
+#       parsed (in parallel, by a process pool) and each word of the message,
+#       cause and action text points to the messages that contain it.
+#
+#       The catalog is kept in CatalogDir/<ORACLE_HOME>/:
+#         FACILITY.pkl.gz - the parsed messages of one facility, with the
+#                           mtime and size of its message file.
+#         index.pkl       - the inverted index over all facilities:
+#                           word -> array of message numbers.
+#       refresh() only reparses the facilities whose message files were
+#       added, changed or removed since the last build, and only rebuilds
+#       index.pkl if one was. A search loads index.pkl, intersects the
+#       posting lists of its words and reads the text of just the matching
+#       messages.
+#
+#       Catalog = MessageCatalog()
+#       Catalog.refresh()
+#       for (Error, Lines) in Catalog.search('snapshot too old'):
+#         print(Error)
+# Args: OracleHome, default is $ORACLE_HOME.
+#       CatalogDir, directory to keep the catalog in. Default is
+#       PrivateDir('.msgcatalog', 'MSG_CATALOG'). refresh() fails if there
+#       isn't one.
+# ---------------------------------------------------------------------------
+class MessageCatalog:
+  def __init__(self, OracleHome='', CatalogDir=''):
+    if (OracleHome == ''):
+      OracleHome = environ.get('ORACLE_HOME', '')
+    if (CatalogDir == ''):
+      CatalogDir = PrivateDir('.msgcatalog', 'MSG_CATALOG')
+    self.oracle_home = OracleHome
+    self.catalog_dir = ''
+    if (CatalogDir != ''):
+      self.catalog_dir = pathjoin(CatalogDir, OracleHome.strip('/').replace('/', '_') or 'default')
+    self.errors = []
+    self.parsed = []                         # facilities parsed by the last refresh()
+    self.index = None
+
+  def read(self, Filename):
+    hFile = gzip.open(Filename, 'rb')
+    try:
+      return(pickle.load(hFile))
+    finally:
+      hFile.close()
+
+  def write(self, Filename, Obj, Compress=True):
+    if (not isdir(self.catalog_dir)):
+      makedirs(self.catalog_dir)
+    TmpFile = Filename + '.' + str(getpid()) + '.tmp'
+    if (Compress):
+      hFile = gzip.open(TmpFile, 'wb')
+    else:
+      hFile = open(TmpFile, 'wb')
+    pickle.dump(Obj, hFile, 2)
+    hFile.close()
+    rename(TmpFile, Filename)
+
+  def words(self, Text):
+    return set([Word for Word in compile(r'[a-z0-9_$#]+').findall(Text.lower()) if len(Word) > 1])
+
+  def message_files(self):
+    # Returns {Facility: MessagesFile} for the message files that are installed.
+    Files = {}
+    FacilitiesFile = pathjoin(self.oracle_home, 'lib', 'facility.lis')
+    if (not isfile(FacilitiesFile)):
+      self.errors.append('Cannot open facilities file: ' + FacilitiesFile)
+      return(Files)
+    FacilitiesDD = LoadFacilities(FacilitiesFile)
+    for Facility in FacilitiesDD:
+      MessagesFile = pathjoin(self.oracle_home, FacilitiesDD[Facility]['Component'], 'mesg', Facility + 'us.msg')
+      if (isfile(MessagesFile)):
+        Files[Facility] = MessagesFile
+    return(Files)
+
+  def load_index(self):
+    Filename = pathjoin(self.catalog_dir, 'index.pkl')
+    self.index = {'files': {}, 'ids': [], 'postings': {}}
+    if (self.catalog_dir != '' and isfile(Filename)):
+      try:
+        hFile = open(Filename, 'rb')
+        self.index = pickle.load(hFile)
+        hFile.close()
+      except Exception:
+        pass                                 # unreadable index, rebuilt by refresh()
+    return(self.index)
+
+  def refresh(self, Rebuild=False, Parallel=8):
+    # Returns the number of facilities (re)parsed, -1 if there are no message
+    # files to catalog.
+    from os import stat
+
+    self.errors = []
+    self.parsed = []
+    if (self.catalog_dir == ''):
+      self.errors.append('No private directory for the message catalog, set $MSG_CATALOG.')
+      return(-1)
+    Files = self.message_files()
+    if (Files == {}):
+      return(-1)
+    if (Rebuild):
+      self.index = {'files': {}, 'ids': [], 'postings': {}}
+    elif (self.index is None):
+      self.load_index()
+
+    Current = {}
+    for Facility in Files:
+      Stat = stat(Files[Facility])
+      Current[Facility] = (Stat.st_mtime, Stat.st_size)
+    Changed = sorted([Facility for Facility in Current if self.index['files'].get(Facility) != Current[Facility]])
+    Removed = [Facility for Facility in self.index['files'] if not Facility in Current]
+    if (Changed == [] and Removed == []):
+      return(0)
+
+    # Parse the changed message files, in a process pool if there's more than one.
+    Work = [(Facility, Files[Facility]) for Facility in Changed]
+    if (len(Work) > 1 and Parallel > 1):
+      from multiprocessing import Pool
+      Workers = Pool(min(Parallel, len(Work)))
+      try:
+        Results = Workers.map(ParseMessageFile, Work)
+      finally:
+        Workers.close()
+        Workers.join()
+    else:
+      Results = [ParseMessageFile(Args) for Args in Work]
+
+    for (Facility, MessagesFile, Messages) in Results:
+      if (Messages is None):
+        self.errors.append('Cannot open Messages file: ' + MessagesFile)
+        del Current[Facility]
+        continue
+      Postings = {}
+      for (Code, Lines) in Messages:
+        for Word in self.words(' '.join(Lines)):
+          Postings.setdefault(Word, []).append(Code)
+      self.write(pathjoin(self.catalog_dir, Facility + '.pkl.gz'), (Current[Facility], Messages, Postings))
+      self.parsed.append(Facility)
+    for Facility in Removed:
+      if (isfile(pathjoin(self.catalog_dir, Facility + '.pkl.gz'))):
+        unlink(pathjoin(self.catalog_dir, Facility + '.pkl.gz'))
+
+    # Merge the per facility postings into the index. Messages are numbered
+    # facility by facility so each posting list comes out sorted.
+    Index = {'files': {}, 'ids': [], 'postings': {}}
+    for Facility in sorted(Current):
+      try:
+        (FileStat, Messages, Postings) = self.read(pathjoin(self.catalog_dir, Facility + '.pkl.gz'))
+      except Exception:
+        self.errors.append('Cannot read catalog file: ' + pathjoin(self.catalog_dir, Facility + '.pkl.gz'))
+        continue
+      Numbers = {}
+      for (Code, Lines) in Messages:
+        Numbers[Code] = len(Index['ids'])
+        Index['ids'].append((Facility, Code))
+      for Word in Postings:
+        if (not Word in Index['postings']):
+          Index['postings'][Word] = array('i')
+        Index['postings'][Word].extend(sorted(set([Numbers[Code] for Code in Postings[Word]])))
+      Index['files'][Facility] = FileStat
+    self.write(pathjoin(self.catalog_dir, 'index.pkl'), Index, Compress=False)
+    self.index = Index
+    return(len(self.parsed))
+
+  def search(self, Query, Limit=0):
+    # Returns a list of (Error, Lines) for the messages that contain every
+    # word of Query, ex: [('ORA-01555', ['01555, 00000, "snapshot too old: ...', ...]), ...]
+    if (self.index is None):
+      self.load_index()
+    Words = self.words(Query)
+    if (len(Words) == 0):
+      return([])
+    Lists = []
+    for Word in Words:
+      if (not Word in self.index['postings']):
+        return([])
+      Lists.append(self.index['postings'][Word])
+    Lists.sort(key=len)
+    Hits = set(Lists[0])
+    for List in Lists[1:]:
+      Hits.intersection_update(List)
+      if (len(Hits) == 0):
+        return([])
+    Hits = sorted(Hits)
+    if (Limit > 0):
+      Hits = Hits[:Limit]
+
+    # Read the text of the matching messages, one facility file at a time.
+    Found = []
+    Texts = {}
+    for Hit in Hits:
+      (Facility, Code) = self.index['ids'][Hit]
+      if (not Facility in Texts):
+        try:
+          Texts[Facility] = dict(self.read(pathjoin(self.catalog_dir, Facility + '.pkl.gz'))[1])
+        except Exception:
+          Texts[Facility] = {}
+      Found.append((Facility.upper() + '-' + Code, Texts[Facility].get(Code, [])))
+    return(Found)
+# ---------------------------------------------------------------------------
+# End MessageCatalog()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Def : SetOracleEnv()
 # Desc: Setup your environemnt, eg. ORACLE_HOME, ORACLE_SID. (Parses oratab
@@ -1664,6 +5264,7 @@ def GetPassword(Name, User, Decrypt, PasswdFilename='/home/oracle/dba/etc/.passw
 
   except:
     print('\nCannot open password file for read:', PasswdFilename)
+    return('')
 
   for pwdLine in pwdContents.split('\n'):
     if (not (match(r'^\s*$', pwdLine))):               # skip blank lines
@@ -1689,34 +5290,231 @@ def GetPassword(Name, User, Decrypt, PasswdFilename='/home/oracle/dba/etc/.passw
 
 
 # ---------------------------------------------------------------------------
-# Sub : GetDbState()
-# Desc: Get the current state of the database (down, mounted, open)
+# Def : PasswdFilename()
+# Desc: Name of the password file GetPassword() reads for connect strings.
 # Args: <none>
-# Retn: STOPPED, STARTED, MOUNTED, OPEN, UNKNOWN
+# Retn: $PASSWD_FILE or /home/oracle/dba/etc/.passwd
+# ---------------------------------------------------------------------------
+def PasswdFilename():
+  return(environ.get('PASSWD_FILE', '/home/oracle/dba/etc/.passwd'))
+# ---------------------------------------------------------------------------
+# End PasswdFilename()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : LoadTargets()
+# Desc: Reads a targets file, one TNS alias per line, optionally with a user
+#       name (user@alias). Blank lines and # comments are skipped.
+#         # Production
+#         prod1
+#         dbsnmp@prod2
+# Args: TargetsFile, file name ('-' reads stdin).
+# Retn: List of targets, in file order, duplicates removed.
+# ---------------------------------------------------------------------------
+def LoadTargets(TargetsFile):
+  from sys import stdin
+
+  Targets = []
+  if (TargetsFile == '-'):
+    Lines = stdin.readlines()
+  else:
+    hFile = open(TargetsFile, 'r')
+    Lines = hFile.readlines()
+    hFile.close()
+  for line in Lines:
+    if (line.find('#') >= 0):
+      line = line[0:line.find('#')]
+    for Target in line.split():
+      if (not Target in Targets):
+        Targets.append(Target)
+  return(Targets)
+# ---------------------------------------------------------------------------
+# End LoadTargets()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ResolveConnectString()
+# Desc: Non-interactive ParseConnectString() for a target ([user[/password]@]
+#       alias). A missing user name is DefaultUser and a missing password
+#       comes from the password file. Nothing is prompted for.
+# Args: Target, ex: prod1, dbsnmp@prod2.
+#       DefaultUser, user name for targets that don't have one.
+#       Passwd, password file (default is PasswdFilename()).
+# Retn: (ConnStr, Error) - ConnStr is '' and Error says why if the target
+#       can't be resolved.
+# ---------------------------------------------------------------------------
+def ResolveConnectString(Target, DefaultUser='', Passwd=''):
+  Username = DefaultUser
+  Password = ''
+  TnsName  = Target
+  if ('@' in Target):
+    (Username, TnsName) = Target.rsplit('@', 1)
+    if ('/' in Username):
+      (Username, Password) = Username.split('/', 1)
+
+  if (TnsName == ''):
+    return('', 'No TNS alias: ' + Target)
+  if (Username == ''):
+    return('', 'No user name for: ' + Target)
+  if (Password == ''):
+    Passwd = Passwd or PasswdFilename()
+    if (isfile(Passwd)):
+      Password = GetPassword(TnsName, Username, True, Passwd)
+    if (Password == ''):
+      return('', 'No password for ' + Username + '@' + TnsName + ' in ' + Passwd)
+
+  ConnStr = Username + '/' + Password + '@' + TnsName
+  if (Username.upper() == 'SYS'):
+    ConnStr = ConnStr + ' as sysdba'
+  return(ConnStr, '')
+# ---------------------------------------------------------------------------
+# End ResolveConnectString()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Sub : GetSession()
+# Desc: Returns a pooled SqlplusSession for the instance, opening it the first
+#       time it's asked for, so a script makes one sqlplus login per instance
+#       no matter how many helpers need to talk to it. The session is opened
+#       with the current environment (ORACLE_SID, ORACLE_HOME), so set that
+#       up first. The settings suit output that gets parsed (no headings,
+#       no feedback, no paging).
+# Args: Sid, instance the session is for (default $ORACLE_SID).
+#       ConnectString, used for connecting to the database
+# Retn: SqlplusSession
 # ------------------------------------------------------------------------
-def GetDbState():
-  Colsep     = '!~!'
-  DbState    = 'STOPPED'
-  rc         = 0
-  ErrorStack = []
+def GetSession(Sid='', ConnectString='/ as sysdba'):
+  Sid = Sid or environ.get('ORACLE_SID', '')
+  Key = (Sid, ConnectString)
+  if (Key in SessionPool and SessionPool[Key].rc == 0):
+    return(SessionPool[Key])
+
+  Settings  = "set echo          off\n"
+  Settings += "set feedback      off\n"
+  Settings += "set heading       off\n"
+  Settings += "set pagesize      0\n"
+  Settings += "set newpage       none\n"
+  Settings += "set linesize      32767\n"
+  Settings += "set long          10000000\n"
+  Settings += "set longchunksize 10000000\n"
+  Settings += "set tab           off\n"
+  Settings += "set trimout       on\n"
+  Settings += "set trimspool     on\n"
+  Settings += "set verify        off\n"
+  SessionPool[Key] = SqlplusSession(ConnectString, Settings)
+  return(SessionPool[Key])
+# ---------------------------------------------------------------------------
+# End GetSession()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Sub : CloseSessions()
+# Desc: Closes pooled sessions opened by GetSession().
+# Args: Sid, only close this instance's sessions (default all).
+# Retn: <none>
+# ------------------------------------------------------------------------
+def CloseSessions(Sid=''):
+  for Key in list(SessionPool.keys()):
+    if (Sid == '' or Key[0] == Sid):
+      SessionPool[Key].close()
+      del SessionPool[Key]
+# ---------------------------------------------------------------------------
+# End CloseSessions()
+# ---------------------------------------------------------------------------
 
-  Sql  = "set pagesize 0\n";
-  Sql += "select 'DB_STATUS' ||'" + Colsep + "'|| upper(status) from v$instance;";
 
-  Stdout = RunSqlplus(Sql, False)
+# ---------------------------------------------------------------------------
+# Sub : DbStateSql()
+# Desc: The query GetDbState() runs. Scripts that already have a session
+#       open can put it at the front of their first batch and hand the
+#       output to ParseDbState(), instead of a separate trip for the state.
+# Args: Colsep, separator between the DB_STATUS tag and the status.
+# Retn: Sql
+# ------------------------------------------------------------------------
+def DbStateSql(Colsep='!~!'):
+  return("SELECT 'DB_STATUS' || '" + Colsep + "' || UPPER(status) FROM v$instance;")
+# ---------------------------------------------------------------------------
+# End DbStateSql()
+# ---------------------------------------------------------------------------
+
 
-  DbDown = compile(r'.*ORA-01034.*')
-  if (DbDown.search(Stdout)):
-    return('STOPPED')
+# ---------------------------------------------------------------------------
+# Sub : ParseDbState()
+# Desc: Picks the state out of the output of DbStateSql() (alone or as part
+#       of a larger batch) and remembers it for GetDbState(UseCache=True).
+# Args: Sid, instance the output came from.
+#       Stdout, sqlplus output.
+#       Colsep, separator used in DbStateSql().
+# Retn: STOPPED, STARTED, MOUNTED, OPEN, UNKNOWN
+# ------------------------------------------------------------------------
+def ParseDbState(Sid, Stdout, Colsep='!~!'):
+  DbState = 'UNKNOWN'
+  if (search(r'ORA-01034', Stdout)):
+    DbState = 'STOPPED'
   else:
-    # DB_STATUS:!~!STARTED
-    Key = compile(r'^.*DB_STATUS' + Colsep + '.*')
     for line in Stdout.split('\n'):
-      if (Key.search(line)):
-        DbState = line.split(Colsep)[1]
-        DbState.strip()
-        return(DbState)
-  return('UNKNOWN')
+      if (line.find('DB_STATUS' + Colsep) >= 0):
+        DbState = line.split(Colsep)[1].strip()
+        break
+  if (DbState != 'UNKNOWN'):
+    DbStateCache[Sid] = DbState
+  return(DbState)
+# ---------------------------------------------------------------------------
+# End ParseDbState()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Sub : GetDbState()
+# Desc: Get the current state of the database (down, mounted, open). Cheapest
+#       check first:
+#         1. With UseCache=True a state already found during this run is
+#            reused (by GetDbState() or ParseDbState()).
+#         2. If there's no pmon process for the instance (GetInstances()
+#            reads /proc) it's STOPPED, no sqlplus needed. This is only done
+#            for local / as sysdba connections, and only when some pmon is
+#            visible at all (a /proc mounted with hidepid shows none).
+#         3. Otherwise v$instance.status is asked for through the pooled
+#            session from GetSession(), which the caller can go on using.
+#       With Query=False step 3 is skipped and '' is returned when the state
+#       isn't known yet, for callers that fold DbStateSql() into their own
+#       first batch.
+#
+#       The default (UseCache=False) checks again every call, so a script
+#       that starts or stops the instance sees the new state. Use
+#       UseCache=True only when nothing in the run changes the state.
+# Args: Sid, instance to check (default $ORACLE_SID).
+#       ConnectString, used for connecting to the database
+#       Query, ask the database if need be (default True).
+#       UseCache, reuse the state and pmon list found earlier in the run
+#       (default False).
+# Retn: STOPPED, STARTED, MOUNTED, OPEN, UNKNOWN ('' if Query=False and not
+#       known yet)
+# ------------------------------------------------------------------------
+def GetDbState(Sid='', ConnectString='/ as sysdba', Query=True, UseCache=False):
+  Sid = Sid or environ.get('ORACLE_SID', '')
+  if (UseCache and Sid in DbStateCache):
+    return(DbStateCache[Sid])
+
+  if (ConnectString == '/ as sysdba' and Sid != ''):
+    if (not UseCache or not 'Sids' in PmonSids):
+      PmonSids['Sids'] = [Inst['Sid'] for Inst in GetInstances()]
+    if (PmonSids['Sids'] != [] and not Sid in PmonSids['Sids']):
+      DbStateCache[Sid] = 'STOPPED'
+      return('STOPPED')
+
+  if (not Query):
+    return('')
+
+  (rc, Stdout) = GetSession(Sid, ConnectString).run(DbStateSql())
+  DbState = ParseDbState(Sid, Stdout)
+  if (DbState == 'STOPPED'):
+    CloseSessions(Sid)                       # logged in to an idle instance, log in again next time
+  return(DbState)
 # ---------------------------------------------------------------------------
 # End GetDbState()
 # ---------------------------------------------------------------------------
@@ -1770,19 +5568,133 @@ def FormatNumber(s, tSep=',', dSep='.'):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Def : FormatNumbers()
+# Desc: Batched version of FormatNumber(). Groups a whole column of numbers on
+#       thousands. Ints and floats are formatted by format(), anything else
+#       (ex. numeric strings from sqlplus) goes through FormatNumber().
+# Args: Values = list of numbers or numeric strings.
+#       tSep   = thousands_separation_character (default is ',')
+# Retn: list of formatted strings
+# ---------------------------------------------------------------------------
+def FormatNumbers(Values, tSep=','):
+  Numbers = []
+
+  for s in Values:
+    if (isinstance(s, (int, float)) and not isinstance(s, bool)):
+      Numbers.append(format(s, ','))
+    elif (s is None):
+      Numbers.append('0')
+    else:
+      Numbers.append(FormatNumber(s))
+
+  if (tSep != ','):
+    Numbers = [s.replace(',', tSep) for s in Numbers]
+
+  return(Numbers)
+# ---------------------------------------------------------------------------
+# End FormatNumbers()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RenderTable()
+# Desc: Writes a table held as column arrays. Column widths and the row format
+#       are worked out once per table, and rows are written to the output in
+#       chunks of ChunkRows lines rather than one print() per row.
+# Args: Columns   = list of columns, each a list of values (all the same length).
+#       Headings  = list of column headings.
+#       Format    = fixed (default), csv, or json (one JSON object per line).
+#       Justify   = string of L/R, one per column (fixed format). Default is R
+#                   for numeric columns and L for everything else.
+#       Widths    = list of column widths (fixed format). 0 or missing means
+#                   size the column to fit. Like %-Ns, values are never cut off.
+#       Outfile   = file object to write to (default is stdout).
+#       ChunkRows = number of rows to write at a time.
+# Retn: number of rows written.
+# ---------------------------------------------------------------------------
+def RenderTable(Columns, Headings, Format='fixed', Justify='', Widths=[], Outfile=None, ChunkRows=5000):
+  if (Outfile is None):
+    Outfile = termout
+
+  if (Columns == []):
+    return(0)
+
+  RowCount = len(Columns[0])
+  Format   = Format.lower()
+
+  if (Format == 'json'):
+    Keys = [dumps(str(Heading)) + ': ' for Heading in Headings]
+    Cols = []
+    for Col in Columns:
+      Cols.append([dumps(Value) for Value in Col])
+    Rows = zip(*Cols)
+    Line = lambda Row: '{' + ', '.join([Keys[i] + Row[i] for i in range(len(Row))]) + '}'
+  elif (Format == 'csv'):
+    Cols = []
+    for Col in Columns:
+      Col = ['' if Value is None else str(Value) for Value in Col]
+      Cols.append([('"' + Value.replace('"', '""') + '"') if (',' in Value or '"' in Value or '\n' in Value) else Value for Value in Col])
+    Rows = zip(*Cols)
+    Line = ','.join
+    Outfile.write(','.join(Headings) + '\n')
+  else:
+    Cols = []
+    Fmts = []
+    Dash = []
+    for i in range(len(Columns)):
+      Col = Columns[i]
+      if (i < len(Justify)):
+        Just = Justify[i].upper()
+      elif (Col != [] and all([isinstance(Value, (int, float)) for Value in Col if Value is not None])):
+        Just = 'R'
+      else:
+        Just = 'L'
+      Col = ['' if Value is None else str(Value) for Value in Col]
+      if (i < len(Widths) and Widths[i] > 0):
+        Width = Widths[i]
+      else:
+        Width = max([len(Headings[i])] + [len(Value) for Value in Col])
+      if (Just == 'R'):
+        Fmts.append('%' + str(Width) + 's')
+      else:
+        Fmts.append('%-' + str(Width) + 's')
+      Dash.append('-' * Width)
+      Cols.append(Col)
+    Fmt  = ' '.join(Fmts)
+    Rows = zip(*Cols)
+    Line = lambda Row: Fmt % Row
+    Outfile.write(Fmt % tuple(Headings) + '\n')
+    Outfile.write(' '.join(Dash) + '\n')
+
+  Rows = list(Rows)
+  for i in range(0, RowCount, ChunkRows):
+    Outfile.write('\n'.join([Line(Row) for Row in Rows[i:i+ChunkRows]]) + '\n')
+  Outfile.flush()
+
+  return(RowCount)
+# ---------------------------------------------------------------------------
+# End RenderTable()
+# ---------------------------------------------------------------------------
+
+
 # ---------------------------------------------------------------------------
 # Def : RunDgmgrl()
 # Desc: Runs drmgrl commands.
 # Args: DgbCmd, string containing DGMGRL commands or run.
 #       ErrChk, True/False determines whether or not to check output for errors.
 #       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunProcess()).
 # Retn: If ErrChk=True then return:
-#          rc (return code, integer, 0=no errors)
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if dgmgrl was killed)
 #          Output (string, stdout+stderr)
 #          ErrorList (list, error stack)
-#       If ErrChk=False then return Stdout only
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
 # ---------------------------------------------------------------------------
-def RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/'):
+def RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/', Timeout=0, MaxOutput=0, AbortOnError=False):
 
   if (ConnectString == '/'):
     if (not('ORACLE_SID' in environ.keys())):
@@ -1808,16 +5720,21 @@ def RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/'):
       print('ORACLE_HOME is not set')
       return (1, '', [])
 
-  # Start Dgmgrl and login
-  proc = Popen([Dgmgrl, '-silent', ConnectString], bufsize=-1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
-   shell=False, universal_newlines=True, close_fds=True)
+  if (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    # Start Dgmgrl, login and run the commands with limits on the run. rc is
+    # RcTimeout, RcTruncated or RcAborted if dgmgrl had to be killed.
+    (rc, Stdout, Status) = RunProcess([Dgmgrl, '-silent', ConnectString], DgbCmd, Timeout, MaxOutput, AbortOnError)
+  else:
+    # Start Dgmgrl and login
+    proc = Popen([Dgmgrl, '-silent', ConnectString], bufsize=-1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+     shell=False, universal_newlines=True, close_fds=True)
 
-  # Execute the Sql and fetch the output -
-  # Stderr is just a placeholder. We redirected stderr to stdout as follows 'stderr=STDOUT'.
-  (Stdout, Stderr) = proc.communicate(DgbCmd)
-  rc = proc.returncode
+    # Execute the Sql and fetch the output -
+    # Stderr is just a placeholder. We redirected stderr to stdout as follows 'stderr=STDOUT'.
+    (Stdout, Stderr) = proc.communicate(DgbCmd)
+    rc = proc.returncode
 
-  if(ErrChk == True):
+  if(ErrChk == True or Timeout > 0 or MaxOutput > 0 or AbortOnError):
     return(rc,Stdout)
   else:
     return(Stdout)
@@ -1853,3 +5770,279 @@ def RunDgmgrl(DgbCmd, ErrChk=True, ConnectString='/'):
 # ---------------------------------------------------------------------------
 
 
+# ---------------------------------------------------------------------------
+# Clas: DgmgrlSession()
+# Desc: A long lived dgmgrl session. Logs in once and runs as many broker
+#       commands as you like through the same process, which is what you
+#       want when polling the broker on an interval. The end of each
+#       command's output is found by following the command with a bogus
+#       marker command and reading until dgmgrl complains about it.
+#
+#       Session = DgmgrlSession()
+#       (rc, Stdout) = Session.run('show configuration')
+#       Config = Session.show_configuration()
+#       Status = Session.show_database('orcls')
+#       Session.close()
+# ---------------------------------------------------------------------------
+class DgmgrlSession:
+  def __init__(self, ConnectString='/'):
+    self.proc = None
+    self.count = 0
+    self.rc = 0
+    self.connect_string = ConnectString
+
+    if (ConnectString == '/'):
+      if (not('ORACLE_SID' in environ.keys())):
+        print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
+        self.rc = 1
+        return
+      if (not('ORACLE_HOME' in environ.keys())):
+        OracleSid, OracleHome = SetOracleEnv(environ['ORACLE_SID'])
+
+    if ('ORACLE_HOME' in environ.keys()):
+      self.dgmgrl = environ['ORACLE_HOME'] + '/bin/dgmgrl'
+    else:
+      print('ORACLE_HOME is not set')
+      self.rc = 1
+      return
+
+    self.open()
+
+  def open(self):
+    # Start Dgmgrl and login
+    self.proc = Popen([self.dgmgrl, '-silent', self.connect_string], bufsize=1, stdin=PIPE, stdout=PIPE, stderr=STDOUT, \
+     shell=False, universal_newlines=True, close_fds=True)
+
+  def is_open(self):
+    return (self.proc is not None and self.proc.poll() is None)
+
+  def run(self, DgbCmd):
+    Output = []
+
+    # Reconnect once if the session went away between calls.
+    if (not self.is_open()):
+      if (self.rc != 0 and self.proc is None):
+        return(1, '')
+      self.open()
+
+    self.count += 1
+    Marker = 'DGMGRL_END_OF_COMMAND_%d' % self.count
+
+    try:
+      self.proc.stdin.write(DgbCmd.strip() + '\n' + Marker + '\n')
+      self.proc.stdin.flush()
+    except (IOError, OSError):
+      return(1, '')
+
+    rc = 0
+    for line in iter(self.proc.stdout.readline, ''):
+      if (Marker in line):
+        break
+      line = line.rstrip('\n')
+      if (line.startswith('Error:')):
+        rc = 1
+      Output.append(line)
+    else:
+      rc = 1                                 # dgmgrl exited before the marker showed up.
+
+    return(rc, '\n'.join(Output).strip())
+
+  def show_configuration(self):
+    (rc, Stdout) = self.run('show configuration')
+    Config = ParseDgConfiguration(Stdout)
+    Config['rc'] = rc
+    return(Config)
+
+  def show_database(self, Database):
+    (rc, Stdout) = self.run("show database '" + Database + "'")
+    Status = ParseDgDatabase(Stdout)
+    Status['rc'] = rc
+    return(Status)
+
+  def close(self):
+    if (self.is_open()):
+      try:
+        self.proc.stdin.write('exit\n')
+        self.proc.stdin.close()
+      except (IOError, OSError):
+        pass
+      self.proc.wait()
+    self.proc = None
+# ---------------------------------------------------------------------------
+# End DgmgrlSession()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ParseDgConfiguration()
+# Desc: Parses the output of the dgmgrl "show configuration" command.
+#         Configuration - dgconfig
+#           Protection Mode: MaxPerformance
+#           Members:
+#           orcl  - Primary database
+#             orcls - Physical standby database
+#         Fast-Start Failover: DISABLED
+#         Configuration Status:
+#         SUCCESS   (status updated 15 seconds ago)
+# Args: Stdout from dgmgrl.
+# Retn: ConfigDict{'Name', 'ProtectionMode', 'FastStartFailover', 'Status',
+#       'Primary', 'Members' : [{'Name', 'Role', 'Messages' : []}, ...]}
+# ---------------------------------------------------------------------------
+def ParseDgConfiguration(Stdout):
+  ConfigDict = {
+   'Name'              : '',
+   'ProtectionMode'    : '',
+   'FastStartFailover' : '',
+   'Status'            : '',
+   'Primary'           : '',
+   'Members'           : []
+  }
+  InMembers = False
+  InStatus  = False
+  Member    = compile(r'^\s*(\S+)\s+-\s+(.*(database|instance|Recovery Appliance).*)$')
+
+  for line in Stdout.split('\n'):
+    Text = line.strip()
+    if (InStatus):
+      if (Text != ''):
+        ConfigDict['Status'] = Text.split()[0]
+        InStatus = False
+      continue
+    if (Text.startswith('Configuration - ')):
+      ConfigDict['Name'] = Text.split('-', 1)[1].strip()
+    elif (Text.startswith('Protection Mode:')):
+      ConfigDict['ProtectionMode'] = Text.split(':', 1)[1].strip()
+    elif (Text.startswith('Members:') or Text.startswith('Databases:')):
+      InMembers = True
+    elif (Text.startswith('Fast-Start Failover:')):
+      InMembers = False
+      ConfigDict['FastStartFailover'] = Text.split(':', 1)[1].strip()
+    elif (Text.startswith('Configuration Status:')):
+      InMembers = False
+      InStatus  = True
+    elif (InMembers and Text != ''):
+      MatchObj = Member.match(line)
+      if (MatchObj):
+        Role = MatchObj.group(2).strip()
+        ConfigDict['Members'].append({'Name': MatchObj.group(1), 'Role': Role, 'Messages': []})
+        if (Role.startswith('Primary')):
+          ConfigDict['Primary'] = MatchObj.group(1)
+      elif (len(ConfigDict['Members']) > 0):
+        ConfigDict['Members'][-1]['Messages'].append(Text)
+
+  return(ConfigDict)
+# ---------------------------------------------------------------------------
+# End ParseDgConfiguration()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ParseDgLag()
+# Desc: Converts a broker lag value to seconds, for example:
+#         0 seconds (computed 1 second ago)
+#         1 hour(s) 2 minute(s) 3 second(s) (computed 0 seconds ago)
+#         1 day(s) 4 hours (computed 1 second ago)
+# Args: Lag string.
+# Retn: Seconds (int) or None if the lag could not be determined.
+# ---------------------------------------------------------------------------
+def ParseDgLag(Lag):
+  Units   = {'day': 86400, 'hour': 3600, 'minute': 60, 'second': 1}
+  Seconds = None
+
+  Lag = Lag.split('(computed')[0]
+  for (Value, Unit) in compile(r'(\d+)\s+(day|hour|minute|second)').findall(Lag):
+    if (Seconds is None):
+      Seconds = 0
+    Seconds += int(Value) * Units[Unit]
+
+  return(Seconds)
+# ---------------------------------------------------------------------------
+# End ParseDgLag()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ParseDgDatabase()
+# Desc: Parses the output of the dgmgrl "show database <name>" command.
+#         Database - orcls
+#           Role:               PHYSICAL STANDBY
+#           Intended State:     APPLY-ON
+#           Transport Lag:      0 seconds (computed 1 second ago)
+#           Apply Lag:          0 seconds (computed 1 second ago)
+#           Average Apply Rate: 5.00 KByte/s
+#           Real Time Query:    OFF
+#           Instance(s):
+#             orcls
+#         Database Status:
+#         SUCCESS
+# Args: Stdout from dgmgrl.
+# Retn: StatusDict{'Name', 'Role', 'IntendedState', 'TransportLag',
+#       'ApplyLag' (seconds), 'ApplyRate' (bytes/sec), 'RealTimeQuery',
+#       'Instances' : [], 'Status', 'Messages' : [] (warnings and errors),
+#       'Properties' : {anything else}}
+# ---------------------------------------------------------------------------
+def ParseDgDatabase(Stdout):
+  StatusDict = {
+   'Name'          : '',
+   'Role'          : '',
+   'IntendedState' : '',
+   'TransportLag'  : None,
+   'ApplyLag'      : None,
+   'ApplyRate'     : None,
+   'RealTimeQuery' : '',
+   'Instances'     : [],
+   'Status'        : '',
+   'Messages'      : [],
+   'Properties'    : {}
+  }
+  RateUnits   = {'BYTE/S': 1, 'KBYTE/S': 1024, 'MBYTE/S': 1024**2, 'GBYTE/S': 1024**3}
+  InInstances = False
+  InStatus    = False
+
+  for line in Stdout.split('\n'):
+    Text = line.strip()
+    if (InStatus):
+      if (Text != ''):
+        StatusDict['Status'] = Text.split()[0]
+        InStatus = False
+      continue
+    if (Text.startswith('Database - ')):
+      StatusDict['Name'] = Text.split('-', 1)[1].strip()
+    elif (Text.startswith('Database Status:')):
+      InInstances = False
+      InStatus    = True
+    elif (Text.startswith('Instance(s):')):
+      InInstances = True
+    elif (InInstances and Text != '' and not ':' in Text):
+      StatusDict['Instances'].append(Text.split()[0])
+    elif (':' in Text):
+      InInstances = False
+      (Key, Value) = [x.strip() for x in Text.split(':', 1)]
+      if (Key == 'Role'):
+        StatusDict['Role'] = Value
+      elif (Key == 'Intended State'):
+        StatusDict['IntendedState'] = Value
+      elif (Key == 'Transport Lag'):
+        StatusDict['TransportLag'] = ParseDgLag(Value)
+      elif (Key == 'Apply Lag'):
+        StatusDict['ApplyLag'] = ParseDgLag(Value)
+      elif (Key == 'Average Apply Rate' or Key == 'Apply Rate'):
+        Fields = Value.split()
+        if (len(Fields) >= 2 and Fields[1].upper() in RateUnits):
+          try:
+            StatusDict['ApplyRate'] = float(Fields[0]) * RateUnits[Fields[1].upper()]
+          except ValueError:
+            pass
+      elif (Key == 'Real Time Query'):
+        StatusDict['RealTimeQuery'] = Value
+      elif (match(r'^(ORA|DGM)-\d+', Key) or Key.startswith('Warning') or Key.startswith('Error')):
+        StatusDict['Messages'].append(Text)
+      else:
+        StatusDict['Properties'][Key] = Value
+
+  return(StatusDict)
+# ---------------------------------------------------------------------------
+# End ParseDgDatabase()
+# ---------------------------------------------------------------------------
+
+
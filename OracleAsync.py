@@ -0,0 +1,680 @@
+##################################################################################################
+#  Name:        OracleAsync.py                                                                   #
+#  Author:      Randy Johnson                                                                    #
+#  Description: asyncio versions of the Oracle.py functions that run the Oracle client tools     #
+#               (sqlplus, rman, dgmgrl, olsnodes) and TnsCheck(). One event loop can drive       #
+#               hundreds of them at once, no threads needed. Needs Python 3.6 or later,          #
+#               Oracle.py itself still runs on Python 2 so it can't hold any of this.            #
+#                                                                                                #
+#               from OracleAsync import Gather, Run, RunSqlplusAsync                             #
+#               Results = Run(Gather([RunSqlplusAsync(Sql, True, 'system/x@' + Db, Timeout=60)   #
+#                                     for Db in Databases], Limit=50))                           #
+#                                                                                                #
+#  Functions:   CheckErrors(Stdout, ComponentList=['ALL_COMPONENTS'], OracleHome='')             #
+#               Feed(Proc, Input)                                                                #
+#               Gather(Coroutines, Limit=64, ReturnExceptions=False)                             #
+#               GetClusternameAsync(Limiter=None)                                                #
+#               GetErrorRegex(ComponentList, OracleHome='')                                      #
+#               GetNodesAsync(Limiter=None)                                                      #
+#               GetVipsAsync(Limiter=None)                                                       #
+#               Kill(Proc)                                                                       #
+#               NoLimit()                                                                        #
+#               OlsnodesAsync(Parm='', Limiter=None)                                             #
+#               Run(Coroutine)                                                                   #
+#               RunDgmgrlAsync(DgbCmd, ErrChk=True, ConnectString='/', Timeout=0, ...)           #
+#               RunRmanAsync(RCV, ErrChk=True, ConnectString='target /', Timeout=0, ...)         #
+#               RunSqlplusAsync(Sql, ErrChk=False, ConnectString='/ as sysdba', Timeout=0, ...)  #
+#               RunTool(Cmd, Input='', Timeout=0, MaxOutput=0, AbortOnError=False, ...)          #
+#               StreamRmanAsync(RCV, ConnectString='target /', Environ=None, Limiter=None)       #
+#               StreamSqlplusAsync(Sql, ConnectString='/ as sysdba', Colsep='!~!', ...)          #
+#               StreamTool(Cmd, Input='', Env=None, Limiter=None, Result=None)                   #
+#               TnsCheckAsync(TnsName, Timeout=5, Limiter=None)                                  #
+#               ToolEnv(Tool, ConnectString='', LocalConnect='', Environ=None)                   #
+#                                                                                                #
+# History:                                                                                       #
+#                                                                                                #
+# Date       Ver. Who              Change Description                                            #
+# ---------- ---- ---------------- ------------------------------------------------------------- #
+# 10/18/2026 1.00 Randy Johnson    Initial release.                                              #
+# 10/18/2026 1.01 Randy Johnson    TnsCheckAsync() resolves the name with TnsResolver and        #
+#                                  connects to the listeners instead of running tnsping.         #
+# 10/19/2026 1.02 Randy Johnson    Run*Async() return (rc, Stdout) when ErrChk=False and a limit #
+#                                  is set, same as Oracle.py. Removed an unused import.          #
+#                                                                                                #
+##################################################################################################
+
+# --------------------------------------
+# ---- Import Python Modules -----------
+# --------------------------------------
+import asyncio
+import codecs
+
+from asyncio.subprocess import PIPE
+from asyncio.subprocess import STDOUT
+from os           import environ
+from os           import killpg
+from os.path      import join as pathjoin
+from re           import compile
+from signal       import SIGKILL
+from Oracle       import CompileErrorCheck
+from Oracle       import FatalErrors
+from Oracle       import GetAsmHome
+from Oracle       import IsExecutable
+from Oracle       import LoadOratab
+from Oracle       import PrintError
+from Oracle       import RcAborted
+from Oracle       import RcTimeout
+from Oracle       import RcTruncated
+from Oracle       import RunStatusError
+from Oracle       import SqlplusHeader
+from Oracle       import StreamSqlplusScript
+from Oracle       import TnsResolver
+
+
+# Compiled error checks by (ORACLE_HOME, components), so facility.lis is read
+# once per home rather than once per call.
+ErrorRegexes = {}
+
+# Longest output line StreamTool() will hand back (longer lines are dropped).
+LineLimit = 1048576
+
+# -------------------------------------------------
+# ---- Function and Class Definitions ------------
+# -------------------------------------------------
+# ---------------------------------------------------------------------------
+# Clas: NoLimit()
+# Desc: Stands in for a semaphore when a call isn't given a Limiter.
+# ---------------------------------------------------------------------------
+class NoLimit:
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *Args):
+    return False
+# ---------------------------------------------------------------------------
+# End NoLimit()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : Run()
+# Desc: Runs a coroutine to the end from synchronous code.
+# Args: Coroutine, ex: RunSqlplusAsync(Sql)
+# Retn: Whatever the coroutine returns.
+# ---------------------------------------------------------------------------
+def Run(Coroutine):
+  if (hasattr(asyncio, 'run')):
+    return(asyncio.run(Coroutine))
+  Loop = asyncio.new_event_loop()
+  try:
+    return(Loop.run_until_complete(Coroutine))
+  finally:
+    Loop.close()
+# ---------------------------------------------------------------------------
+# End Run()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : Gather()
+# Desc: Runs coroutines concurrently, at most Limit at a time.
+# Args: Coroutines, list of coroutines.
+#       Limit, most to run at once.
+#       ReturnExceptions, True returns an exception in place of the result of
+#       a coroutine that raised one, False raises the first one.
+# Retn: List of results, in the order of Coroutines.
+# ---------------------------------------------------------------------------
+async def Gather(Coroutines, Limit=64, ReturnExceptions=False):
+  Semaphore = asyncio.Semaphore(Limit)
+
+  async def Limited(Coroutine):
+    async with Semaphore:
+      return await Coroutine
+
+  return await asyncio.gather(*[Limited(Coroutine) for Coroutine in Coroutines], return_exceptions=ReturnExceptions)
+# ---------------------------------------------------------------------------
+# End Gather()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : ToolEnv()
+# Desc: Finds an Oracle client tool and the environment to run it with,
+#       the same way the synchronous Run*() functions do, but without
+#       changing os.environ (other coroutines are using it).
+# Args: Tool, ex: sqlplus.
+#       ConnectString, connect string the tool will be run with.
+#       LocalConnect, connect string that means a local (bequeath) login,
+#       which needs ORACLE_SID set, ex: '/ as sysdba'.
+#       Environ, dictionary of environment variables for this run only,
+#       ex: {'ORACLE_SID': 'ORCL2'}.
+# Retn: (Path, Env), Path is '' if the tool can't be run.
+# ---------------------------------------------------------------------------
+def ToolEnv(Tool, ConnectString='', LocalConnect='', Environ=None):
+  Env = dict(environ)
+  if (Environ is not None):
+    Env.update(Environ)
+  if ('SQLPATH' in Env):
+    del Env['SQLPATH']
+
+  if (LocalConnect != '' and ConnectString == LocalConnect and not 'ORACLE_SID' in Env):
+    print('ORACLE_SID must be set if connect string is:' + ' \'' + ConnectString + '\'')
+    return('', Env)
+
+  # If ORACLE_HOME is not set use the one for ORACLE_SID in the oratab file,
+  # or the first one we find there.
+  if (not 'ORACLE_HOME' in Env):
+    OratabDict = LoadOratab()
+    if (Env.get('ORACLE_SID', '') in OratabDict):
+      Env['ORACLE_HOME'] = OratabDict[Env['ORACLE_SID']]
+    elif (len(OratabDict) >= 1):
+      Env['ORACLE_HOME'] = OratabDict[sorted(OratabDict.keys())[0]]
+    else:
+      print('ORACLE_HOME is not set')
+      return('', Env)
+
+  return(pathjoin(Env['ORACLE_HOME'], 'bin', Tool), Env)
+# ---------------------------------------------------------------------------
+# End ToolEnv()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : GetErrorRegex()
+# Desc: CompileErrorCheck(), compiled once per ORACLE_HOME and components.
+# Args: ComponentList (list of components)
+#       OracleHome (default is $ORACLE_HOME)
+# Retn: Compiled regular expression or None.
+# ---------------------------------------------------------------------------
+def GetErrorRegex(ComponentList, OracleHome=''):
+  Key = (OracleHome, tuple(ComponentList))
+  if (not Key in ErrorRegexes):
+    ErrorRegexes[Key] = CompileErrorCheck(ComponentList, OracleHome)
+  return(ErrorRegexes[Key])
+# ---------------------------------------------------------------------------
+# End GetErrorRegex()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : CheckErrors()
+# Desc: ErrorCheck() for the coroutines. Same result, but the error check for
+#       an ORACLE_HOME is compiled once and reused.
+# Args: Stdout, output to check.
+#       ComponentList (list of components, default=ALL_COMPONENTS)
+#       OracleHome (default is $ORACLE_HOME)
+# Retn: rc (0 = no errors), ErrorList ([[Error, line], ...])
+# ---------------------------------------------------------------------------
+def CheckErrors(Stdout, ComponentList=['ALL_COMPONENTS'], OracleHome=''):
+  ErrorRegex = GetErrorRegex(ComponentList, OracleHome)
+  if (ErrorRegex is None):
+    return(1, [])
+
+  ErrorList = []
+  for line in Stdout.split('\n'):
+    MatchObj = ErrorRegex.search(line)
+    if (MatchObj):
+      ErrorList.append([MatchObj.group(), line])
+  if (ErrorList != []):
+    return(1, ErrorList)
+  return(0, ErrorList)
+# ---------------------------------------------------------------------------
+# End CheckErrors()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : Kill()
+# Desc: Kills a tool's process group (the tools are started in their own).
+# Args: Proc, asyncio process.
+# Retn: <none>
+# ---------------------------------------------------------------------------
+def Kill(Proc):
+  if (Proc.returncode is None):
+    try:
+      killpg(Proc.pid, SIGKILL)
+    except OSError:
+      pass                                   # already gone
+# ---------------------------------------------------------------------------
+# End Kill()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : Feed()
+# Desc: Writes a tool's input and closes its stdin.
+# Args: Proc, asyncio process.
+#       Input, string.
+# Retn: <none>
+# ---------------------------------------------------------------------------
+async def Feed(Proc, Input):
+  try:
+    Proc.stdin.write(Input.encode())
+    await Proc.stdin.drain()
+    Proc.stdin.close()
+  except (OSError, ConnectionError):
+    pass                                     # exited before it read it all
+# ---------------------------------------------------------------------------
+# End Feed()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : StreamTool()
+# Desc: Runs a command and returns its output a line at a time as the
+#       command prints it. If the caller stops reading early, or the task is
+#       cancelled, the command's process group is killed.
+# Args: Cmd, list, the command and its arguments.
+#       Input, string written to the command's stdin.
+#       Env, dictionary of environment variables (default is os.environ).
+#       Limiter, asyncio.Semaphore shared by the calls that should be
+#       limited together (optional). It's held until the command is done.
+#       Result, dictionary the command's return code is put in, as 'rc',
+#       when it's done (optional).
+# Retn: Async generator of output lines (trailing newline removed).
+# ---------------------------------------------------------------------------
+async def StreamTool(Cmd, Input='', Env=None, Limiter=None, Result=None):
+  async with (Limiter or NoLimit()):
+    Proc = await asyncio.create_subprocess_exec(*Cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT, env=Env, \
+     start_new_session=True, limit=LineLimit)
+    Feeder = asyncio.ensure_future(Feed(Proc, Input))
+    Decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    try:
+      while True:
+        try:
+          line = await Proc.stdout.readline()
+        except ValueError:
+          continue                           # longer than LineLimit
+        if (not line):
+          break
+        yield Decoder.decode(line).rstrip('\n')
+      await Proc.wait()
+    finally:
+      Feeder.cancel()
+      Kill(Proc)
+      await Proc.wait()
+      if (Result is not None):
+        Result['rc'] = Proc.returncode
+# ---------------------------------------------------------------------------
+# End StreamTool()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunTool()
+# Desc: RunProcess() for the coroutines. Runs a command, feeds it Input and
+#       collects its output, with the same limits:
+#         Timeout      - seconds the command is allowed to run.
+#         MaxOutput    - number of characters of output to keep.
+#         AbortOnError - stop at the first fatal error in the output. True
+#                        uses the FatalErrors list, or pass your own list of
+#                        error codes.
+#       The command's process group is killed when a limit is hit or the
+#       task is cancelled. 0 for Timeout/MaxOutput means no limit.
+# Args: Cmd, list, the command and its arguments.
+#       Input, string written to the command's stdin.
+#       Timeout, MaxOutput, AbortOnError, see above.
+#       Env, dictionary of environment variables (default is os.environ).
+#       Limiter, asyncio.Semaphore (optional, see StreamTool()). Time spent
+#       waiting on it doesn't count against the Timeout.
+# Retn: rc (the command's return code, or RcTimeout, RcTruncated or RcAborted
+#          if it was killed)
+#       Stdout (string, stdout+stderr, as much as was read)
+#       Status ('' if the command ran to the end, else 'timeout', 'truncated'
+#          or 'error')
+# ---------------------------------------------------------------------------
+async def RunTool(Cmd, Input='', Timeout=0, MaxOutput=0, AbortOnError=False, Env=None, Limiter=None):
+  AbortRegex = None
+  if (AbortOnError):
+    if (AbortOnError is True):
+      AbortOnError = FatalErrors
+    AbortRegex = compile(r'\b(' + '|'.join(AbortOnError) + r')\b')
+
+  Lines  = []
+  Status = ['']
+  Result = {'rc': None}
+
+  async def Collect():
+    Size = 0
+    Stream = StreamTool(Cmd, Input, Env, Result=Result)
+    try:
+      async for line in Stream:
+        line += '\n'
+        if (MaxOutput > 0 and Size + len(line) > MaxOutput):
+          Lines.append(line[:MaxOutput - Size])
+          Status[0] = 'truncated'
+          return
+        Lines.append(line)
+        Size += len(line)
+        if (AbortRegex is not None and AbortRegex.search(line)):
+          Status[0] = 'error'
+          return
+    finally:
+      await Stream.aclose()                  # kills the command if it's still running
+
+  async with (Limiter or NoLimit()):
+    try:
+      if (Timeout > 0):
+        await asyncio.wait_for(Collect(), Timeout)
+      else:
+        await Collect()
+    except asyncio.TimeoutError:
+      Status[0] = 'timeout'
+
+  Stdout = ''.join(Lines).rstrip()
+  if (Status[0] == 'timeout'):
+    return(RcTimeout, Stdout, Status[0])
+  elif (Status[0] == 'truncated'):
+    return(RcTruncated, Stdout, Status[0])
+  elif (Status[0] == 'error'):
+    return(RcAborted, Stdout, Status[0])
+  return(Result['rc'], Stdout, '')
+# ---------------------------------------------------------------------------
+# End RunTool()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunSqlplusAsync()
+# Desc: RunSqlplus() as a coroutine. Same settings, same results.
+# Args: Sql, string containing SQL to execute.
+#       ErrChk, True/False determines whether or not to check output for errors.
+#       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunTool()).
+#       Environ, dictionary of environment variables for this sqlplus only.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: If ErrChk=True then return:
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if sqlplus was killed)
+#          Output (string, stdout+stderr)
+#          ErrorList (list, error stack)
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
+# ---------------------------------------------------------------------------
+async def RunSqlplusAsync(Sql, ErrChk=False, ConnectString='/ as sysdba', Timeout=0, MaxOutput=0, AbortOnError=False, \
+ Environ=None, Limiter=None):
+  (Sqlplus, Env) = ToolEnv('sqlplus', ConnectString, '/ as sysdba', Environ)
+  if (Sqlplus == ''):
+    return(1, '', [])
+
+  (RunRc, Stdout, Status) = await RunTool([Sqlplus, '-S', '-L', ConnectString], SqlplusHeader() + Sql, \
+   Timeout, MaxOutput, AbortOnError, Env, Limiter)
+
+  if (ErrChk):
+    (rc, ErrorList) = CheckErrors(Stdout, ['sqlplus','rdbms', 'oracore'], Env['ORACLE_HOME'])
+    if (Status != ''):
+      rc = RunRc
+      ErrorList.append(RunStatusError(Status, 'sqlplus', Timeout, MaxOutput, Stdout))
+    return(rc, Stdout, ErrorList)
+  elif (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    return(RunRc, Stdout)
+  else:
+    return(Stdout)
+# ---------------------------------------------------------------------------
+# End RunSqlplusAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : StreamSqlplusAsync()
+# Desc: StreamSqlplus() as an async generator. Rows come back split into
+#       fields as sqlplus prints them, error lines go to ErrorList.
+#
+#       async for Row in StreamSqlplusAsync(Sql, ErrorList=Errors):
+#         ...
+# Args: Sql, string containing SQL to execute.
+#       ConnectString, used for connecting to the database
+#       Colsep, column separator (default is !~!)
+#       ErrorList, list to add any errors to.
+#       Environ, dictionary of environment variables for this sqlplus only.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: Async generator of rows (each a list of strings, surrounding blanks
+#       removed).
+# ---------------------------------------------------------------------------
+async def StreamSqlplusAsync(Sql, ConnectString='/ as sysdba', Colsep='!~!', ErrorList=None, Environ=None, Limiter=None):
+  (Sqlplus, Env) = ToolEnv('sqlplus', ConnectString, '/ as sysdba', Environ)
+  if (Sqlplus == ''):
+    return
+
+  ErrorRegex = GetErrorRegex(['sqlplus','rdbms', 'oracore'], Env['ORACLE_HOME'])
+
+  Stream = StreamTool([Sqlplus, '-S', '-L', ConnectString], StreamSqlplusScript(Sql, Colsep), Env, Limiter)
+  try:
+    async for line in Stream:
+      if (line.strip() == ''):
+        continue
+      if (ErrorRegex is not None and not Colsep in line):
+        MatchObj = ErrorRegex.match(line)
+        if (MatchObj or line.startswith('ERROR at line')):
+          if (ErrorList is not None and MatchObj):
+            ErrorList.append([MatchObj.group(0), line])
+          continue
+      yield [Field.strip() for Field in line.split(Colsep)]
+  finally:
+    await Stream.aclose()
+# ---------------------------------------------------------------------------
+# End StreamSqlplusAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunRmanAsync()
+# Desc: RunRman() as a coroutine.
+# Args: RCV, string, containing rman commands or run block to execute.
+#       ErrChk, True/False determines whether or not to check output for errors.
+#       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunTool()).
+#       Environ, dictionary of environment variables for this rman only.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: If ErrChk=True then return:
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if rman was killed)
+#          Output (string, stdout+stderr)
+#          ErrorList (list, error stack)
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
+# ---------------------------------------------------------------------------
+async def RunRmanAsync(RCV, ErrChk=True, ConnectString='target /', Timeout=0, MaxOutput=0, AbortOnError=False, \
+ Environ=None, Limiter=None):
+  (Rman, Env) = ToolEnv('rman', ConnectString, '/ as sysdba', Environ)
+  if (Rman == ''):
+    return(1, '', [])
+
+  (RunRc, Stdout, Status) = await RunTool([Rman, ConnectString], RCV, Timeout, MaxOutput, AbortOnError, Env, Limiter)
+
+  if (ErrChk):
+    (rc, ErrorList) = CheckErrors(Stdout, ['ALL_COMPONENTS'], Env['ORACLE_HOME'])
+    if (Status != ''):
+      rc = RunRc
+      ErrorList.append(RunStatusError(Status, 'rman', Timeout, MaxOutput, Stdout))
+    return(rc, Stdout, ErrorList)
+  elif (Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    return(RunRc, Stdout)
+  else:
+    return(Stdout)
+# ---------------------------------------------------------------------------
+# End RunRmanAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : StreamRmanAsync()
+# Desc: StreamRman() as an async generator.
+# Args: RCV, string, containing rman commands or run block to execute.
+#       ConnectString, used for connecting to the database
+#       Environ, dictionary of environment variables for this rman only.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: Async generator of output lines (trailing newline removed).
+# ---------------------------------------------------------------------------
+async def StreamRmanAsync(RCV, ConnectString='target /', Environ=None, Limiter=None):
+  (Rman, Env) = ToolEnv('rman', ConnectString, '/ as sysdba', Environ)
+  if (Rman == ''):
+    return
+
+  Stream = StreamTool([Rman, ConnectString], RCV, Env, Limiter)
+  try:
+    async for line in Stream:
+      yield line
+  finally:
+    await Stream.aclose()
+# ---------------------------------------------------------------------------
+# End StreamRmanAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : RunDgmgrlAsync()
+# Desc: RunDgmgrl() as a coroutine.
+# Args: DgbCmd, string containing DGMGRL commands or run.
+#       ErrChk, True/False determines whether or not to return the rc.
+#       ConnectString, used for connecting to the database
+#       Timeout, MaxOutput, AbortOnError, limits on the run (see RunTool()).
+#       Environ, dictionary of environment variables for this dgmgrl only.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: If ErrChk=True then return:
+#          rc (return code, integer, 0=no errors, RcTimeout, RcTruncated or
+#             RcAborted if dgmgrl was killed)
+#          Output (string, stdout+stderr)
+#       If ErrChk=False and a limit (Timeout, MaxOutput or AbortOnError) is
+#       set then return (rc, Stdout), rc as above, so a run that was cut
+#       short can be told apart. Otherwise return Stdout only.
+# ---------------------------------------------------------------------------
+async def RunDgmgrlAsync(DgbCmd, ErrChk=True, ConnectString='/', Timeout=0, MaxOutput=0, AbortOnError=False, \
+ Environ=None, Limiter=None):
+  (Dgmgrl, Env) = ToolEnv('dgmgrl', ConnectString, '/', Environ)
+  if (Dgmgrl == ''):
+    return(1, '', [])
+
+  (rc, Stdout, Status) = await RunTool([Dgmgrl, '-silent', ConnectString], DgbCmd, Timeout, MaxOutput, AbortOnError, Env, Limiter)
+
+  if (ErrChk == True or Timeout > 0 or MaxOutput > 0 or AbortOnError):
+    return(rc, Stdout)
+  else:
+    return(Stdout)
+# ---------------------------------------------------------------------------
+# End RunDgmgrlAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Sub : TnsCheckAsync()
+# Desc: TnsCheck() as a coroutine. Resolves the name with TnsResolver and
+#       connects to its listener address(es), all of them at once.
+# Args: TnsName, alias, connect descriptor or easy connect string.
+#       Timeout, seconds to wait for each listener.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: 0 if successful, 1 if TNS Lookup failed (TNS-03505), >1 Other errors
+# ---------------------------------------------------------------------------
+async def TnsCheckAsync(TnsName, Timeout=5, Limiter=None):
+  Resolver  = TnsResolver()
+  Addresses = Resolver.resolve(TnsName)
+  if (Addresses is None):
+    PrintError('TnsCheck ' + TnsName + ' (' + Resolver.tnsnames + ')', 'TNS-03505: Failed to resolve name', [['TNS-03505', 'TNS-03505: Failed to resolve name']])
+    return(1)
+
+  async def Probe(Host, Port):
+    async with (Limiter or NoLimit()):
+      try:
+        (Reader, Writer) = await asyncio.wait_for(asyncio.open_connection(Host, int(Port)), Timeout)
+        Writer.close()
+        return('')
+      except asyncio.TimeoutError:
+        return('timed out')
+      except (OSError, ValueError) as Error:
+        return(str(Error))
+
+  Endpoints = [(Protocol, Host, Port) for (Protocol, Host, Port) in Addresses if Protocol in ('TCP', 'TCPS')]
+  Errors = await asyncio.gather(*[Probe(Host, Port) for (Protocol, Host, Port) in Endpoints])
+  if ('' in Errors):
+    return(0)
+
+  Tnsout = ['TNS-12541: TNS:no listener']
+  for i in range(len(Endpoints)):
+    Tnsout.append('%s %s:%s - %s' % (Endpoints[i] + (Errors[i],)))
+  PrintError('TnsCheck ' + TnsName + ' (' + Resolver.tnsnames + ')', '\n'.join(Tnsout), [['TNS-12541', Tnsout[0]]])
+  return(2)
+# ---------------------------------------------------------------------------
+# End TnsCheckAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : OlsnodesAsync()
+# Desc: Olsnodes() as a coroutine. Runs olsnodes from the ASM home.
+# Args: Parm, olsnodes option without the -, ex: n.
+#       Limiter, asyncio.Semaphore (optional).
+# Retn: rc, Stdout (rc is 1 if olsnodes can't be run)
+# ---------------------------------------------------------------------------
+async def OlsnodesAsync(Parm='', Limiter=None):
+  Olsnodes = pathjoin(GetAsmHome(), 'bin', 'olsnodes')
+  if (not IsExecutable(Olsnodes)):
+    print('The following command cannot is not executable:', Olsnodes)
+    return(1, '')
+
+  Cmd = [Olsnodes]
+  if (Parm != ''):
+    Cmd.append('-' + Parm)
+  Lines  = []
+  Result = {'rc': None}
+  async for line in StreamTool(Cmd, Limiter=Limiter, Result=Result):
+    Lines.append(line)
+  return(Result['rc'], '\n'.join(Lines).strip())
+# ---------------------------------------------------------------------------
+# End OlsnodesAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : GetNodesAsync()
+# Desc: GetNodes() as a coroutine (olsnodes -n).
+# Args: Limiter, asyncio.Semaphore (optional).
+# Retn: NodeDict[NodeName] : NodeId)
+# ---------------------------------------------------------------------------
+async def GetNodesAsync(Limiter=None):
+  NodeDict = {}
+  (rc, Stdout) = await OlsnodesAsync('n', Limiter)
+  if (rc == 0):
+    for line in Stdout.split('\n'):
+      if (len(line.split()) >= 2):
+        NodeDict[line.split()[0]] = line.split()[1]
+  return(NodeDict)
+# ---------------------------------------------------------------------------
+# End GetNodesAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : GetVipsAsync()
+# Desc: GetVips() as a coroutine (olsnodes -i).
+# Args: Limiter, asyncio.Semaphore (optional).
+# Retn: VipDict[NodeName] : NodeVip)
+# ---------------------------------------------------------------------------
+async def GetVipsAsync(Limiter=None):
+  VipDict = {}
+  (rc, Stdout) = await OlsnodesAsync('i', Limiter)
+  if (rc == 0):
+    for line in Stdout.split('\n'):
+      if (len(line.split()) >= 2):
+        VipDict[line.split()[0]] = line.split()[1]
+  return(VipDict)
+# ---------------------------------------------------------------------------
+# End GetVipsAsync()
+# ---------------------------------------------------------------------------
+
+
+# ---------------------------------------------------------------------------
+# Def : GetClusternameAsync()
+# Desc: GetClustername() as a coroutine (olsnodes -c).
+# Args: Limiter, asyncio.Semaphore (optional).
+# Retn: Clustername
+# ---------------------------------------------------------------------------
+async def GetClusternameAsync(Limiter=None):
+  (rc, Stdout) = await OlsnodesAsync('c', Limiter)
+  if (rc != 0):
+    return('')
+  return(Stdout.strip())
+# ---------------------------------------------------------------------------
+# End GetClusternameAsync()
+# ---------------------------------------------------------------------------